@@ -0,0 +1,211 @@
+"""
+Shared, long-lived DuckDB connections, one per database file, reused across calls, Streamlit reruns and sessions.
+Readers get a cheap per-call cursor (safe to use from its own thread) on the shared connection, so DuckDB's
+buffer cache stays warm. Files are opened read-only so several processes can read at once; an in-process
+writer (ETL) upgrades the shared connection to read-write and readers keep serving from it.
+If the file is replaced on disk (new inode, e.g. a reload by another process), the connection is reopened.
+A connection is only closed for an upgrade or reopen once its open cursors are closed; new cursors wait meanwhile.
+
+DuckDB allows one writer per file, and a process with the file open (even read-only) blocks writers in
+other processes. Opening a file another process holds is retried for up to LOCK_WAIT_SECONDS, and the
+waiting process leaves a "<db_path>.lockwait.<pid>" file meanwhile: a connection without cursors is closed
+(dropping its file lock and checkpointing its WAL) as soon as such a file appears, and otherwise after
+IDLE_SECONDS (AI_ANALYZER_DUCKDB_IDLE_MINUTES, default 10) so the buffer cache stays warm between reruns.
+An external load (python ETL/run_etl.py) thus waits for an idle dashboard instead of failing. While another
+process writes the file, readers here cannot open it and their queries fail until the load ends.
+"""
+import glob
+import os
+import threading
+import time
+
+import duckdb
+
+# A shared connection without cursors for this long is closed (sooner if another process waits for the file)
+IDLE_SECONDS = float(os.environ.get("AI_ANALYZER_DUCKDB_IDLE_MINUTES", "10")) * 60
+# How long opening a file locked by another process is retried, per mode
+LOCK_WAIT_SECONDS = {"read": 2.0, "write": 60.0}
+LOCK_RETRY_SECONDS = 0.2
+# A lock wait file not touched for this long is left over by a killed process
+WAIT_FILE_STALE_SECONDS = 2.0
+
+_cond = threading.Condition()
+# db_path -> {"conn": DuckDBPyConnection, "read_only": bool, "file_id": (st_dev, st_ino), "users": open cursors,
+#             "idle_since": monotonic time the last cursor was closed, "busy": being opened by some thread}
+_shared = {}
+_reaper = None
+
+
+class _Cursor:
+    """Cursor on a shared connection; counts as a user of it until closed (or the `with` block ends)."""
+
+    def __init__(self, cur, entry: dict):
+        self._cur = cur
+        self._entry = entry
+
+    def __getattr__(self, name):
+        return getattr(self._cur, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        entry, self._entry = self._entry, None
+        if entry is None:
+            return
+        self._cur.close()
+        with _cond:
+            entry["users"] -= 1
+            if entry["users"] == 0:
+                entry["idle_since"] = time.monotonic()
+                _cond.notify_all()
+
+
+def _file_id(db_path: str):
+    try:
+        st = os.stat(db_path)
+    except FileNotFoundError:
+        return None
+    return (st.st_dev, st.st_ino)
+
+
+def _connect(db_path: str, read_only: bool) -> duckdb.DuckDBPyConnection:
+    """
+    duckdb.connect, retried while another process holds a conflicting lock on the file; a wait file asks
+    that process to close the file once idle.
+    """
+    deadline = time.monotonic() + LOCK_WAIT_SECONDS["read" if read_only else "write"]
+    wait_file = f"{db_path}.lockwait.{os.getpid()}"
+    try:
+        while True:
+            try:
+                return duckdb.connect(db_path, read_only=read_only)
+            except duckdb.IOException as e:
+                if "lock" not in str(e).lower() or time.monotonic() >= deadline:
+                    raise
+            open(wait_file, "a").close()
+            os.utime(wait_file)
+            time.sleep(LOCK_RETRY_SECONDS)
+    finally:
+        if os.path.exists(wait_file):
+            os.remove(wait_file)
+
+
+def _waited_for(db_path: str) -> bool:
+    """True if another process is waiting to open db_path: it touched a wait file lately (see _connect)."""
+    own = f"{db_path}.lockwait.{os.getpid()}"
+    for path in glob.glob(f"{glob.escape(db_path)}.lockwait.*"):
+        try:
+            # A waiter killed mid-retry leaves its file behind; it goes stale
+            if path != own and time.time() - os.path.getmtime(path) < WAIT_FILE_STALE_SECONDS:
+                return True
+        except FileNotFoundError:
+            pass
+    return False
+
+
+def _usable(entry: dict, db_path: str, read_only: bool) -> bool:
+    if not read_only:
+        return not entry["read_only"]
+    # A read-only connection to a file replaced on disk sees the old file
+    return not entry["read_only"] or entry["file_id"] == _file_id(db_path)
+
+
+def _retire(entry: dict):
+    """
+    Close entry's connection once its cursors are closed (caller holds _cond). Closing it earlier would fail
+    their pending results ("No open result set"); entry is marked busy so no new cursor is handed out meanwhile.
+    """
+    entry["busy"] = True
+    while entry["users"]:
+        _cond.wait()
+    entry["conn"].close()
+
+
+def _acquire(db_path: str, read_only: bool) -> _Cursor:
+    """Cursor on the shared connection for db_path, (re)opening it in the needed mode outside the lock."""
+    with _cond:
+        while True:
+            entry = _shared.get(db_path)
+            if entry is not None and entry["busy"]:
+                _cond.wait()
+                continue
+            if entry is not None and _usable(entry, db_path, read_only):
+                entry["users"] += 1
+                return _Cursor(entry["conn"].cursor(), entry)
+            if entry is None and read_only and not os.path.exists(db_path):
+                raise FileNotFoundError(f"Database not found: {db_path}")
+            if entry is not None:
+                _retire(entry)
+            opening = {"conn": None, "read_only": read_only, "file_id": None, "users": 0,
+                       "idle_since": time.monotonic(), "busy": True}
+            _shared[db_path] = opening
+            break
+    try:
+        conn = _connect(db_path, read_only)
+    except BaseException:
+        with _cond:
+            _shared.pop(db_path, None)
+            _cond.notify_all()
+        raise
+    with _cond:
+        opening.update(conn=conn, file_id=_file_id(db_path), busy=False, users=1)
+        _cond.notify_all()
+        _start_reaper()
+        return _Cursor(conn.cursor(), opening)
+
+
+def cursor(db_path: str) -> _Cursor:
+    """
+    Return a new cursor on the shared connection for db_path; close it (or use `with`) when done.
+    Raises duckdb / IO errors if the file does not exist yet (run ETL first).
+    """
+    return _acquire(os.path.abspath(db_path), read_only=True)
+
+
+def writer(db_path: str) -> _Cursor:
+    """
+    Return a read-write cursor for db_path (creating the file if needed), upgrading the shared connection.
+    Readers in this process keep working and see the writer's changes once committed. Upgrading a read-only
+    connection waits until the cursors open on it are closed, so do not call it while holding a cursor.
+    Close the cursor when the load is done: the connection is then closed once idle, like a reader's.
+    """
+    return _acquire(os.path.abspath(db_path), read_only=False)
+
+
+def _reap():
+    while True:
+        time.sleep(LOCK_RETRY_SECONDS)
+        now = time.monotonic()
+        with _cond:
+            for path, entry in list(_shared.items()):
+                if entry["busy"] or entry["users"]:
+                    continue
+                if now - entry["idle_since"] >= IDLE_SECONDS or _waited_for(path):
+                    del _shared[path]
+                    entry["conn"].close()
+
+
+def _start_reaper():
+    global _reaper
+    if _reaper is None:
+        _reaper = threading.Thread(target=_reap, name="duckdb-idle-reaper", daemon=True)
+        _reaper.start()
+
+
+def release(db_path: str = None):
+    """
+    Close the shared connection for db_path (all if None), dropping its file lock, once its open cursors
+    are closed; call it when done with the files (e.g. at the end of a CLI load), not while holding a cursor.
+    """
+    with _cond:
+        paths = list(_shared) if db_path is None else [os.path.abspath(db_path)]
+        for path in paths:
+            while path in _shared and (_shared[path]["busy"] or _shared[path]["users"]):
+                _cond.wait()
+            entry = _shared.pop(path, None)
+            if entry is not None:
+                entry["conn"].close()
@@ -0,0 +1,64 @@
+"""
+Largest-Triangle-Three-Buckets downsampling for time series results (date/value[/category]).
+Keeps the first and last point and, per bucket, the point spanning the largest triangle with its neighbours,
+so peaks and dips survive while the series shrinks to a fixed number of points. Each breakdown line is
+downsampled on its own. Works on pandas DataFrames and pyarrow.Tables.
+"""
+import numpy as np
+import pandas as pd
+
+MAX_POINTS = 120
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Indices (ascending) of the threshold points LTTB keeps from x/y (x sorted ascending)."""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = x.astype(np.float64)
+    y = np.nan_to_num(y.astype(np.float64))
+    # Bucket edges for the n - 2 inner points
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    out = np.empty(threshold, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nxt_lo, nxt_hi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        cx, cy = x[nxt_lo:nxt_hi].mean(), y[nxt_lo:nxt_hi].mean()
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        out[i + 1] = a
+    return out
+
+
+def _as_number(values: np.ndarray) -> np.ndarray:
+    if np.issubdtype(values.dtype, np.datetime64):
+        return values.astype("datetime64[ns]").astype(np.int64)
+    if values.dtype == object:
+        return pd.to_datetime(values).to_numpy().astype("datetime64[ns]").astype(np.int64)
+    return values
+
+
+def downsample(df, max_points: int = MAX_POINTS, x: str = "date", y: str = "value", by: str = "category"):
+    """
+    Return df with every line (one per distinct `by` value, or the whole frame) cut to max_points rows
+    by LTTB; df itself when no line is longer. Rows must be ordered by x within each line.
+    """
+    if df is None or len(df) <= max_points:
+        return df
+    columns = df.column_names if hasattr(df, "column_names") else list(df.columns)
+    if x not in columns or y not in columns:
+        return df
+    xs, ys = _as_number(df[x].to_numpy()), df[y].to_numpy()
+    if by in columns:
+        codes, _ = pd.factorize(df[by].to_numpy(), use_na_sentinel=False)
+        lines = [np.flatnonzero(codes == c) for c in range(codes.max() + 1)]
+    else:
+        lines = [np.arange(len(df))]
+    if all(len(idx) <= max_points for idx in lines):
+        return df
+    keep = np.sort(np.concatenate([idx[lttb_indices(xs[idx], ys[idx], max_points)] for idx in lines]))
+    if isinstance(df, pd.DataFrame):
+        return df.iloc[keep].reset_index(drop=True)
+    return df.take(keep)
@@ -1,26 +1,206 @@
 """
 Call local Ollama API (localhost:11434), return parsed JSON {dimension, metric, chart_type}.
+One pooled HTTP session per process; the model is kept resident via keep_alive. Replies are streamed and
+the reply text ends with the first complete plan object; the stream is then read on to Ollama's final chunk
+for its token counts, for at most DRAIN_SECONDS, before it is closed.
+Structured mode (default for get_analysis_plan) sends the compact prompt with a JSON schema as `format`
+and a small num_predict cap, streams the reply like free-text mode (stopping once the plan object closes),
+then validates it strictly against that schema.
+PlanBroker (plan_request) sits in front of the model for concurrent users: identical in-flight prompts share
+one call, at most MAX_CONCURRENCY calls reach Ollama, and callers degrade to a fallback plan when the wait
+queue is full or their deadline gets too close.
 """
+import datetime
 import json
+import os
 import re
+import threading
+import time
+from concurrent.futures import Future
 
 import requests
+from requests.adapters import HTTPAdapter
 
-from Ai.prompt import build_prompt
+from Ai import tracing
+from Ai.prompt import build_compact_prompt, build_prompt, plan_schema
 
-OLLAMA_URL = "http://localhost:11434/api/generate"
-MODEL = "qwen2.5:7b"
+OLLAMA_URL = os.environ.get("OLLAMA_URL", "http://localhost:11434/api/generate")
+MODEL = os.environ.get("OLLAMA_MODEL", "qwen2.5:7b")
+KEEP_ALIVE = "30m"
+CONNECT_TIMEOUT = 2
+# Max wait for the next streamed chunk; the first one includes prompt evaluation
+READ_TIMEOUT = 10
+# How long a reply is read on after the plan object closed, for the token counts in Ollama's final chunk.
+# A schema-constrained reply ends at the closing brace, so its final chunk follows at once; a reply that goes
+# on generating (free text, whitespace padding) is closed after this, without counts
+DRAIN_SECONDS = 1.0
+# Overall budget for one call_ollama, retries included
 TIMEOUT = 12
+RETRIES = 1
+RETRY_BACKOFF = 0.2
+# Completion token cap in structured mode for the required plan keys (~25 tokens), plus PLAN_FIELD_TOKENS
+# for each optional key the source's schema has; a plan with every optional key filled is ~80 tokens.
+# A schema-constrained reply ends at the closing brace, so a generous cap costs nothing on short plans
+NUM_PREDICT = 48
+PLAN_FIELD_TOKENS = {"top_n": 8, "metrics": 16, "dimensions": 16, "filters": 40, "date_from": 12, "date_to": 12}
+# Broker limits: one local model serves requests one at a time, extra calls only queue inside Ollama
+MAX_CONCURRENCY = 1
+MAX_QUEUE = 8
+# Do not start an LLM call with less than this many seconds left before the caller's deadline
+MIN_LLM_BUDGET = 2.0
 
+PLAN_KEYS = ("dimension", "metric", "chart_type")
 
-def call_ollama(prompt: str) -> str:
-    r = requests.post(
-        OLLAMA_URL,
-        json={"model": MODEL, "prompt": prompt, "stream": False},
-        timeout=TIMEOUT,
-    )
-    r.raise_for_status()
-    return r.json().get("response", "")
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """Process-wide keep-alive session, shared by all threads (urllib3 pool is thread-safe)."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            s = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+            s.mount("http://", adapter)
+            s.mount("https://", adapter)
+            _session = s
+        return _session
+
+
+def find_plan_object(text: str):
+    """Return the first complete top-level JSON object in text that has all PLAN_KEYS, else None."""
+    depth, start, in_str, escaped = 0, -1, False, False
+    for i, ch in enumerate(text):
+        if in_str:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_str = False
+        elif ch == '"':
+            in_str = depth > 0
+        elif ch == "{":
+            if depth == 0:
+                start = i
+            depth += 1
+        elif ch == "}" and depth > 0:
+            depth -= 1
+            if depth == 0:
+                try:
+                    obj = json.loads(text[start : i + 1])
+                except json.JSONDecodeError:
+                    continue
+                if isinstance(obj, dict) and all(k in obj for k in PLAN_KEYS):
+                    return obj
+    return None
+
+
+def _stream_generate(payload: dict, deadline: float):
+    text, meta, complete_at = "", {}, None
+    # A stalled stream must not outlive the caller's deadline either
+    read_timeout = max(min(READ_TIMEOUT, deadline - time.monotonic()), 0.1)
+    with get_session().post(OLLAMA_URL, json=payload, stream=True, timeout=(CONNECT_TIMEOUT, read_timeout)) as r:
+        r.raise_for_status()
+        for line in r.iter_lines():
+            if not line:
+                continue
+            chunk = json.loads(line)
+            if complete_at is None:
+                text += chunk.get("response", "")
+            if chunk.get("done"):
+                meta = dict(chunk, early_stop=complete_at is not None)
+                break
+            now = time.monotonic()
+            if complete_at is None:
+                if "}" in chunk.get("response", "") and find_plan_object(text):
+                    complete_at = now
+                elif now > deadline:
+                    raise requests.Timeout("Ollama did not finish before the deadline")
+            # Closing the response drops the connection, which makes Ollama stop generating
+            elif now - complete_at > DRAIN_SECONDS or now > deadline:
+                meta = {"early_stop": True}
+                break
+    return text, meta
+
+
+def generate(
+    prompt: str,
+    model: str = None,
+    timeout: float = None,
+    retries: int = None,
+    stream: bool = True,
+    fmt=None,
+    options: dict = None,
+):
+    """
+    Generate a reply for prompt; return (text, stats). stream=True ends the text at the first complete plan
+    object (early_stop) and waits at most DRAIN_SECONDS more for Ollama's final chunk.
+    fmt / options are passed to Ollama as `format` / `options`.
+    Connection errors and 5xx responses are retried up to `retries` times within the overall `timeout`.
+    stats: prompt_tokens, completion_tokens (Ollama's counts; None if it did not report them, e.g. a reply
+    closed after DRAIN_SECONDS), latency_ms, prompt_chars, early_stop.
+    """
+    timeout = TIMEOUT if timeout is None else timeout
+    retries = RETRIES if retries is None else retries
+    payload = {"model": model or MODEL, "prompt": prompt, "stream": stream, "keep_alive": KEEP_ALIVE}
+    if fmt is not None:
+        payload["format"] = fmt
+    if options:
+        payload["options"] = options
+    with tracing.span("llm.generate", model=payload["model"], stream=stream) as attrs:
+        t0 = time.monotonic()
+        deadline = t0 + timeout
+        for attempt in range(retries + 1):
+            try:
+                if stream:
+                    text, meta = _stream_generate(payload, deadline)
+                else:
+                    remaining = max(deadline - time.monotonic(), 0.1)
+                    r = get_session().post(OLLAMA_URL, json=payload, timeout=(CONNECT_TIMEOUT, remaining))
+                    r.raise_for_status()
+                    meta = r.json()
+                    text = meta.get("response", "")
+                break
+            except (requests.ConnectionError, requests.HTTPError) as e:
+                status = getattr(getattr(e, "response", None), "status_code", None)
+                retryable = status is None or status >= 500
+                if not retryable or attempt == retries or time.monotonic() + RETRY_BACKOFF >= deadline:
+                    raise
+                time.sleep(RETRY_BACKOFF * (attempt + 1))
+        stats = {
+            "prompt_tokens": meta.get("prompt_eval_count"),
+            "completion_tokens": meta.get("eval_count"),
+            "latency_ms": round((time.monotonic() - t0) * 1000, 1),
+            "prompt_chars": len(prompt),
+            "early_stop": bool(meta.get("early_stop")),
+        }
+        attrs.update(prompt_tokens=stats["prompt_tokens"], completion_tokens=stats["completion_tokens"])
+    for kind in ("prompt", "completion"):
+        tracing.count("llm_tokens", stats[f"{kind}_tokens"] or 0, kind=kind)
+    return text, stats
+
+
+def call_ollama(prompt: str, model: str = None, timeout: float = None, retries: int = None, stream: bool = True) -> str:
+    """Generate a reply for prompt and return its text (see generate)."""
+    return generate(prompt, model=model, timeout=timeout, retries=retries, stream=stream)[0]
+
+
+def preload(model: str = None, block: bool = False):
+    """Ask Ollama to load the model and keep it resident, so the first question does not pay the load time."""
+    def _load():
+        try:
+            get_session().post(
+                OLLAMA_URL, json={"model": model or MODEL, "keep_alive": KEEP_ALIVE}, timeout=(CONNECT_TIMEOUT, 120)
+            )
+        except requests.RequestException:
+            pass
+
+    if block:
+        _load()
+    else:
+        threading.Thread(target=_load, daemon=True).start()
 
 
 def parse_json_from_response(text: str) -> dict:
@@ -41,16 +221,205 @@ def parse_json_from_response(text: str) -> dict:
     return {}
 
 
-def get_analysis_plan(user_message: str, source_cfg: dict) -> dict:
+def _check_list(key: str, value, spec: dict):
+    """Raise ValueError unless value is a list matching an "array" schema (minItems, uniqueItems, item type / enum)."""
+    if not isinstance(value, list) or len(value) < spec.get("minItems", 0) or not all(isinstance(v, str) for v in value):
+        raise ValueError(f"Plan {key} must be a non-empty list of strings, got {value!r}")
+    if spec.get("uniqueItems") and len(set(value)) < len(value):
+        raise ValueError(f"Plan {key} must not repeat items, got {value!r}")
+    bad = [v for v in value if "enum" in spec["items"] and v not in spec["items"]["enum"]]
+    if bad:
+        raise ValueError(f"Plan {key} items must be in {spec['items']['enum']}, got {bad!r}")
+
+
+def validate_plan(obj, source_cfg: dict) -> dict:
+    """Strictly check obj against plan_schema(source_cfg); return it or raise ValueError."""
+    schema = plan_schema(source_cfg)
+    if not isinstance(obj, dict):
+        raise ValueError(f"Plan is not an object: {obj!r}")
+    missing = [k for k in schema["required"] if k not in obj]
+    extra = [k for k in obj if k not in schema["properties"]]
+    if missing or extra:
+        raise ValueError(f"Plan keys invalid (missing {missing}, unexpected {extra})")
+    for key, spec in schema["properties"].items():
+        if key not in obj:
+            continue
+        value = obj[key]
+        if spec["type"] == "boolean" and not isinstance(value, bool):
+            raise ValueError(f"Plan {key} must be boolean, got {value!r}")
+        if spec["type"] == "integer" and (isinstance(value, bool) or not isinstance(value, int) or value < spec["minimum"]):
+            raise ValueError(f"Plan {key} must be an integer >= {spec['minimum']}, got {value!r}")
+        if spec["type"] == "array":
+            _check_list(key, value, spec)
+        if spec["type"] == "object":
+            if not isinstance(value, dict) or any(k not in spec["properties"] for k in value):
+                raise ValueError(f"Plan {key} must be an object with keys from {list(spec['properties'])}, got {value!r}")
+            for k, v in value.items():
+                _check_list(f"{key}.{k}", v, spec["properties"][k])
+        if spec["type"] == "string" and spec.get("format") == "date":
+            try:
+                datetime.date.fromisoformat(value)
+            except (TypeError, ValueError):
+                raise ValueError(f"Plan {key} must be a YYYY-MM-DD date, got {value!r}") from None
+        if "enum" in spec and value not in spec["enum"]:
+            raise ValueError(f"Plan {key} must be one of {spec['enum']}, got {value!r}")
+    return obj
+
+
+def num_predict(schema: dict) -> int:
+    """Completion token cap for a plan following schema (plan_schema)."""
+    optional = [k for k in schema["properties"] if k not in schema["required"]]
+    return NUM_PREDICT + sum(PLAN_FIELD_TOKENS.get(k, 0) for k in optional)
+
+
+def analysis_plan_with_stats(user_message: str, source_cfg: dict, structured: bool = True, timeout: float = None):
+    """
+    Return (plan, stats) for user_message; stats as in generate() plus "mode".
+    timeout: overall seconds for the call, fallbacks included (default TIMEOUT).
+    structured=True: compact prompt + schema-constrained reply, validated (raises ValueError if invalid).
+    structured=False: original free-text prompt, reply scraped with parse_json_from_response.
+    """
+    if not structured:
+        prompt = build_prompt(
+            user_message,
+            dimensions=source_cfg["dimensions"],
+            metrics=source_cfg["metrics"],
+            dimension_labels=source_cfg["dimension_labels"],
+            metric_labels=source_cfg["metric_labels"],
+            columns_description=", ".join(source_cfg["columns"]),
+        )
+        text, stats = generate(prompt, timeout=timeout)
+        return parse_json_from_response(text), dict(stats, mode="free-text")
+
+    prompt = build_compact_prompt(user_message, source_cfg)
+    schema = plan_schema(source_cfg)
+    options = {"num_predict": num_predict(schema), "temperature": 0}
+    end = time.monotonic() + (TIMEOUT if timeout is None else timeout)
+    try:
+        text, stats = generate(prompt, timeout=timeout, fmt=schema, options=options)
+    except requests.HTTPError as e:
+        # Ollama < 0.5 only understands format="json"; enums are still enforced by validate_plan
+        if getattr(e.response, "status_code", None) != 400:
+            raise
+        text, stats = generate(prompt, timeout=max(end - time.monotonic(), 0.1), fmt="json", options=options)
+    # An early-stopped stream ends with the chunk that closed the object, which may carry trailing text
+    obj = find_plan_object(text)
+    if obj is None:
+        try:
+            obj = json.loads(text)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Plan is not valid JSON: {text[:200]!r}") from e
+    return validate_plan(obj, source_cfg), dict(stats, mode="structured")
+
+
+def get_analysis_plan(user_message: str, source_cfg: dict, structured: bool = True) -> dict:
     """Build prompt from source config, call Ollama, return parsed plan."""
-    columns_description = ", ".join(source_cfg["columns"])
-    prompt = build_prompt(
-        user_message,
-        dimensions=source_cfg["dimensions"],
-        metrics=source_cfg["metrics"],
-        dimension_labels=source_cfg["dimension_labels"],
-        metric_labels=source_cfg["metric_labels"],
-        columns_description=columns_description,
-    )
-    response = call_ollama(prompt)
-    return parse_json_from_response(response)
+    return analysis_plan_with_stats(user_message, source_cfg, structured=structured)[0]
+
+
+class PlanBroker:
+    """Single-flight, concurrency-capped front for analysis_plan_with_stats; thread-safe."""
+
+    def __init__(self, max_concurrency: int = MAX_CONCURRENCY, max_queue: int = MAX_QUEUE):
+        self.max_queue = max_queue
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._inflight = {}  # prompt key -> Future of (plan, stats)
+        self._waiting = 0
+        self._counts = {"calls": 0, "coalesced": 0, "fallback": 0, "errors": 0}
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._wait_count = 0
+
+    def plan(self, user_message: str, source_cfg: dict, fallback, deadline: float = None):
+        """
+        Return (plan, info). fallback(user_message, source_cfg) supplies the plan when the LLM is skipped or fails.
+        deadline: seconds the caller is willing to wait in total (default TIMEOUT).
+        info: origin ("llm", "coalesced" or "fallback"), reason, wait_ms, plus LLM stats when a call was made.
+        """
+        t0 = time.monotonic()
+        end = t0 + (TIMEOUT if deadline is None else deadline)
+        key = (MODEL, build_compact_prompt(user_message, source_cfg))
+
+        def degrade(reason):
+            with self._lock:
+                self._counts["fallback"] += 1
+            info = {"origin": "fallback", "reason": reason, "wait_ms": round((time.monotonic() - t0) * 1000, 1)}
+            return fallback(user_message, source_cfg), info
+
+        with self._lock:
+            shared = self._inflight.get(key)
+            if shared is None:
+                if self._waiting >= self.max_queue:
+                    shared = "full"
+                else:
+                    fut = Future()
+                    self._inflight[key] = fut
+                    self._waiting += 1
+            else:
+                self._counts["coalesced"] += 1
+        if shared == "full":
+            return degrade("queue full")
+        if shared is not None:
+            try:
+                plan, stats = shared.result(timeout=max(end - time.monotonic(), 0))
+            except Exception as e:
+                return degrade(f"shared call failed: {type(e).__name__}: {e}")
+            return plan, dict(stats, origin="coalesced", reason="identical request in flight",
+                              wait_ms=round((time.monotonic() - t0) * 1000, 1))
+
+        acquired = self._slots.acquire(timeout=max(end - time.monotonic() - MIN_LLM_BUDGET, 0))
+        waited = time.monotonic() - t0
+        with self._lock:
+            self._waiting -= 1
+            self._wait_count += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        try:
+            if not acquired:
+                fut.set_exception(TimeoutError("deadline reached while queued"))
+                return degrade("deadline reached while queued")
+            with self._lock:
+                self._counts["calls"] += 1
+            try:
+                # The call gets what is left of the caller's budget, not a fresh TIMEOUT
+                result = analysis_plan_with_stats(user_message, source_cfg, timeout=max(end - time.monotonic(), 0.1))
+            except Exception as e:
+                with self._lock:
+                    self._counts["errors"] += 1
+                fut.set_exception(e)
+                return degrade(f"{type(e).__name__}: {e}")
+            finally:
+                self._slots.release()
+            fut.set_result(result)
+            plan, stats = result
+            return plan, dict(stats, origin="llm", reason="", wait_ms=round(waited * 1000, 1))
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def stats(self) -> dict:
+        """Queue depth, in-flight prompts, wait times (ms) and call/coalesce/fallback/error counts."""
+        with self._lock:
+            return {
+                "queue_depth": self._waiting,
+                "in_flight": len(self._inflight),
+                "avg_wait_ms": round(self._wait_total / self._wait_count * 1000, 1) if self._wait_count else 0.0,
+                "max_wait_ms": round(self._wait_max * 1000, 1),
+                **self._counts,
+            }
+
+
+_broker = PlanBroker()
+
+
+def plan_request(user_message: str, source_cfg: dict, fallback, deadline: float = None):
+    """Plan via the process-wide PlanBroker; see PlanBroker.plan."""
+    with tracing.span("llm.plan") as attrs:
+        plan, info = _broker.plan(user_message, source_cfg, fallback, deadline=deadline)
+        attrs.update(origin=info["origin"], wait_ms=info["wait_ms"])
+    return plan, info
+
+
+def broker_stats() -> dict:
+    return _broker.stats()
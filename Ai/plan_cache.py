@@ -0,0 +1,112 @@
+"""
+Persistent LLM plan cache shared by all sessions and processes (SQLite file next to the DuckDB files).
+Requests are normalized before lookup with the planner's keyword index (Ai.planner.normalize): stopwords
+dropped, labels, plurals and per-source "synonyms" mapped to column names, chart/time words to their meaning,
+tokens sorted, so "Sales by category." and "category sales" hit the same entry. Keys include a fingerprint
+of the source's dimensions/metrics/labels; entries for an older fingerprint are never returned and are purged
+on the next write. Plans with date_from / date_to also record the latest date of the data (Ai.planner.data_end)
+and are returned only while it is unchanged, since relative phrases ("last quarter") count back from it.
+Size is bounded by MAX_ENTRIES (least recently used evicted). Cache errors (locked or unwritable file) are treated as misses, never raised.
+"""
+import json
+import os
+import sqlite3
+import time
+
+from Ai.planner import data_end, normalize, schema_fingerprint
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_PATH = os.path.join(ROOT, "db", "plan_cache.sqlite")
+MAX_ENTRIES = 5000
+DATE_KEYS = ("date_from", "date_to")
+
+
+def _connect(path: str = None) -> sqlite3.Connection:
+    path = path or CACHE_PATH
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path, timeout=5)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS plans (
+            source_id TEXT, fingerprint TEXT, normalized TEXT, plan TEXT,
+            hits INTEGER DEFAULT 0, created_at REAL, last_used REAL, data_end TEXT,
+            PRIMARY KEY (source_id, normalized)
+        )
+        """
+    )
+    # Files created before data_end was recorded; their dated plans are never returned
+    if "data_end" not in [row[1] for row in conn.execute("PRAGMA table_info(plans)")]:
+        conn.execute("ALTER TABLE plans ADD COLUMN data_end TEXT")
+    return conn
+
+
+def get(source_id: str, source_cfg: dict, text: str, path: str = None):
+    """Return the cached plan dict for text, or None (also for a dated plan made against older data)."""
+    key = normalize(text, source_cfg)
+    if not key:
+        return None
+    try:
+        conn = _connect(path)
+    except sqlite3.Error:
+        return None
+    try:
+        row = conn.execute(
+            "SELECT plan, data_end FROM plans WHERE source_id = ? AND normalized = ? AND fingerprint = ?",
+            (source_id, key, schema_fingerprint(source_cfg)),
+        ).fetchone()
+        if row is None:
+            return None
+        plan = json.loads(row[0])
+        if any(k in plan for k in DATE_KEYS) and row[1] != data_end(source_cfg).isoformat():
+            return None
+        with conn:
+            conn.execute(
+                "UPDATE plans SET hits = hits + 1, last_used = ? WHERE source_id = ? AND normalized = ?",
+                (time.time(), source_id, key),
+            )
+        return plan
+    except sqlite3.Error:
+        return None
+    finally:
+        conn.close()
+
+
+def put(source_id: str, source_cfg: dict, text: str, plan: dict, path: str = None):
+    """Store plan for text; purges entries from an older schema of this source and evicts beyond MAX_ENTRIES."""
+    key = normalize(text, source_cfg)
+    if not key:
+        return
+    fp = schema_fingerprint(source_cfg)
+    now = time.time()
+    try:
+        conn = _connect(path)
+    except sqlite3.Error:
+        return
+    try:
+        with conn:
+            conn.execute("DELETE FROM plans WHERE source_id = ? AND fingerprint != ?", (source_id, fp))
+            conn.execute(
+                "INSERT OR REPLACE INTO plans "
+                "(source_id, fingerprint, normalized, plan, hits, created_at, last_used, data_end) "
+                "VALUES (?, ?, ?, ?, 0, ?, ?, ?)",
+                (source_id, fp, key, json.dumps(plan), now, now, data_end(source_cfg).isoformat()),
+            )
+            conn.execute(
+                "DELETE FROM plans WHERE rowid IN (SELECT rowid FROM plans ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (MAX_ENTRIES,),
+            )
+    except sqlite3.Error:
+        pass
+    finally:
+        conn.close()
+
+
+def stats(path: str = None) -> dict:
+    """Return {"entries", "hits"} across all sources."""
+    conn = _connect(path)
+    try:
+        entries, hits = conn.execute("SELECT COUNT(*), COALESCE(SUM(hits), 0) FROM plans").fetchone()
+        return {"entries": entries, "hits": hits}
+    finally:
+        conn.close()
@@ -0,0 +1,280 @@
+"""
+Deterministic first-tier planner: one sentence -> plan + confidence, without the LLM.
+Each source gets a precompiled keyword index (column names, labels, plurals, per-source "synonyms", chart and
+time words) matched with a single regex. Callers consult the LLM only when confidence < CONFIDENCE_THRESHOLD.
+With a resolved source config, the most frequent values of each dimension (from the ETL catalog) are indexed
+too, so "sales of phones and chairs" is read as a request by sub_category, filtered to those two values.
+Date phrases ("last quarter", "past 6 months", "in 2022") become date_from / date_to, counted back from the
+latest date in the data (the catalog's date_max) rather than from today.
+"""
+import calendar
+import datetime
+import hashlib
+import json
+import re
+import threading
+
+from ETL import catalog
+
+CONFIDENCE_THRESHOLD = 0.8
+
+STOPWORDS = {
+    "a", "an", "the", "by", "of", "for", "per", "in", "on", "to", "and", "with", "across", "each", "all",
+    "over", "me", "show", "see", "give", "get", "display", "plot", "draw", "chart", "graph", "please", "want",
+    "i", "what", "is", "are", "how", "much", "many", "total", "sum", "our", "my", "us", "can", "you", "let",
+    "as", "s", "do", "does", "view", "compute", "calculate", "break", "down", "broken", "it",
+}
+
+# Phrase -> chart type it implies
+CHART_WORDS = {
+    "pie": "pie", "share": "pie", "shares": "pie", "proportion": "pie", "proportions": "pie",
+    "percentage": "pie", "percent": "pie", "composition": "pie", "mix": "pie", "split": "pie",
+    "bar": "bar", "bars": "bar", "column": "bar", "columns": "bar", "compare": "bar", "comparison": "bar",
+    "ranking": "bar", "rank": "bar", "top": "bar", "highest": "bar", "lowest": "bar",
+    "line": "line",
+}
+# "top 5", "5 largest": the number becomes plan["top_n"]
+TOP_N_RE = re.compile(r"\b(?:top|first|largest|biggest|best)\s+(\d{1,4})\b|\b(\d{1,4})\s+(?:largest|biggest|best)\b")
+# "a and b", "a, b", "a vs b": several metrics / dimensions were asked for on purpose
+LIST_RE = re.compile(r"\band\b|,|&|\bvs\b|\bversus\b")
+# Date phrases -> plan date_from / date_to ("last 3 months", "last quarter", "this year", "q2 2022", "since 2021")
+PERIODS = {"day": 0, "week": 0, "month": 1, "quarter": 3, "year": 12}
+DATE_RES = [
+    ("rolling", re.compile(r"\b(?:in\s+the\s+)?(?:last|past|previous)\s+(\d{1,3})\s+(day|week|month|quarter|year)s?\b")),
+    ("previous", re.compile(r"\b(?:last|previous|past)\s+(week|month|quarter|year)\b")),
+    ("current", re.compile(r"\b(?:this|current)\s+(week|month|quarter|year)\b|\b(ytd|year\s+to\s+date)\b")),
+    ("quarter", re.compile(r"\b(?:in\s+|during\s+)?q([1-4])\s+((?:19|20)\d\d)\b")),
+    ("since", re.compile(r"\b(?:since|from|after)\s+((?:19|20)\d\d)\b")),
+    ("year", re.compile(r"\b(?:in\s+|during\s+|for\s+)?((?:19|20)\d\d)\b")),
+]
+# Phrases that ask for the time axis (dimension "date", line chart, breakdown lines)
+TIME_WORDS = [
+    "over time", "by time", "trend", "trends", "trending", "timeline", "time series", "history",
+    "evolution", "by month", "per month", "monthly", "month over month", "over the months", "time",
+]
+
+
+def _variants(word: str) -> set:
+    """Surface forms mapped to the same canonical token (spacing, hyphens, simple plurals)."""
+    w = word.lower()
+    forms = {w, w.replace("_", " "), w.replace("_", "-"), w.replace("_", "")}
+    out = set(forms)
+    for f in forms:
+        out.add(f + "s")
+        out.add(f + "es")
+        if f.endswith("y"):
+            out.add(f[:-1] + "ies")
+        if f.endswith("s"):
+            out.add(f[:-1])
+    return out
+
+
+def _start(day: datetime.date, period: str) -> datetime.date:
+    """First day of the calendar period containing day (weeks start on Monday)."""
+    if period == "day":
+        return day
+    if period == "week":
+        return day - datetime.timedelta(days=day.weekday())
+    month = 1 if period == "year" else day.month - (day.month - 1) % PERIODS[period]
+    return datetime.date(day.year, month, 1)
+
+
+def _shift(day: datetime.date, period: str, n: int) -> datetime.date:
+    """day moved by n periods (month ends are clamped: Mar 31 - 1 month = Feb 28)."""
+    if period in ("day", "week"):
+        return day + datetime.timedelta(days=n * (7 if period == "week" else 1))
+    months = day.year * 12 + day.month - 1 + n * PERIODS[period]
+    year, month = divmod(months, 12)
+    return datetime.date(year, month + 1, min(day.day, calendar.monthrange(year, month + 1)[1]))
+
+
+def data_end(source_cfg: dict) -> datetime.date:
+    """Latest date in the source's data per its catalog; today without a catalog."""
+    meta = catalog.load(source_cfg["db_path"], source_cfg["table"]) if "db_path" in source_cfg else None
+    if meta is None or not meta.get("date_max"):
+        return datetime.date.today()
+    return datetime.date.fromisoformat(str(meta["date_max"])[:10])
+
+
+def date_range(text: str, end: datetime.date):
+    """
+    (date_from, date_to, (start, stop) of the phrase in text) for the first date phrase in lowercase text,
+    with end as "today"; None if there is none. date_to is None for open ranges ("since 2021").
+    """
+    for kind, regex in DATE_RES:
+        m = regex.search(text)
+        if not m:
+            continue
+        if kind == "rolling":
+            first, last = _shift(end, m.group(2), -int(m.group(1))) + datetime.timedelta(days=1), end
+        elif kind == "previous":
+            last = _start(end, m.group(1)) - datetime.timedelta(days=1)
+            first = _start(last, m.group(1))
+        elif kind == "current":
+            first, last = _start(end, m.group(1) or "year"), end
+        elif kind == "quarter":
+            first = datetime.date(int(m.group(2)), 3 * int(m.group(1)) - 2, 1)
+            last = _shift(first, "quarter", 1) - datetime.timedelta(days=1)
+        elif kind == "since":
+            first, last = datetime.date(int(m.group(1)), 1, 1), None
+        else:
+            first, last = datetime.date(int(m.group(1)), 1, 1), datetime.date(int(m.group(1)), 12, 31)
+        return first.isoformat(), last.isoformat() if last else None, m.span()
+    return None
+
+
+def schema_fingerprint(source_cfg: dict) -> str:
+    """Short hash of everything the index depends on; changes when dimensions, metrics or labels change."""
+    keys = ["dimensions", "metrics", "dimension_labels", "metric_labels", "breakdown_dimension", "synonyms"]
+    blob = json.dumps({k: source_cfg.get(k) for k in keys}, sort_keys=True)
+    return hashlib.sha1(blob.encode()).hexdigest()[:16]
+
+
+def build_index(source_cfg: dict, values: dict = None) -> dict:
+    """
+    Compile the keyword index for a source: {"regex", "terms": phrase -> (kind, value)}.
+    values: {dimension: [known values]}, indexed as ("value", "dimension=value") where no other term uses the word.
+    """
+    dims, metrics = source_cfg["dimensions"], source_cfg["metrics"]
+    labels = {**source_cfg["dimension_labels"], **source_cfg["metric_labels"]}
+    terms = {}
+    for name in dims + metrics:
+        kind = "metric" if name in metrics else "dimension"
+        for word in (name, labels.get(name, name)):
+            for v in _variants(word):
+                terms.setdefault(v, (kind, name))
+    for syn, name in source_cfg.get("synonyms", {}).items():
+        kind = "metric" if name in metrics else "dimension"
+        for v in _variants(syn):
+            terms.setdefault(v, (kind, name))
+    # Generic words only where the source does not use the same word for a column
+    for phrase in TIME_WORDS:
+        terms.setdefault(phrase, ("time", "date"))
+    for phrase, chart in CHART_WORDS.items():
+        terms.setdefault(phrase, ("chart", chart))
+    for dim, vals in (values or {}).items():
+        for v in vals:
+            word = str(v).lower().strip()
+            if len(word) > 1 and not word.isdigit() and re.fullmatch(r"[a-z0-9_\- ]+", word):
+                terms.setdefault(word, ("value", f"{dim}={v}"))
+    alternation = "|".join(re.escape(p) for p in sorted(terms, key=len, reverse=True))
+    return {"regex": re.compile(rf"(?<![a-z0-9_])(?:{alternation})(?![a-z0-9_])"), "terms": terms}
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index(source_cfg: dict) -> dict:
+    """build_index, cached per source schema and catalog version."""
+    version, values = catalog.dimension_values(source_cfg)
+    key = (schema_fingerprint(source_cfg), source_cfg.get("db_path"), version)
+    index = _indexes.get(key)
+    if index is None:
+        index = build_index(source_cfg, values)
+        with _indexes_lock:
+            _indexes[key] = index
+    return index
+
+
+def analyze(text: str, source_cfg: dict) -> dict:
+    """Match text against the source index: {"matches": [(kind, value), ...], "unknown": [words]}."""
+    index = get_index(source_cfg)
+    msg = re.sub(r"[^a-z0-9_\- ]+", " ", text.lower())
+    matches = [index["terms"][m.group(0)] for m in index["regex"].finditer(msg)]
+    rest = index["regex"].sub(" ", msg)
+    unknown = [w for w in re.findall(r"[a-z0-9_]+", rest) if w not in STOPWORDS]
+    return {"matches": matches, "unknown": unknown}
+
+
+def plan_with_confidence(text: str, source_cfg: dict):
+    """
+    Return (plan, confidence in [0, 1]). plan has dimension, metric, chart_type, by_time_breakdown,
+    top_n when the sentence asks for "top N", metrics / dimensions (all of them, first = metric /
+    dimension) when several were listed ("sales and profit by region and category"), filters
+    ({dimension: [values]}) for named dimension values and date_from / date_to for a date phrase.
+    Confidence is high when one metric and one dimension (or time), or an explicit list of them, were named
+    and nothing else in the sentence was left unexplained.
+    """
+    text = text.lower()
+    top = TOP_N_RE.search(text)
+    if top:
+        # The phrase is explained by top_n: its number is no unknown word and "top" no chart choice
+        text = text[: top.start()] + " " + text[top.end():]
+    dates = date_range(text, data_end(source_cfg))
+    if dates:
+        # Likewise the date phrase: "last month" asks for a range, not for the time axis
+        text = text[: dates[2][0]] + " " + text[dates[2][1]:]
+    a = analyze(text, source_cfg)
+    listed = LIST_RE.search(text) is not None
+    dims = list(dict.fromkeys(v for k, v in a["matches"] if k == "dimension"))
+    metrics = list(dict.fromkeys(v for k, v in a["matches"] if k == "metric"))
+    charts = list(dict.fromkeys(v for k, v in a["matches"] if k == "chart"))
+    by_time = any(k == "time" for k, _ in a["matches"]) or dims == ["date"]
+    filters = {}
+    for k, v in a["matches"]:
+        if k == "value":
+            dim, value = v.split("=", 1)
+            filters.setdefault(dim, [])
+            if value not in filters[dim]:
+                filters[dim].append(value)
+    if not [d for d in dims if d != "date"]:
+        # Named values stand for their dimension ("phones vs chairs" -> sub_category)
+        dims += list(filters)
+
+    confidence = 0.0
+    metric = metrics[0] if metrics else source_cfg["metrics"][0]
+    if len(metrics) == 1 or (metrics and listed):
+        confidence += 0.45
+    elif metrics:
+        confidence += 0.2
+    non_date = [d for d in dims if d != "date"]
+    if by_time:
+        dimension = "date"
+        # "sales by region over time": the breakdown is fixed by config, so a different dimension is ambiguous
+        confidence += 0.45 if all(d == source_cfg.get("breakdown_dimension") for d in non_date) else 0.2
+    elif len(non_date) == 1 or (non_date and listed):
+        dimension = non_date[0]
+        confidence += 0.45
+    elif non_date:
+        dimension = non_date[0]
+        confidence += 0.2
+    else:
+        dimension = source_cfg["dimensions"][0]
+
+    if by_time:
+        chart = "line"
+    elif charts:
+        chart = charts[0]
+    else:
+        chart = "bar"
+    if len(charts) <= 1 and not (by_time and charts and charts[0] != "line"):
+        confidence += 0.1
+    confidence -= min(0.1 * len(a["unknown"]), 0.4)
+
+    plan = {"dimension": dimension, "metric": metric, "chart_type": chart, "by_time_breakdown": by_time}
+    if top and not by_time:
+        plan["top_n"] = int(top.group(1) or top.group(2))
+    if len(metrics) > 1:
+        plan["metrics"] = metrics
+    if len(non_date) > 1 and not by_time:
+        plan["dimensions"] = non_date
+    if filters:
+        plan["filters"] = filters
+    if dates:
+        plan["date_from"] = dates[0]
+        if dates[1]:
+            plan["date_to"] = dates[1]
+    return plan, round(max(confidence, 0.0), 2)
+
+
+def fallback_plan(user_message: str, source_cfg: dict) -> dict:
+    """Best keyword plan regardless of confidence (used when the LLM is unavailable)."""
+    return plan_with_confidence(user_message, source_cfg)[0]
+
+
+def normalize(text: str, source_cfg: dict) -> str:
+    """Canonical, order-insensitive form of a request: matched terms by meaning plus unexplained words."""
+    a = analyze(text, source_cfg)
+    tokens = {f"{kind}:{value}" for kind, value in a["matches"]} | set(a["unknown"])
+    return " ".join(sorted(tokens))
@@ -1,7 +1,10 @@
 """
 Build prompt for LLM: user message + table schema + analysis options -> JSON (dimension, metric, chart_type).
 Accepts per-source dimensions, metrics, and labels.
+build_compact_prompt + plan_schema are the structured-output variant: the schema constrains the reply,
+so the prompt only has to name the allowed values.
 """
+from Ai.planner import data_end
 from config.sources import CHART_TYPES, CHART_LABELS
 
 
@@ -19,5 +22,60 @@ def build_prompt(
     return f"""Table columns: {columns_description}. Dimensions: {dims}. Metrics: {mets}. Chart types: {charts}.
 User: "{user_message}"
 If user wants trend over time or "by time", use dimension "date", chart_type "line", "by_time_breakdown":true.
+If user asks for the top N (e.g. "top 5"), add "top_n":N.
+If user asks for several metrics or dimensions (e.g. "sales and profit by region and category"), also add "metrics":[...] and/or "dimensions":[...] listing all of them, the first one repeated in "metric" / "dimension".
+If user restricts to some dimension values (e.g. "in the West"), add "filters":{{"<dimension>":["<value>",...]}}; for a time window (e.g. "last quarter", "in 2022") add "date_from" and/or "date_to" as "YYYY-MM-DD" (inclusive).
 Reply ONLY with JSON: {{"dimension":"...","metric":"...","chart_type":"...","by_time_breakdown":true/false}}
 """
+
+
+def build_compact_prompt(user_message: str, source_cfg: dict) -> str:
+    """Short prompt for structured output: the JSON shape and allowed values come from plan_schema()."""
+    dims = ", ".join(f"{d} ({source_cfg['dimension_labels'].get(d, d)})" for d in source_cfg["dimensions"])
+    mets = ", ".join(f"{m} ({source_cfg['metric_labels'].get(m, m)})" for m in source_cfg["metrics"])
+    return (
+        f"Pick a chart plan. Dimensions: {dims}. Metrics: {mets}. "
+        f'Trend/over time: dimension "date", chart_type "line", by_time_breakdown true. '
+        f'"Top N": top_n N. Several metrics/dimensions: list all in metrics/dimensions (first = metric/dimension). '
+        f"Only some values (\"in the West\"): filters {{dimension: [values]}}. "
+        f"Time window: date_from / date_to YYYY-MM-DD, inclusive; the data ends {data_end(source_cfg)}.\n"
+        f'Request: "{user_message}"'
+    )
+
+
+def plan_schema(source_cfg: dict) -> dict:
+    """
+    JSON schema of a plan for this source; passed to Ollama as `format` and used for validation.
+    top_n, metrics, dimensions, filters, date_from and date_to are optional; the lists hold every requested
+    metric / dimension, filters the values to keep per non-date dimension.
+    """
+    return {
+        "type": "object",
+        "properties": {
+            "dimension": {"type": "string", "enum": list(source_cfg["dimensions"])},
+            "metric": {"type": "string", "enum": list(source_cfg["metrics"])},
+            "chart_type": {"type": "string", "enum": list(CHART_TYPES)},
+            "by_time_breakdown": {"type": "boolean"},
+            "top_n": {"type": "integer", "minimum": 0},
+            "metrics": {
+                "type": "array", "items": {"type": "string", "enum": list(source_cfg["metrics"])},
+                "minItems": 1, "uniqueItems": True,
+            },
+            "dimensions": {
+                "type": "array", "items": {"type": "string", "enum": list(source_cfg["dimensions"])},
+                "minItems": 1, "uniqueItems": True,
+            },
+            "filters": {
+                "type": "object",
+                "properties": {
+                    d: {"type": "array", "items": {"type": "string"}, "minItems": 1}
+                    for d in source_cfg["dimensions"] if d != "date"
+                },
+                "additionalProperties": False,
+            },
+            "date_from": {"type": "string", "format": "date"},
+            "date_to": {"type": "string", "format": "date"},
+        },
+        "required": ["dimension", "metric", "chart_type", "by_time_breakdown"],
+        "additionalProperties": False,
+    }
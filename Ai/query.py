@@ -1,16 +1,86 @@
 """
 Given dimension, metric, chart_type and source config: build SQL, run on DuckDB, return (DataFrame, SQL string).
+All helpers use the shared per-file connections from Ai.connection; run_query results are cached in Ai.result_cache.
+run_query answers from an ETL-built rollup table (ETL.rollups) when one covers the request, else the base table.
+result="arrow" returns a pyarrow.Table straight from DuckDB (no pandas materialization); Dashboard.charts and
+Ai.report.summarize accept either form.
+top_n keeps the N largest groups of a non-date query and folds the rest into one OTHER_LABEL row inside DuckDB.
+Time queries are bucketed with date_trunc at the finest TIME_GRAINS grain that keeps each line within
+max_points buckets over the table's date span; Ai.downsample trims what is still longer before plotting.
+Dimension columns may be ENUMs (ETL.schema); results always return group labels as VARCHAR.
+Results also carry window columns (insight_sql) from which Ai.report.insights builds the summary.
+filters (dimension = value / IN values) and date_from / date_to become a WHERE clause with bound parameters
+(filter_sql); only allowed column names are written into the SQL. On a view over the Hive-partitioned Parquet
+files of a "parquet" source (ETL.parquet_store), the date range also bounds the year/month partition columns,
+so DuckDB reads only the matching months' files.
+approximate=True answers a query that would scan the base table from its ETL-built sample (ETL.sample) instead:
+SUMs are scaled to the whole table and an error column holds the half-width of their APPROX_Z confidence
+interval. run_progressive yields that estimate first and the exact result after it.
 """
-import duckdb
+import datetime
+import os
+import textwrap
+import threading
+
 import pandas as pd
 
+from Ai import connection, result_cache, tracing
+from Ai.downsample import MAX_POINTS
+from config.sources import DEFAULT_TOP_N
+from ETL import catalog
+from ETL.rollups import ROLLUP_TABLE
+from ETL.sample import SAMPLE_TABLE
+
+# (db_path, table) -> (table version, [(rollup_table, dimension, row_count)])
+_rollup_catalog = {}
+_rollup_lock = threading.Lock()
+# (db_path, table) -> (table version, (min date, max date))
+_date_spans = {}
+# (db_path, table) -> (table version, (sample_table, sample_rows, base_rows) or None)
+_samples = {}
+# (db_path, table) -> (table version, whether table is a view with year/month partition columns)
+_partitioned = {}
+
+# date_trunc grains, finest first, with their length in days
+TIME_GRAINS = {"day": 1, "week": 7, "month": 30.44, "quarter": 91.31}
+
+RESULT_FORMATS = ("pandas", "arrow")
+OTHER_LABEL = "Other"
+# Buckets further than this many standard deviations from their line's mean are flagged as outliers
+OUTLIER_Z = 2.0
+# Approximate results: error columns are the half-width of this many standard errors (95% interval)
+APPROX_Z = 1.96
+
+
+def top_n_for(source_cfg: dict, chart_type: str, requested: int = None):
+    """
+    N for a non-date chart: the plan's top_n if given (0 = all groups), else the source's "top_n"
+    setting for chart_type, else DEFAULT_TOP_N. None means no limit.
+    """
+    if isinstance(requested, int) and not isinstance(requested, bool) and requested >= 0:
+        return requested or None
+    return source_cfg.get("top_n", DEFAULT_TOP_N).get(chart_type)
+
+
+def fetch(cur, sql: str, params: list = None, result: str = "pandas"):
+    """Run sql on cur; return a pandas DataFrame or, with result="arrow", a pyarrow.Table."""
+    with tracing.span("sql.execute"):
+        res = cur.execute(sql, params or [])
+    with tracing.span("sql.fetch", result=result) as attrs:
+        if result == "arrow":
+            # to_arrow_table is the newer name (DuckDB >= 1.4)
+            df = res.to_arrow_table() if hasattr(res, "to_arrow_table") else res.fetch_arrow_table()
+        else:
+            df = res.fetchdf()
+        attrs["rows"] = len(df)
+    return df
+
 
 def get_db_stats(db_path: str, table: str, columns_str: str = "") -> dict:
     """Return dict with row_count, table, db_path, columns for sidebar."""
     try:
-        conn = duckdb.connect(db_path)
-        row_count = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
-        conn.close()
+        with connection.cursor(db_path) as cur:
+            row_count = cur.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
         return {"row_count": row_count, "table": table, "db_path": db_path, "columns": columns_str or "—"}
     except Exception:
         return {"row_count": 0, "table": table, "db_path": db_path, "columns": columns_str or "—"}
@@ -19,25 +89,261 @@ def get_db_stats(db_path: str, table: str, columns_str: str = "") -> dict:
 def get_schema(db_path: str, table: str) -> list:
     """Return list of (column_name, type) for the table."""
     try:
-        conn = duckdb.connect(db_path)
-        schema = conn.execute(f"DESCRIBE {table}").fetchall()
-        conn.close()
-        return schema
+        with connection.cursor(db_path) as cur:
+            return cur.execute(f"DESCRIBE {table}").fetchall()
     except Exception:
         return []
 
 
-def get_table_preview(db_path: str, table: str, limit: int = 200) -> pd.DataFrame:
-    """Return DataFrame with first `limit` rows from table."""
+def get_table_preview(db_path: str, table: str, limit: int = 200, result: str = "pandas"):
+    """Return the first `limit` rows from table (DataFrame, or pyarrow.Table with result="arrow")."""
     try:
-        conn = duckdb.connect(db_path)
-        df = conn.execute(f"SELECT * FROM {table} LIMIT {limit}").fetchdf()
-        conn.close()
-        return df
+        with connection.cursor(db_path) as cur:
+            return fetch(cur, f"SELECT * FROM {table} LIMIT {limit}", result=result)
     except Exception:
         return pd.DataFrame()
 
 
+def list_rollups(db_path: str, table: str) -> list:
+    """[(rollup_table, dimension, row_count)] for table, read once per table version."""
+    key = (os.path.abspath(db_path), table)
+    version = result_cache.table_version(db_path)
+    cached = _rollup_catalog.get(key)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    try:
+        with connection.cursor(db_path) as cur:
+            rows = cur.execute(
+                f"SELECT rollup_table, dimension, row_count FROM {ROLLUP_TABLE} WHERE base_table = ?", [table]
+            ).fetchall()
+    except Exception:
+        rows = []
+    with _rollup_lock:
+        _rollup_catalog[key] = (version, rows)
+    return rows
+
+
+def pick_rollup(db_path: str, table: str, group_dimensions: list):
+    """Smallest rollup of table that has every non-date column in group_dimensions, or None."""
+    needed = {d for d in group_dimensions if d != "date"}
+    if len(needed) > 1:
+        return None
+    candidates = [(n, name) for name, dim, n in list_rollups(db_path, table) if needed <= {dim}]
+    return min(candidates)[1] if candidates else None
+
+
+def sample_for(db_path: str, table: str):
+    """(sample_table, sample_rows, base_rows) of table's ETL sample, read once per table version; None without one."""
+    key = (os.path.abspath(db_path), table)
+    version = result_cache.table_version(db_path)
+    cached = _samples.get(key)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    try:
+        with connection.cursor(db_path) as cur:
+            sample = cur.execute(
+                f"SELECT sample_table, sample_rows, base_rows FROM {SAMPLE_TABLE} WHERE base_table = ?", [table]
+            ).fetchone()
+    except Exception:
+        sample = None
+    with _rollup_lock:
+        _samples[key] = (version, sample)
+    return sample
+
+
+def sum_sql(column: str, sample=None) -> str:
+    """SUM(column), or on a sample (sample_for's tuple) the estimate of the whole table's SUM."""
+    if sample is None:
+        return f"SUM({column})"
+    _, n, total = sample
+    return f"CAST(SUM({column}) AS DOUBLE) * {total / n!r}"
+
+
+def error_sql(sums: str, squares: str, sample) -> str:
+    """
+    APPROX_Z x standard error of sum_sql's estimate for one group, given the SQL of the group's sample SUM
+    of the column (sums) and of its squares (squares): the estimator of a domain total under simple random
+    sampling without replacement, N^2 (1 - n/N) s^2 / n with s^2 taken over all n sample rows.
+    """
+    _, n, total = sample
+    scale = total * total * (1 - n / total) / (n * max(n - 1, 1))
+    return f"{APPROX_Z} * SQRT(GREATEST({squares} - POW({sums}, 2) / {n}, 0) * {scale!r})"
+
+
+def _error(column: str, sample) -> str:
+    return error_sql(f"SUM({column})", f"SUM(POW({column}, 2))", sample)
+
+
+def date_span(db_path: str, table: str, date_column: str) -> tuple:
+    """(min, max) of date_column from the ETL catalog, else read once per table version; (None, None) if unavailable."""
+    meta = catalog.load(db_path, table)
+    if meta is not None and meta.get("date_column") == date_column:
+        return meta["date_min"], meta["date_max"]
+    key = (os.path.abspath(db_path), table)
+    version = result_cache.table_version(db_path)
+    cached = _date_spans.get(key)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    try:
+        with connection.cursor(db_path) as cur:
+            span = cur.execute(f"SELECT MIN({date_column}), MAX({date_column}) FROM {table}").fetchone()
+    except Exception:
+        span = (None, None)
+    with _rollup_lock:
+        _date_spans[key] = (version, span)
+    return span
+
+
+def pick_grain(start, end, max_points: int = MAX_POINTS) -> str:
+    """Finest TIME_GRAINS grain giving at most max_points buckets between start and end (else the coarsest)."""
+    if start is None or end is None:
+        return "month"
+    days = (pd.Timestamp(end) - pd.Timestamp(start)).days
+    for grain, length in TIME_GRAINS.items():
+        if days / length + 1 <= max_points:
+            return grain
+    return list(TIME_GRAINS)[-1]
+
+
+def is_partitioned(db_path: str, table: str) -> bool:
+    """True if table is a view with year and month columns (ETL.parquet_store's view), read once per table version."""
+    key = (os.path.abspath(db_path), table)
+    version = result_cache.table_version(db_path)
+    cached = _partitioned.get(key)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    try:
+        with connection.cursor(db_path) as cur:
+            n = cur.execute(
+                "SELECT COUNT(*) FROM information_schema.columns JOIN information_schema.tables "
+                "USING (table_catalog, table_schema, table_name) WHERE table_name = ? "
+                "AND table_type = 'VIEW' AND column_name IN ('year', 'month')",
+                [table],
+            ).fetchone()[0]
+    except Exception:
+        n = 0
+    with _rollup_lock:
+        _partitioned[key] = (version, n == 2)
+    return n == 2
+
+
+def _day(value) -> datetime.date:
+    try:
+        return pd.Timestamp(value).date()
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid date {value!r}") from e
+
+
+def filter_sql(filters: dict, date_from, date_to, dimensions_list: list, date_column: str,
+               partitioned: bool = False) -> tuple:
+    """
+    (" WHERE ...", params) restricting rows to filters {dimension: value or [values]} and the inclusive
+    date range date_from..date_to (either may be None); ("", []) when nothing is filtered.
+    Values are bound as parameters; a dimension not in dimensions_list raises ValueError.
+    partitioned (is_partitioned): also bound the year/month partition columns by the date range, which
+    DuckDB prunes files on (it does not on date_column alone).
+    """
+    conds, params = [], []
+    for dim, values in (filters or {}).items():
+        if dim not in dimensions_list or dim == "date":
+            raise ValueError(f"Cannot filter on {dim!r}. Use one of {[d for d in dimensions_list if d != 'date']}")
+        values = [values] if isinstance(values, (str, int, float)) else list(values)
+        if not values:
+            continue
+        conds.append(f"{dim} = ?" if len(values) == 1 else f"{dim} IN ({', '.join('?' * len(values))})")
+        params += [str(v) for v in values]
+    if date_from is not None:
+        conds.append(f"{date_column} >= ?")
+        params.append(_day(date_from))
+        if partitioned:
+            conds.append("(year, month) >= (?, ?)")
+            params += [_day(date_from).year, _day(date_from).month]
+    if date_to is not None:
+        # Inclusive end day: everything before the next midnight
+        conds.append(f"{date_column} < ?")
+        params.append(_day(date_to) + datetime.timedelta(days=1))
+        if partitioned:
+            conds.append("(year, month) <= (?, ?)")
+            params += [_day(date_to).year, _day(date_to).month]
+    return (f" WHERE {' AND '.join(conds)}" if conds else ""), params
+
+
+def _names(value, allowed: list) -> list:
+    """value (a name or a list of names) restricted to allowed, without repeats; [allowed[0]] if none is allowed."""
+    names = [value] if isinstance(value, str) else list(value or [])
+    return [n for n in dict.fromkeys(names) if n in allowed] or [allowed[0]]
+
+
+def _multi_sql(dims: list, metrics: list, source: str, date_column: str, grain: str, top_n: int,
+               insights: bool, where: str = "", sample=None) -> tuple:
+    """
+    (sql, order) answering every dimension x every metric in one scan: GROUPING SETS with one set per
+    dimension, one SUM per metric. Rows: dimension (which set), dim (group value as text; "date" groups are
+    the bucket's first day), then one DOUBLE column per metric. top_n keeps the N largest groups of each non-date
+    dimension by the first metric (no Other row). insights adds {metric}__share, each group's share of its
+    dimension's total (taken before the top_n cut). where is filter_sql's clause. sample (sample_for's tuple)
+    scales the SUMs of a sample table and adds {metric}__error.
+    """
+    cols = {d: "__date" if d == "date" else d for d in dims}
+    if "date" in dims:
+        source = f"(SELECT *, CAST(date_trunc('{grain}', {date_column}) AS DATE) AS __date FROM {source}{where}) AS s"
+        where = ""
+    which = " ".join(f"WHEN GROUPING({c}) = 0 THEN '{d}'" for d, c in cols.items())
+    value = " ".join(f"WHEN GROUPING({c}) = 0 THEN CAST({c} AS VARCHAR)" for c in cols.values())
+    # As DOUBLE: SUM of an integer column is HUGEINT, a Decimal in Arrow that does not mix with the float shares
+    sums = ", ".join(f"CAST({sum_sql(m, sample)} AS DOUBLE) AS {m}" for m in metrics)
+    if sample is not None:
+        sums += "".join(f", {_error(m, sample)} AS {m}__error" for m in metrics)
+    sets = ", ".join(f"({c})" for c in cols.values())
+    shares = "".join(
+        f",\n        {m} / NULLIF(SUM({m}) OVER (PARTITION BY dimension), 0) AS {m}__share" for m in metrics
+    ) if insights else ""
+    sql = f"""
+    WITH grouped AS (
+        SELECT
+            CASE {which} END AS dimension,
+            CASE {value} END AS dim,
+            {sums}
+        FROM {source}{where}
+        GROUP BY GROUPING SETS ({sets})
+    )
+    SELECT *{shares}
+    FROM grouped
+    """
+    if top_n:
+        sql += (
+            f"QUALIFY dimension = 'date' OR row_number() OVER "
+            f"(PARTITION BY dimension ORDER BY {metrics[0]} DESC NULLS LAST, dim) <= {int(top_n)}\n"
+        )
+    position = " ".join(f"WHEN '{d}' THEN {i}" for i, d in enumerate(dims))
+    order = f"CASE dimension {position} END, CASE WHEN dimension = 'date' THEN dim END, {metrics[0]} DESC"
+    return sql, order
+
+
+def insight_sql(sql: str, by_time: bool, by_line: bool = False) -> str:
+    """
+    Wrap a chart query (dim/value or date/value[/category] rows) with the window columns Ai.report reads,
+    computed over its grouped rows in the same statement: share of the grand total; for time results, per
+    line, growth vs the previous bucket, is_max / is_min, outlier (|value - mean| > OUTLIER_Z stddev) and,
+    with a breakdown, line_share (the line's share of the grand total).
+    """
+    inner = textwrap.indent(sql, "    ")
+    cols = ["value / NULLIF(SUM(value) OVER (), 0) AS share"]
+    if not by_time:
+        return f"SELECT *, {cols[0]}\nFROM (\n{inner}\n) AS q"
+    cols += [
+        "value / NULLIF(LAG(value) OVER (w ORDER BY date), 0) - 1 AS growth",
+        "value = MAX(value) OVER w AS is_max",
+        "value = MIN(value) OVER w AS is_min",
+        f"COALESCE(ABS(value - AVG(value) OVER w) > {OUTLIER_Z} * STDDEV_POP(value) OVER w, false) AS outlier",
+    ]
+    if by_line:
+        cols.append("SUM(value) OVER w / NULLIF(SUM(value) OVER (), 0) AS line_share")
+    partition = "PARTITION BY category" if by_line else ""
+    select = ",\n    ".join(["*"] + cols)
+    return f"SELECT {select}\nFROM (\n{inner}\n) AS q\nWINDOW w AS ({partition})"
+
+
 def run_query(
     dimension: str,
     metric: str,
@@ -49,44 +355,161 @@ def run_query(
     date_column: str,
     breakdown_dimension: str = None,
     breakdown_by_category: bool = False,
+    use_cache: bool = True,
+    use_rollups: bool = True,
+    result: str = "pandas",
+    top_n: int = None,
+    grain: str = None,
+    max_points: int = MAX_POINTS,
+    insights: bool = True,
+    filters: dict = None,
+    date_from=None,
+    date_to=None,
+    approximate: bool = False,
+    cached_only: bool = False,
 ):
     """
-    Return (df, sql_string).
+    Return (df, sql_string). df may come from the shared result cache: treat it as read-only.
+    dimension / metric may also be lists: several dimensions or metrics are answered in one scan (_multi_sql),
+    as rows dimension, dim, one column per metric (breakdown_by_category does not apply).
+    result: "pandas" (DataFrame) or "arrow" (pyarrow.Table, cheaper for wide or high-cardinality results).
+    use_rollups: read SUMs from a covering rollup table (same SQL shape, fewer rows) when one exists.
+    top_n (non-date dimension only): at most top_n + 1 rows; columns dim, value, other (True for the
+    OTHER_LABEL row summing the remaining groups) and groups (number of groups in the row).
     When breakdown_by_category=True and dimension is date, group by date and breakdown_dimension (one line per breakdown).
     dimensions_list: allowed dimension names (use "date" for time; we map to date_column in SQL).
+    grain: time bucket for dimension "date" (one of TIME_GRAINS); None picks it from the date span and
+    max_points. The date column of time results holds the bucket's first day.
+    insights: add the insight_sql columns (share, growth, is_max, is_min, outlier, line_share) for Ai.report
+    ({metric}__share for several dimensions or metrics).
+    filters: {dimension: value or [values]} to keep; date_from / date_to: inclusive date range on date_column
+    (dates or ISO strings). Both are passed to DuckDB as bound parameters (filter_sql); on a "parquet"
+    source's view the date range also selects the year/month partitions read.
+    approximate: when no rollup covers the query and the table has an ETL sample, run it on the sample:
+    SUMs are scaled to the whole table and an error column (value_error; {metric}__error for several
+    metrics) holds the APPROX_Z interval half-width. Results without it are exact (see is_approximate).
+    cached_only: return (None, sql) instead of running a query whose result is not cached.
     """
-    if dimension not in dimensions_list:
-        dimension = dimensions_list[0]
-    if metric not in metrics_list:
-        metric = metrics_list[0]
+    if result not in RESULT_FORMATS:
+        raise ValueError(f"Unknown result format {result!r}. Use one of {RESULT_FORMATS}")
+    if grain is not None and grain not in TIME_GRAINS:
+        raise ValueError(f"Unknown grain {grain!r}. Use one of {list(TIME_GRAINS)}")
+    dims = _names(dimension, dimensions_list)
+    metrics = _names(metric, metrics_list)
+    multi = len(dims) > 1 or len(metrics) > 1
+    dimension, metric = dims[0], metrics[0]
+    # Validates the filters before anything is read; rebuilt below for a partitioned source
+    where, params = filter_sql(filters, date_from, date_to, dimensions_list, date_column)
 
     # SQL column for grouping by "time": use actual date column
     group_col = date_column if dimension == "date" else dimension
+    grouped = list(dims)
+    if not multi and dimension == "date" and breakdown_by_category and breakdown_dimension:
+        grouped.append(breakdown_dimension)
+    # A rollup can serve the query only if it also has the filtered columns
+    needed = grouped + [d for d, v in (filters or {}).items() if v not in (None, [], ())]
+    source = (pick_rollup(db_path, table, needed) if use_rollups else None) or table
+    # Rollups are small already; only a base table scan is worth estimating
+    sample = sample_for(db_path, table) if approximate and source == table else None
+    if sample is not None:
+        source = sample[0]
+    elif source == table and (date_from is not None or date_to is not None) and is_partitioned(db_path, table):
+        where, params = filter_sql(filters, date_from, date_to, dimensions_list, date_column, partitioned=True)
+    value = sum_sql(metric, sample)
+    error = f", {_error(metric, sample)} AS value_error" if sample is not None else ""
+    if "date" in dims and grain is None:
+        start, end = date_span(db_path, table, date_column)
+        # Buckets only need to cover the filtered part of the span
+        if date_from is not None:
+            start = max(pd.Timestamp(start), pd.Timestamp(_day(date_from))) if start is not None else None
+        if date_to is not None:
+            end = min(pd.Timestamp(end), pd.Timestamp(_day(date_to))) if end is not None else None
+        grain = pick_grain(start, end, max_points=max_points)
 
-    conn = duckdb.connect(db_path)
-    if dimension == "date":
+    if multi:
+        sql, order = _multi_sql(dims, metrics, source, date_column, grain, top_n, insights, where, sample)
+    elif dimension == "date":
+        bucket = f"CAST(date_trunc('{grain}', {date_column}) AS DATE)"
         if breakdown_by_category and breakdown_dimension:
             sql = f"""
-            SELECT strftime({date_column}, '%Y-%m') AS date, {breakdown_dimension} AS category, SUM({metric}) AS value
-            FROM {table}
-            GROUP BY strftime({date_column}, '%Y-%m'), {breakdown_dimension}
-            ORDER BY date, category
+            SELECT {bucket} AS date, CAST({breakdown_dimension} AS VARCHAR) AS category, {value} AS value{error}
+            FROM {source}{where}
+            GROUP BY {bucket}, {breakdown_dimension}
             """
+            order = "date, category"
         else:
             sql = f"""
-            SELECT strftime({date_column}, '%Y-%m') AS date, SUM({metric}) AS value
-            FROM {table}
-            GROUP BY strftime({date_column}, '%Y-%m')
-            ORDER BY date
+            SELECT {bucket} AS date, {value} AS value{error}
+            FROM {source}{where}
+            GROUP BY {bucket}
             """
+            order = "date"
+    elif top_n:
+        # Fold groups ranked below top_n into one row (unless that would be a single group): <= top_n + 1 rows leave DuckDB
+        parts = fold = ""
+        if sample is not None:
+            # The Other row's error needs the sample sums of its groups, not their scaled values
+            parts = f", SUM({metric}) AS __sum, SUM(POW({metric}, 2)) AS __squares"
+            fold = f", {error_sql('SUM(__sum)', 'SUM(__squares)', sample)} AS value_error"
+        sql = f"""
+        WITH grouped AS (
+            SELECT {group_col} AS dim, {value} AS value{parts} FROM {source}{where} GROUP BY {group_col}
+        ), ranked AS (
+            SELECT *, row_number() OVER (ORDER BY value DESC NULLS LAST, dim) > {int(top_n)}
+                AND COUNT(*) OVER () > {int(top_n) + 1} AS other
+            FROM grouped
+        )
+        SELECT CASE WHEN other THEN '{OTHER_LABEL}' ELSE CAST(dim AS VARCHAR) END AS dim, SUM(value) AS value,
+            other, COUNT(*) AS groups{fold}
+        FROM ranked
+        GROUP BY ALL
+        """
+        order = "other, value DESC"
     else:
         sql = f"""
-        SELECT {group_col} AS dim, SUM({metric}) AS value
-        FROM {table}
+        SELECT CAST({group_col} AS VARCHAR) AS dim, {value} AS value{error}
+        FROM {source}{where}
         GROUP BY {group_col}
-        ORDER BY value DESC
         """
-    sql = sql.strip()
-    df = conn.execute(sql).fetchdf()
-    conn.close()
+        order = "value DESC"
+    sql = textwrap.dedent(sql).strip()
+    if insights and not multi:
+        sql = insight_sql(sql, by_time=dimension == "date", by_line=len(grouped) > 1)
+    sql = f"{sql}\nORDER BY {order}"
+    key = result_cache.make_key(db_path, table, sql, tuple(params)) + (result,)
+    if cached_only:
+        return (result_cache.peek(key) if use_cache else None), sql
+    with tracing.span("query", table=table, source=source, result=result, approximate=sample is not None) as attrs:
+        df = result_cache.get(key) if use_cache else None
+        attrs["cache"] = "hit" if df is not None else "miss" if use_cache else "off"
+        tracing.count("result_cache", outcome=attrs["cache"])
+        if df is None:
+            with connection.cursor(db_path) as cur:
+                df = fetch(cur, sql, params, result=result)
+            result_cache.put(key, df)
+        attrs["rows"] = len(df)
     return df, sql
+
+
+def is_approximate(df) -> bool:
+    """True for a run_query result estimated from a sample (it has error columns)."""
+    columns = df.column_names if hasattr(df, "column_names") else list(df.columns)
+    return any(c == "value_error" or c.endswith("__error") for c in columns)
+
+
+def run_progressive(*args, **kwargs):
+    """
+    Yield (df, sql, approximate) for run_query(*args, **kwargs): the sample's estimate first (approximate=True)
+    when the query would scan a sampled table, then the exact result. A cached exact result is yielded alone.
+    """
+    kwargs = {k: v for k, v in kwargs.items() if k not in ("approximate", "cached_only")}
+    df, sql = run_query(*args, cached_only=True, **kwargs)
+    if df is None:
+        estimate, estimate_sql = run_query(*args, approximate=True, **kwargs)
+        if not is_approximate(estimate):
+            # No sample applied: that was the exact query
+            yield estimate, estimate_sql, False
+            return
+        yield estimate, estimate_sql, True
+        df, sql = run_query(*args, **kwargs)
+    yield df, sql, False
@@ -1,18 +1,166 @@
 """
-Generate a short text summary from DataFrame stats (optional; can use LLM later).
+Summaries of run_query results: insights() returns structured fields plus text, summarize() just the text.
+The figures come from the window columns Ai.query.insight_sql adds in the chart query itself (share, growth,
+is_max / is_min, outlier, line_share), so only the already-grouped rows are read here, as Arrow columns
+(pandas results are wrapped, not copied row by row). Without those columns only totals and top groups are given.
+A top-N result's "Other" row (other=True) is left out of the top groups and reported with its group count and share.
+Multi-metric / multi-dimension results (dimension, dim, one column per metric) get totals and top groups per metric.
 """
-import pandas as pd
-
-
-def summarize(df: pd.DataFrame, metric: str = "value") -> str:
-    if df is None or df.empty:
-        return "No data."
-    total = df[metric].sum()
-    top = df.nlargest(3, metric)
-    parts = [f"Total: {total:,.2f}."]
-    if "dim" in df.columns:
-        for _, row in top.iterrows():
-            parts.append(f"{row['dim']}: {row[metric]:,.2f}")
-    elif "date" in df.columns:
-        parts.append(f"Time range: {df['date'].iloc[0]} to {df['date'].iloc[-1]}.")
+import datetime
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+TOP_GROUPS = 3
+# Breakdown lines described in the text (largest first); insights() returns all of them
+TEXT_LINES = 3
+
+
+def summarize(df, metric: str = "value") -> str:
+    return insights(df, metric)["text"]
+
+
+def insights(df, metric: str = "value") -> dict:
+    """
+    {"kind": "empty" | "dimension" | "time" | "multi", "total", ..., "text"}.
+    dimension: "groups", "top" [{label, value, share}], "other" ({label, groups, value, share} or None).
+    time: "start", "end", "lines" [{line, total, share, peak, low, growth, outliers}], largest line first;
+    peak / low are {date, value}, growth is the last bucket vs the one before, outliers lists bucket dates.
+    multi: "metrics", "totals" {metric: total}, "facets" [{dimension, top: {metric: {label, value, share}}}];
+    "total" is the first metric's.
+    """
+    if df is None or len(df) == 0:
+        return {"kind": "empty", "text": "No data."}
+    table = df if isinstance(df, pa.Table) else pa.Table.from_pandas(df, preserve_index=False)
+    if "dimension" in table.column_names:
+        out = {"kind": "multi", **_multi_insights(table)}
+        out["text"] = _text(out)
+        return out
+    total = pc.sum(table[metric]).as_py() or 0
+    if "dim" in table.column_names:
+        out = {"kind": "dimension", "total": total, **_dimension_insights(table, metric, total)}
+    elif "date" in table.column_names:
+        out = {"kind": "time", "total": total, **_time_insights(table, metric, total)}
+    else:
+        out = {"kind": "other", "total": total}
+    out["text"] = _text(out)
+    return out
+
+
+def _dimension_insights(table: pa.Table, metric: str, total: float) -> dict:
+    if "share" not in table.column_names:
+        share = pc.divide(pc.cast(table[metric], pa.float64()), total) if total else pa.nulls(len(table), pa.float64())
+        table = table.append_column("share", share)
+    has_other = "other" in table.column_names
+    other = table.filter(table["other"]) if has_other else table.slice(0, 0)
+    rest = table.filter(pc.invert(table["other"])) if other.num_rows else table
+    top = rest.take(pc.select_k_unstable(rest, TOP_GROUPS, [(metric, "descending")])).sort_by([(metric, "descending")])
+    groups = rest.num_rows + (pc.sum(other["groups"]).as_py() if other.num_rows else 0)
+    return {
+        "groups": groups,
+        "top": [{"label": r["dim"], "value": r[metric], "share": r["share"]} for r in top.to_pylist()],
+        "other": next(
+            ({"label": r["dim"], "groups": r["groups"], "value": r[metric], "share": r["share"]}
+             for r in other.to_pylist()),
+            None,
+        ),
+    }
+
+
+def _multi_insights(table: pa.Table) -> dict:
+    metrics = [c for c in table.column_names if c not in ("dimension", "dim") and not c.endswith(("__share", "__error"))]
+    facets, totals = {}, {}
+    for row in table.to_pylist():
+        facet = facets.setdefault(row["dimension"], {"dimension": row["dimension"], "top": {}})
+        for m in metrics:
+            share = row.get(f"{m}__share")
+            if m not in totals:
+                # value / share undoes a top_n cut; without shares the first dimension's rows are summed
+                totals[m] = row[m] / share if share else None
+            best = facet["top"].get(m)
+            if row[m] is not None and (best is None or row[m] > best["value"]):
+                facet["top"][m] = {"label": row["dim"], "value": row[m], "share": share}
+    # Date groups are never cut by top_n
+    first = "date" if "date" in facets else next(iter(facets), None)
+    for m in metrics:
+        if totals[m] is None:
+            totals[m] = sum(r[m] or 0 for r in table.to_pylist() if r["dimension"] == first)
+    return {"metrics": metrics, "totals": totals, "total": totals[metrics[0]], "facets": list(facets.values())}
+
+
+def _day(value):
+    """Midnight timestamps (pandas results) as dates, so both result forms read the same."""
+    if isinstance(value, datetime.datetime) and value.time() == datetime.time(0):
+        return value.date()
+    return value
+
+
+def _time_insights(table: pa.Table, metric: str, total: float) -> dict:
+    dates = table["date"]
+    out = {"start": _day(pc.min(dates).as_py()), "end": _day(pc.max(dates).as_py()), "lines": []}
+    if "is_max" not in table.column_names:
+        return out
+    by_line = "category" in table.column_names
+    names = pc.unique(table["category"]).to_pylist() if by_line else [None]
+    for name in names:
+        rows = (table.filter(pc.equal(table["category"], name)) if by_line else table).to_pylist()
+        line_total = sum(r[metric] or 0 for r in rows)
+        # A line of only NULL values has no flagged row
+        peak = next((r for r in rows if r["is_max"]), rows[0])
+        low = next((r for r in rows if r["is_min"]), rows[0])
+        out["lines"].append({
+            "line": name,
+            "total": line_total,
+            "share": rows[0]["line_share"] if by_line else 1.0 if total else None,
+            "peak": {"date": _day(peak["date"]), "value": peak[metric]},
+            "low": {"date": _day(low["date"]), "value": low[metric]},
+            "growth": rows[-1]["growth"],
+            "outliers": [_day(r["date"]) for r in rows if r["outlier"]],
+        })
+    out["lines"].sort(key=lambda line: -line["total"])
+    return out
+
+
+def _pct(x) -> str:
+    return f"{x:+.1%}" if x is not None else "n/a"
+
+
+def _text(out: dict) -> str:
+    if out["kind"] == "multi":
+        parts = []
+        for m in out["metrics"]:
+            tops = []
+            for facet in out["facets"]:
+                top = facet["top"].get(m)
+                if top is None:
+                    continue
+                share = f" ({top['share']:.0%})" if top["share"] is not None else ""
+                word = "peak" if facet["dimension"] == "date" else "top"
+                tops.append(f"{word} {facet['dimension']} {top['label']}: {top['value']:,.2f}{share}")
+            parts.append(f"{m}: total {out['totals'][m]:,.2f}" + ("; " + ", ".join(tops) if tops else "") + ".")
+        return " ".join(p[0].upper() + p[1:] for p in parts)
+    parts = [f"Total: {out['total']:,.2f}."]
+    if out["kind"] == "dimension":
+        for g in out["top"]:
+            share = f" ({g['share']:.0%})" if g["share"] is not None else ""
+            parts.append(f"{g['label']}: {g['value']:,.2f}{share}")
+        if out["other"]:
+            o = out["other"]
+            parts.append(_other_text(o["label"], o["groups"], o["value"], out["total"]))
+    elif out["kind"] == "time":
+        parts.append(f"Time range: {out['start']} to {out['end']}.")
+        for line in out["lines"][:TEXT_LINES]:
+            name = f"{line['line']} ({line['share']:.0%} of total): " if line["line"] is not None else ""
+            text = (
+                f"{name}peak {line['peak']['date']} ({line['peak']['value']:,.2f}), "
+                f"low {line['low']['date']} ({line['low']['value']:,.2f}), last period {_pct(line['growth'])}"
+            )
+            if line["outliers"]:
+                text += ", outliers " + ", ".join(str(d) for d in line["outliers"])
+            parts.append(text[0].upper() + text[1:] + ".")
     return " ".join(parts)
+
+
+def _other_text(label: str, groups: int, value: float, total: float) -> str:
+    share = f", {value / total:.0%} of total" if total else ""
+    return f"{label} ({groups} more): {value:,.2f}{share}"
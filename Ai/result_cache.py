@@ -0,0 +1,120 @@
+"""
+Process-wide, size-bounded LRU cache for query results, shared by all Streamlit sessions.
+Keys include a table version, so a reload (ETL.run_etl.run calls invalidate()) or a rewrite of the
+DuckDB file by another process makes old entries unreachable; they then age out of the LRU.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+MAX_ENTRIES = 256
+MAX_BYTES = 64 * 1024 * 1024
+
+
+class ResultCache:
+    """Thread-safe LRU bounded by entry count and total bytes; counts hits and misses."""
+
+    def __init__(self, max_entries: int = MAX_ENTRIES, max_bytes: int = MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._data = OrderedDict()  # key -> (value, nbytes)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def peek(self, key):
+        """Cached value or None, without counting a hit or miss."""
+        with self._lock:
+            item = self._data.get(key)
+            return item[0] if item is not None else None
+
+    def put(self, key, value, nbytes: int):
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._data[key] = (value, nbytes)
+            self._bytes += nbytes
+            while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, n) = self._data.popitem(last=False)
+                self._bytes -= n
+
+    def drop(self, predicate):
+        """Remove entries whose key matches predicate(key)."""
+        with self._lock:
+            for key in [k for k in self._data if predicate(k)]:
+                self._bytes -= self._data.pop(key)[1]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._data), "bytes": self._bytes}
+
+
+_cache = ResultCache()
+_generations = {}  # db_path -> reload counter in this process
+_gen_lock = threading.Lock()
+
+
+def table_version(db_path: str) -> tuple:
+    """In-process reload counter plus the DuckDB file's (and WAL's) mtime/size; cheap, no DB access."""
+    db_path = os.path.abspath(db_path)
+    stamp = []
+    for path in (db_path, db_path + ".wal"):
+        try:
+            st = os.stat(path)
+            stamp.append((st.st_ino, st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            stamp.append(None)
+    return (_generations.get(db_path, 0), *stamp)
+
+
+def make_key(db_path: str, table: str, sql: str, params: tuple = ()) -> tuple:
+    db_path = os.path.abspath(db_path)
+    return (db_path, table, table_version(db_path), sql, params)
+
+
+def get(key):
+    return _cache.get(key)
+
+
+def peek(key):
+    """Cached result for key or None; not counted in stats()."""
+    return _cache.peek(key)
+
+
+def nbytes(df) -> int:
+    """Memory held by a DataFrame or pyarrow.Table result."""
+    if hasattr(df, "memory_usage"):
+        return int(df.memory_usage(index=True, deep=True).sum())
+    return int(df.nbytes)
+
+
+def put(key, df):
+    """Cache a DataFrame or pyarrow.Table result; callers must treat returned results as read-only."""
+    _cache.put(key, df, nbytes(df))
+
+
+def invalidate(db_path: str, table: str = None):
+    """Bump db_path's version (in-flight queries cannot repopulate live keys); drop results for table (all if None)."""
+    db_path = os.path.abspath(db_path)
+    with _gen_lock:
+        _generations[db_path] = _generations.get(db_path, 0) + 1
+    _cache.drop(lambda k: k[0] == db_path and table in (None, k[1]))
+
+
+def stats() -> dict:
+    """Return {"hits", "misses", "entries", "bytes"} for the process-wide cache."""
+    return _cache.stats()
@@ -0,0 +1,207 @@
+"""
+Lightweight spans and counters for the sentence -> chart pipeline and the ETL; standard library only.
+    with trace("request", source="sales") as t:      # root: collects the spans below into t.spans
+        with span("plan") as attrs:                  # times the block; attrs can be filled in
+            attrs["origin"] = "cache"
+        count("plan_origin", origin="cache")
+Every span feeds a process-wide histogram and counters feed process-wide totals, readable three ways:
+- snapshot() / Trace.spans for the dashboard panel,
+- one JSON log line per span on the "ai_analyzer.trace" logger (set AI_ANALYZER_TRACE_LOG to a file path or
+  "-" for stderr to enable it),
+- prometheus_text(), also written to AI_ANALYZER_METRICS_FILE (if set) after every root trace, for a
+  node_exporter textfile collector.
+"""
+import contextlib
+import contextvars
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+
+PREFIX = "ai_analyzer"
+# Histogram buckets (seconds) for span durations
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LOGGER = logging.getLogger("ai_analyzer.trace")
+
+
+class Trace:
+    """Spans and counters recorded under one root trace(); spans are dicts name, start_ms, ms, depth, attrs."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.id = uuid.uuid4().hex[:16]
+        self.t0 = time.perf_counter()
+        self.spans = []
+        self.counters = {}
+
+    def ordered(self) -> list:
+        """Spans in start order (they are recorded as they end)."""
+        return sorted(self.spans, key=lambda s: (s["start_ms"], s["depth"]))
+
+    def total_ms(self) -> float:
+        """Duration of the root span (0 while the trace is still open)."""
+        return next((s["ms"] for s in self.spans if s["depth"] == 0), 0.0)
+
+
+_trace = contextvars.ContextVar("ai_analyzer_trace", default=None)
+_depth = contextvars.ContextVar("ai_analyzer_span_depth", default=0)
+_lock = threading.Lock()
+_histograms = {}  # span name -> {"buckets": per-bucket counts (last: above BUCKETS), "sum": seconds, "count"}
+_counters = {}  # (name, sorted label items) -> value
+
+
+def _observe(name: str, seconds: float):
+    with _lock:
+        h = _histograms.get(name)
+        if h is None:
+            h = _histograms[name] = {"buckets": [0] * (len(BUCKETS) + 1), "sum": 0.0, "count": 0}
+        i = next((i for i, le in enumerate(BUCKETS) if seconds <= le), len(BUCKETS))
+        h["buckets"][i] += 1
+        h["sum"] += seconds
+        h["count"] += 1
+
+
+def _log(event: dict):
+    if LOGGER.isEnabledFor(logging.INFO):
+        LOGGER.info(json.dumps(event, default=str))
+
+
+@contextlib.contextmanager
+def span(name: str, **attrs):
+    """Time the block as span `name`; yields attrs (a dict the block may add to). Exceptions are recorded and re-raised."""
+    depth = _depth.get()
+    token = _depth.set(depth + 1)
+    t0 = time.perf_counter()
+    try:
+        yield attrs
+    except BaseException as e:
+        attrs["error"] = type(e).__name__
+        raise
+    finally:
+        _depth.reset(token)
+        seconds = time.perf_counter() - t0
+        _observe(name, seconds)
+        tr = _trace.get()
+        record = {"name": name, "ms": round(seconds * 1000, 3), "depth": depth, "attrs": attrs}
+        if tr is not None:
+            record["start_ms"] = round((t0 - tr.t0) * 1000, 3)
+            tr.spans.append(record)
+        _log({"event": "span", "trace": tr.id if tr else None, "trace_name": tr.name if tr else None, **record})
+
+
+@contextlib.contextmanager
+def trace(name: str, **attrs):
+    """Root span: yields a Trace collecting every span and counter inside the block (also across nested calls)."""
+    tr = Trace(name)
+    token, depth_token = _trace.set(tr), _depth.set(0)
+    try:
+        with span(name, **attrs):
+            yield tr
+    finally:
+        _trace.reset(token)
+        _depth.reset(depth_token)
+        if os.environ.get("AI_ANALYZER_METRICS_FILE"):
+            write_prometheus()
+
+
+def count(name: str, value: float = 1, **labels):
+    """Add value to counter `name` with labels (process-wide, and on the current trace)."""
+    key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+    tr = _trace.get()
+    if tr is not None:
+        tr.counters[key] = tr.counters.get(key, 0) + value
+
+
+def snapshot() -> dict:
+    """{"spans": {name: {count, avg_ms, total_s}}, "counters": {"name{labels}": value}} for display."""
+    with _lock:
+        spans = {
+            name: {"count": h["count"], "avg_ms": round(h["sum"] / h["count"] * 1000, 3) if h["count"] else 0.0,
+                   "total_s": round(h["sum"], 3)}
+            for name, h in sorted(_histograms.items())
+        }
+        counters = {series_name(name, labels): value for (name, labels), value in sorted(_counters.items())}
+    return {"spans": spans, "counters": counters}
+
+
+def _metric(name: str) -> str:
+    return f"{PREFIX}_" + "".join(c if c.isalnum() else "_" for c in name)
+
+
+def series_name(name: str, labels) -> str:
+    """'name{k="v",...}' for a counter key's name and label items."""
+    if not labels:
+        return name
+    inner = ",".join(f'{k}="{v}"' for k, v in labels)
+    return f"{name}{{{inner}}}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def prometheus_text() -> str:
+    """Prometheus exposition format: span duration histogram plus one counter family per count() name."""
+    with _lock:
+        histograms = {name: dict(h, buckets=list(h["buckets"])) for name, h in _histograms.items()}
+        counters = dict(_counters)
+    lines = [f"# HELP {PREFIX}_span_seconds Duration of pipeline stages.", f"# TYPE {PREFIX}_span_seconds histogram"]
+    for name, h in sorted(histograms.items()):
+        label = f'span="{_escape(name)}"'
+        cumulative = 0
+        for le, n in zip([*map(str, BUCKETS), "+Inf"], h["buckets"]):
+            cumulative += n
+            lines.append(f'{PREFIX}_span_seconds_bucket{{{label},le="{le}"}} {cumulative}')
+        lines.append(f"{PREFIX}_span_seconds_sum{{{label}}} {h['sum']:.6f}")
+        lines.append(f"{PREFIX}_span_seconds_count{{{label}}} {h['count']}")
+    families = {}
+    for (name, labels), value in counters.items():
+        families.setdefault(name, []).append((labels, value))
+    for name, series in sorted(families.items()):
+        metric = _metric(name) + "_total"
+        lines.append(f"# TYPE {metric} counter")
+        for labels, value in sorted(series):
+            inner = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+            lines.append(f"{metric}{{{inner}}} {value:g}" if inner else f"{metric} {value:g}")
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path: str = None):
+    """Write prometheus_text() to path (default AI_ANALYZER_METRICS_FILE) atomically; errors are ignored."""
+    path = path or os.environ.get("AI_ANALYZER_METRICS_FILE")
+    if not path:
+        return
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "w") as f:
+            f.write(prometheus_text())
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+
+def reset():
+    """Clear process-wide histograms and counters."""
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+
+
+def _configure_log():
+    target = os.environ.get("AI_ANALYZER_TRACE_LOG")
+    if not target or LOGGER.handlers:
+        return
+    handler = logging.StreamHandler(sys.stderr) if target == "-" else logging.FileHandler(target)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    LOGGER.addHandler(handler)
+    LOGGER.setLevel(logging.INFO)
+    LOGGER.propagate = False
+
+
+_configure_log()
@@ -9,130 +9,106 @@ ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 if ROOT not in sys.path:
     sys.path.insert(0, ROOT)
 
-import streamlit as st
 import duckdb
-import pandas as pd
+import streamlit as st
 from config.sources import get_source_ids, resolve_source_paths, SOURCES, CHART_TYPES, CHART_LABELS
 from Dashboard.charts import get_chart
-from Ai.report import summarize
-
-
-def _get_db_stats(db_path: str, table: str, columns_str: str) -> dict:
-    """Sidebar DB overview: use duckdb directly to avoid cached module signature issues."""
-    try:
-        conn = duckdb.connect(db_path)
-        row_count = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
-        conn.close()
-        return {"row_count": row_count, "table": table, "db_path": db_path, "columns": columns_str}
-    except Exception:
-        return {"row_count": 0, "table": table, "db_path": db_path, "columns": columns_str}
-
-
-def _get_schema(db_path: str, table: str) -> list:
-    try:
-        conn = duckdb.connect(db_path)
-        schema = conn.execute(f"DESCRIBE {table}").fetchall()
-        conn.close()
-        return schema
-    except Exception:
-        return []
-
-
-def _get_table_preview(db_path: str, table: str, limit: int = 200):
-    try:
-        conn = duckdb.connect(db_path)
-        df = conn.execute(f"SELECT * FROM {table} LIMIT {limit}").fetchdf()
-        conn.close()
-        return df
-    except Exception:
-        return pd.DataFrame()
-
-
-def _run_query(
-    dimension: str,
-    metric: str,
-    db_path: str,
-    table: str,
-    dimensions_list: list,
-    metrics_list: list,
-    date_column: str,
-    breakdown_dimension: str = None,
-    breakdown_by_category: bool = False,
-):
-    """Run aggregation query in DuckDB. Returns (df, sql_str). Implemented here to avoid cached Ai.query signature issues."""
-    if dimension not in dimensions_list:
-        dimension = dimensions_list[0]
-    if metric not in metrics_list:
-        metric = metrics_list[0]
-    group_col = date_column if dimension == "date" else dimension
-    conn = duckdb.connect(db_path)
-    try:
-        if dimension == "date":
-            if breakdown_by_category and breakdown_dimension:
-                sql = f"""
-                SELECT strftime({date_column}, '%Y-%m') AS date, {breakdown_dimension} AS category, SUM({metric}) AS value
-                FROM {table}
-                GROUP BY strftime({date_column}, '%Y-%m'), {breakdown_dimension}
-                ORDER BY date, category
-                """
-            else:
-                sql = f"""
-                SELECT strftime({date_column}, '%Y-%m') AS date, SUM({metric}) AS value
-                FROM {table}
-                GROUP BY strftime({date_column}, '%Y-%m')
-                ORDER BY date
-                """
-        else:
-            sql = f"""
-            SELECT {group_col} AS dim, SUM({metric}) AS value
-            FROM {table}
-            GROUP BY {group_col}
-            ORDER BY value DESC
-            """
-        sql = sql.strip()
-        df = conn.execute(sql).fetchdf()
-        return df, sql
-    finally:
-        conn.close()
-
-
-def fallback_plan(user_message: str, source_cfg: dict) -> dict:
-    """When Ollama is not available, pick dimension/metric/chart from keywords."""
-    msg = user_message.lower()
-    dims = source_cfg["dimensions"]
-    metrics = source_cfg["metrics"]
-    dim_labels = source_cfg["dimension_labels"]
-    met_labels = source_cfg["metric_labels"]
-    by_time = "by time" in msg or "over time" in msg
-    dim = dims[0]
-    for d in dims:
-        if d in msg or (dim_labels.get(d, d).lower() in msg):
-            dim = d
-            break
-    if by_time:
-        dim = "date"
-    met = metrics[0]
-    for m in metrics:
-        if m in msg or (met_labels.get(m, m).lower() in msg):
-            met = m
-            break
-    chart = "bar"
-    if "trend" in msg or "time" in msg or "over time" in msg:
-        chart = "line"
-    if "pie" in msg or "share" in msg or "proportion" in msg:
-        chart = "pie"
-    out = {"dimension": dim, "metric": met, "chart_type": chart}
-    if by_time:
-        out["by_time_breakdown"] = True
-    return out
+from Ai import plan_cache, tracing
+from Ai.planner import CONFIDENCE_THRESHOLD, fallback_plan, plan_with_confidence
+from Ai.llm import broker_stats, plan_request
+from Ai.query import run_progressive, sample_for, top_n_for
+from Ai.result_cache import stats as result_cache_stats
+from Ai.downsample import downsample
+from Ai.report import insights
+from ETL import catalog, jobs
 
 
 def _session_key(suffix: str, source_id: str) -> str:
     return f"{suffix}_{source_id}"
 
 
+@st.cache_resource
+def _preload_llm() -> bool:
+    """Once per server process: load the Ollama model in the background so the first question is not slow."""
+    from Ai.llm import preload
+    preload()
+    return True
+
+
+def _filter_label(plan: dict, cfg: dict) -> str:
+    """' (Region: West; 2023-04-01 to 2023-06-30)' for a plan's filters and date range, '' without any."""
+    parts = [
+        f"{cfg['dimension_labels'].get(d, d)}: {', '.join(map(str, v))}" for d, v in plan.get("filters", {}).items()
+    ]
+    start, end = plan.get("date_from"), plan.get("date_to")
+    if start or end:
+        parts.append(f"{start} to {end}" if start and end else f"from {start}" if start else f"until {end}")
+    return f" ({'; '.join(parts)})" if parts else ""
+
+
+def _approximate_note(df, cfg: dict) -> str:
+    """What an approximate chart is: sample size and the widest 95% interval relative to its value."""
+    sample = sample_for(cfg["db_path"], cfg["table"])
+    size = f"a {sample[1]:,}-row sample of {sample[2]:,} rows" if sample else "a sample"
+    widest = 0.0
+    for col in df.column_names:
+        if col.endswith("_error"):
+            values = df[col.rsplit("_error", 1)[0].rstrip("_")].to_pylist()
+            errors = df[col].to_pylist()
+            widest = max([widest] + [e / abs(float(v)) for v, e in zip(values, errors) if v and e is not None])
+    return (
+        f"\u2248 Approximate: estimated from {size}; error bars show 95% intervals (up to \u00b1{widest:.1%} "
+        "of a value). Refining with the exact result..."
+    )
+
+
+@st.fragment(run_every=1.0)
+def _etl_status(source_id: str):
+    """Progress of the source's latest background ETL job; polls every second and reruns the page once it ends."""
+    job = jobs.latest(source_id)
+    if job is None:
+        return
+    if job.status == "queued":
+        st.progress(0.0, text="ETL queued (another load of this DB file is running)")
+    elif job.status == "running":
+        rows = f", {job.rows:,} rows" if job.rows else ""
+        st.progress(job.progress, text=f"ETL: {job.stage or 'starting'}{rows} ({job.seconds():.0f} s)")
+    elif job.status == "done":
+        st.success(f"ETL {job.result['how']}: {job.rows:,} rows in {job.seconds():.1f} s")
+    else:
+        st.error(f"ETL failed: {job.error}")
+    # One full rerun per finished job, so the overview below shows the new catalog
+    reloaded = _session_key("etl_job_reloaded", source_id)
+    if not job.active and st.session_state.get(reloaded) != job.id:
+        st.session_state[reloaded] = job.id
+        st.rerun(scope="app")
+
+
+def _trace_panel(tr):
+    """Collapsible per-stage timings of the last request, counters and the process-wide Prometheus dump."""
+    with st.expander(f"Pipeline trace ({tr.total_ms():.0f} ms)", expanded=False):
+        st.dataframe(
+            [
+                {"Stage": "\u2003" * s["depth"] + s["name"], "ms": s["ms"], "Start (ms)": s["start_ms"],
+                 "Details": ", ".join(f"{k}={v}" for k, v in s["attrs"].items())}
+                for s in tr.ordered()
+            ],
+            use_container_width=True,
+            hide_index=True,
+        )
+        if tr.counters:
+            st.caption("Counters: " + ", ".join(
+                f"{tracing.series_name(name, labels)} +{value:g}" for (name, labels), value in sorted(tr.counters.items())
+            ))
+        metrics = tracing.prometheus_text()
+        st.caption("All requests and ETL runs in this server process (Prometheus text format)")
+        st.code(metrics, language="text")
+        st.download_button("Download metrics", metrics, file_name="ai_analyzer.prom", mime="text/plain")
+
+
 def main():
     st.set_page_config(page_title="AI Data Dashboard", layout="wide")
+    _preload_llm()
 
     source_ids = get_source_ids()
 
@@ -148,23 +124,32 @@ def main():
 
         st.subheader("ETL")
         if st.button("Run ETL for this source", key="run_etl_btn"):
-            try:
-                from ETL.run_etl import run
-                run(selected_id)
-                st.success("ETL completed")
-            except Exception as e:
-                st.error(str(e))
+            # Runs in a background thread; queries keep using the current table until the new one is swapped in
+            running = jobs.latest(selected_id)
+            if jobs.submit(selected_id) is running:
+                st.info("A load of this source is already in progress.")
+        _etl_status(selected_id)
 
         st.subheader("Database overview")
-        try:
-            stats = _get_db_stats(cfg["db_path"], cfg["table"], ", ".join(cfg["columns"]))
+        # Read from the catalog the ETL writes after each load: reruns never touch the DuckDB file
+        meta = catalog.load(cfg["db_path"], cfg["table"])
+        if meta is None:
+            st.warning("DB not loaded. Click \"Run ETL for this source\" first.")
+        else:
             st.write("**Engine:** DuckDB (local file)")
             st.write("**Path:**", f"`{cfg['db_rel']}`")
-            st.write("**Table:**", stats["table"])
-            st.write("**Total rows:**", f"{stats['row_count']:,}")
-            st.write("**Columns:**", stats["columns"])
-        except Exception as e:
-            st.warning(f"DB not loaded: {e}. Click \"Run ETL for this source\" first.")
+            st.write("**Table:**", meta["table"])
+            st.write("**Total rows:**", f"{meta['row_count']:,}")
+            st.write("**Columns:**", ", ".join(cfg["columns"]))
+            st.write("**Dates:**", f"{str(meta['date_min'])[:10]} → {str(meta['date_max'])[:10]}")
+            st.caption(f"Loaded {str(meta['loaded_at'])[:19]} (version {meta['version']})")
+        cache = result_cache_stats()
+        st.caption(f"Query cache: {cache['hits']} hits / {cache['misses']} misses, {cache['entries']} results")
+        llm = broker_stats()
+        st.caption(
+            f"LLM queue: {llm['queue_depth']} waiting, {llm['in_flight']} in flight, "
+            f"avg wait {llm['avg_wait_ms']:.0f} ms (max {llm['max_wait_ms']:.0f} ms)"
+        )
 
     st.title("Say what you want to analyze")
     st.caption("e.g. sales by category, profit trend over time, quantity by region")
@@ -181,29 +166,30 @@ def main():
     st.info(f"**Charts you can request:** by {dim_hint} for {met_hint}; supported: {chart_hint}.")
 
     with st.expander("View DuckDB data (schema + raw data preview)", expanded=False):
-        try:
-            schema = _get_schema(cfg["db_path"], cfg["table"])
-            if schema:
-                st.subheader("Table schema")
-                st.caption(f"Table: **{cfg['table']}**")
-                st.dataframe(
-                    [{"Column": row[0], "Type": row[1]} for row in schema],
-                    use_container_width=True,
-                    hide_index=True,
-                )
-                st.subheader("Data preview (first 200 rows)")
-                preview = _get_table_preview(cfg["db_path"], cfg["table"], 200)
-                st.dataframe(preview, use_container_width=True, height=300)
-            else:
-                st.warning("Cannot read schema. Run ETL first.")
-        except Exception as e:
-            st.warning(f"DuckDB not ready: {e}. Run ETL first.")
+        meta = catalog.load(cfg["db_path"], cfg["table"])
+        if meta is not None:
+            st.subheader("Table schema")
+            st.caption(f"Table: **{cfg['table']}**")
+            distinct = {d: s["distinct"] for d, s in meta["dimensions"].items()}
+            st.dataframe(
+                [{"Column": name, "Type": typ, "Distinct": distinct.get(name)} for name, typ in meta["columns"]],
+                use_container_width=True,
+                hide_index=True,
+            )
+            preview = meta["preview"]
+            st.subheader(f"Data preview (first {len(preview['rows'])} rows)")
+            st.dataframe(
+                [dict(zip(preview["columns"], row)) for row in preview["rows"]], use_container_width=True, height=300
+            )
+        else:
+            st.warning("Cannot read schema. Run ETL first.")
 
     user_input = st.text_input("Your request", placeholder="e.g. sales by category", key="user_input")
     last_fig_key = _session_key("last_fig", selected_id)
     last_summary_key = _session_key("last_summary", selected_id)
     last_sql_key = _session_key("last_sql", selected_id)
     last_df_key = _session_key("last_df", selected_id)
+    last_trace_key = _session_key("last_trace", selected_id)
 
     if not user_input:
         if last_fig_key in st.session_state:
@@ -214,78 +200,138 @@ def main():
         st.stop()
 
     if st.button("Generate chart", type="primary"):
-        plan_cache_key = f"plan_{selected_id}_{user_input.strip().lower()}"
-        plan = st.session_state.get(plan_cache_key) if isinstance(st.session_state.get(plan_cache_key), dict) else None
-        if plan and plan.get("dimension") and plan.get("metric") and plan.get("chart_type"):
-            pass
-        else:
-            plan = None
-            with st.spinner("AI is thinking..."):
+        with tracing.trace("request", source=selected_id) as tr:
+            with tracing.span("plan") as plan_attrs:
+                plan = plan_cache.get(selected_id, cfg, user_input)
+                if plan and plan.get("dimension") and plan.get("metric") and plan.get("chart_type"):
+                    origin = "cache"
+                    st.caption("Plan from plan cache")
+                else:
+                    plan, confidence = plan_with_confidence(user_input, cfg)
+                    plan_attrs["confidence"] = round(confidence, 2)
+                    if confidence >= CONFIDENCE_THRESHOLD:
+                        origin = "keyword"
+                        st.caption(f"Plan from keyword planner (confidence {confidence:.2f})")
+                    else:
+                        with st.spinner("AI is thinking..."):
+                            plan, info = plan_request(user_input, cfg, fallback_plan)
+                        origin = info["origin"]
+                        if info["origin"] == "fallback":
+                            st.warning(f"Ollama not used ({info['reason']}). Using keyword plan (confidence {confidence:.2f}).")
+                        else:
+                            st.caption(
+                                f"Plan from {info['mode']} LLM call ({info['origin']}): {info['prompt_tokens'] or '?'} prompt + "
+                                f"{info['completion_tokens'] or '?'} completion tokens, {info['latency_ms']:.0f} ms, "
+                                f"queued {info['wait_ms']:.0f} ms"
+                            )
+                            # Only LLM plans are persisted; keyword plans are cheaper to recompute than to look up
+                            plan_cache.put(selected_id, cfg, user_input, plan)
+                plan_attrs["origin"] = origin
+            tracing.count("plan_origin", origin=origin)
+
+            dimension = plan.get("dimension", cfg["dimensions"][0])
+            metric = plan.get("metric", cfg["metrics"][0])
+            chart_type = plan.get("chart_type", CHART_TYPES[0])
+            by_time_breakdown = bool(plan.get("by_time_breakdown", False))
+            top_n = top_n_for(cfg, chart_type, plan.get("top_n"))
+            # Several metrics / dimensions are answered by one GROUPING SETS query
+            metrics = list(dict.fromkeys([metric] + plan.get("metrics", [])))
+            dimensions = list(dict.fromkeys([dimension] + plan.get("dimensions", [])))
+            multi = len(metrics) > 1 or len(dimensions) > 1
+
+            # Estimate from the table's sample first (when it has one), then the exact result in the same place
+            results = run_progressive(
+                dimensions if multi else dimension,
+                metrics if multi else metric,
+                chart_type,
+                cfg["db_path"],
+                cfg["table"],
+                cfg["dimensions"],
+                cfg["metrics"],
+                cfg["date_column"],
+                breakdown_dimension=cfg.get("breakdown_dimension"),
+                breakdown_by_category=by_time_breakdown,
+                result="arrow",
+                top_n=top_n,
+                filters=plan.get("filters"),
+                date_from=plan.get("date_from"),
+                date_to=plan.get("date_to"),
+            )
+            # One placeholder per element, so the exact result overwrites the estimate in place
+            note_slot, chart_slot, summary_slot = st.empty(), st.empty(), st.empty()
+            while True:
+                with st.spinner("Querying data..."):
+                    try:
+                        step = next(results, None)
+                    except (duckdb.CatalogException, FileNotFoundError) as e:
+                        # No table or database file yet
+                        st.error(f"Query failed: {e}. Run ETL for this source first.")
+                        st.stop()
+                    except Exception as e:
+                        # E.g. filter_sql's ValueError for a filter the source does not support
+                        st.error(f"Query failed: {e}")
+                        st.stop()
+                if step is None:
+                    break
+                df, sql, approximate = step
+                if df is None or len(df) == 0:
+                    if approximate:
+                        # The sample may miss rows of a narrow filter; the exact result decides
+                        continue
+                    note_slot.empty()
+                    chart_slot.info("No data for this selection.")
+                    summary_slot.empty()
+                    st.stop()
+
                 try:
-                    from Ai.prompt import build_prompt
-                    from Ai.llm import call_ollama, parse_json_from_response
-                    if callable(build_prompt):
-                        prompt = build_prompt(
-                            user_input,
-                            dimensions=cfg["dimensions"],
-                            metrics=cfg["metrics"],
-                            dimension_labels=cfg["dimension_labels"],
-                            metric_labels=cfg["metric_labels"],
-                            columns_description=", ".join(cfg["columns"]),
-                        )
-                        response = call_ollama(prompt)
-                        plan = parse_json_from_response(response)
+                    met_label = ", ".join(cfg["metric_labels"].get(m, m) for m in metrics)
+                    dim_label = ", ".join(cfg["dimension_labels"].get(d, d) for d in dimensions)
+                    if multi:
+                        title = f"{met_label} by {dim_label}" + (f" (top {top_n} each)" if top_n else "")
+                    elif by_time_breakdown:
+                        title = f"{met_label} by time (by {cfg.get('breakdown_dimension', 'category')})"
+                    else:
+                        title = f"{met_label} by {dim_label}"
+                        if top_n and len(df) > top_n:
+                            title += f" (top {top_n} + Other)"
+                    title += _filter_label(plan, cfg)
+                    if approximate:
+                        title = f"\u2248 {title} (estimate)"
+                    chart_df = df
+                    if dimension == "date" and not multi:
+                        # Time series are bucketed to about MAX_POINTS per line already; LTTB bounds whatever is still longer
+                        with tracing.span("downsample", rows=len(df)) as attrs:
+                            chart_df = downsample(df)
+                            attrs["kept"] = len(chart_df)
+                    with tracing.span("get_chart", chart_type=chart_type, rows=len(chart_df), approximate=approximate):
+                        fig = get_chart(chart_df, chart_type, title)
+                    with tracing.span("summarize") as attrs:
+                        found = insights(df)
+                        summary = found["text"]
+                        attrs["outliers"] = sum(len(line["outliers"]) for line in found.get("lines", []))
+                    if approximate:
+                        note_slot.warning(_approximate_note(df, cfg))
+                    else:
+                        note_slot.empty()
+                    chart_slot.plotly_chart(fig, use_container_width=True)
+                    summary_slot.write(f"Estimate: {summary}" if approximate else summary)
                 except Exception as e:
-                    st.warning(f"Ollama not reached ({e}). Using fallback.")
-                if not plan or not plan.get("dimension"):
-                    plan = fallback_plan(user_input, cfg)
-                st.session_state[plan_cache_key] = plan
-
-        dimension = plan.get("dimension", cfg["dimensions"][0])
-        metric = plan.get("metric", cfg["metrics"][0])
-        chart_type = plan.get("chart_type", CHART_TYPES[0])
-        by_time_breakdown = bool(plan.get("by_time_breakdown", False))
-
-        with st.spinner("Querying data..."):
-            try:
-                df, sql = _run_query(
-                    dimension,
-                    metric,
-                    cfg["db_path"],
-                    cfg["table"],
-                    cfg["dimensions"],
-                    cfg["metrics"],
-                    cfg["date_column"],
-                    breakdown_dimension=cfg.get("breakdown_dimension"),
-                    breakdown_by_category=by_time_breakdown,
-                )
-            except Exception as e:
-                st.error(f"Query failed: {e}. Run ETL for this source first.")
-                st.stop()
-
-        if df is None or df.empty:
-            st.info("No data for this selection.")
-            st.stop()
-
-        met_label = cfg["metric_labels"].get(metric, metric)
-        dim_label = cfg["dimension_labels"].get(dimension, dimension)
-        if by_time_breakdown:
-            title = f"{met_label} by time (by {cfg.get('breakdown_dimension', 'category')})"
-        else:
-            title = f"{met_label} by {dim_label}"
-        fig = get_chart(df, chart_type, title)
-        st.session_state[last_fig_key] = fig
-        st.session_state[last_summary_key] = summarize(df)
-        st.session_state[last_sql_key] = sql
-        st.session_state[last_df_key] = df
+                    # An estimate already on screen would otherwise stay there as if it were the answer
+                    note_slot.empty()
+                    chart_slot.error(f"Could not draw the chart: {e}")
+                    summary_slot.empty()
+                    st.stop()
+            st.session_state[last_fig_key] = fig
+            st.session_state[last_summary_key] = summary
+            st.session_state[last_sql_key] = sql
+            st.session_state[last_df_key] = df
 
-        st.plotly_chart(fig, use_container_width=True)
-        st.write(summarize(df))
-
-        with st.expander("Generated SQL"):
-            st.code(sql, language="sql")
-        with st.expander("Query result (raw data)"):
-            st.dataframe(df, use_container_width=True)
+            with st.expander("Generated SQL"):
+                st.code(sql, language="sql")
+            with st.expander("Query result (raw data)"):
+                st.dataframe(df, use_container_width=True)
+        st.session_state[last_trace_key] = tr
+        _trace_panel(tr)
 
     elif last_fig_key in st.session_state:
         st.plotly_chart(st.session_state[last_fig_key], use_container_width=True)
@@ -296,6 +342,8 @@ def main():
         if last_df_key in st.session_state:
             with st.expander("Query result (raw data)"):
                 st.dataframe(st.session_state[last_df_key], use_container_width=True)
+        if last_trace_key in st.session_state:
+            _trace_panel(st.session_state[last_trace_key])
 
 
 if __name__ == "__main__":
@@ -1,47 +1,117 @@
 """
 Plot bar, line, pie from DataFrame (dim/value or date/value).
+Also accepts a pyarrow.Table: plotly express (>= 6) reads Arrow columns directly, so no pandas copy is made.
+Multi-metric / multi-dimension results (dimension, dim, one column per metric) are drawn as one panel per
+dimension, with metrics as grouped bars, lines or (pie) one panel row per metric.
+Approximate results (Ai.query approximate mode) get error bars from their value_error / {metric}__error columns.
 """
 import plotly.express as px
 import plotly.graph_objects as go
 import pandas as pd
+import pyarrow as pa
+
+# Panels per row before multi-dimension charts wrap
+FACET_WRAP = 3
+
+
+def _columns(df) -> list:
+    """Column names of a DataFrame or pyarrow.Table."""
+    return df.column_names if hasattr(df, "column_names") else list(df.columns)
+
+
+def _error_col(columns: list, y_col: str):
+    """Error bar column for y_col ("value_error" for value) if the result has one."""
+    name = f"{y_col}_error"
+    return name if name in columns else None
 
 
 def plot_bar(df: pd.DataFrame, title: str = "Chart", x_col: str = "dim", y_col: str = "value") -> go.Figure:
-    if "date" in df.columns:
+    columns = _columns(df)
+    if "date" in columns:
         x_col, y_col = "date", "value"
     else:
-        x_col = "dim" if "dim" in df.columns else df.columns[0]
-        y_col = "value" if "value" in df.columns else df.columns[1]
-    fig = px.bar(df, x=x_col, y=y_col, title=title)
+        x_col = "dim" if "dim" in columns else columns[0]
+        y_col = "value" if "value" in columns else columns[1]
+    fig = px.bar(df, x=x_col, y=y_col, error_y=_error_col(columns, y_col), title=title)
     fig.update_layout(xaxis_tickangle=-45)
     return fig
 
 
 def plot_line(df: pd.DataFrame, title: str = "Chart", x_col: str = "date", y_col: str = "value") -> go.Figure:
-    if "date" not in df.columns and "dim" in df.columns:
+    columns = _columns(df)
+    if "date" not in columns and "dim" in columns:
         x_col, y_col = "dim", "value"
         color_col = None
     else:
-        x_col = "date" if "date" in df.columns else df.columns[0]
-        y_col = "value" if "value" in df.columns else df.columns[1]
+        x_col = "date" if "date" in columns else columns[0]
+        y_col = "value" if "value" in columns else columns[1]
         # By time breakdown: one line per category
-        color_col = "category" if "category" in df.columns else None
+        color_col = "category" if "category" in columns else None
+    error_y = _error_col(columns, y_col)
     if color_col:
-        fig = px.line(df, x=x_col, y=y_col, color=color_col, title=title, markers=True)
+        fig = px.line(df, x=x_col, y=y_col, color=color_col, error_y=error_y, title=title, markers=True)
     else:
-        fig = px.line(df, x=x_col, y=y_col, title=title, markers=True)
+        fig = px.line(df, x=x_col, y=y_col, error_y=error_y, title=title, markers=True)
     fig.update_layout(xaxis_tickangle=-45)
     return fig
 
 
 def plot_pie(df: pd.DataFrame, title: str = "Chart", name_col: str = "dim", value_col: str = "value") -> go.Figure:
-    name_col = "dim" if "dim" in df.columns else df.columns[0]
-    value_col = "value" if "value" in df.columns else df.columns[1]
+    columns = _columns(df)
+    name_col = "dim" if "dim" in columns else columns[0]
+    value_col = "value" if "value" in columns else columns[1]
     fig = px.pie(df, names=name_col, values=value_col, title=title)
     return fig
 
 
+def _long(df, metrics: list) -> pa.Table:
+    """dimension, dim, metric, value (and error, for approximate results) rows: one per group and metric."""
+    table = df if isinstance(df, pa.Table) else pa.Table.from_pandas(df, preserve_index=False)
+    parts = []
+    for m in metrics:
+        part = {
+            "dimension": table["dimension"],
+            "dim": table["dim"],
+            "metric": pa.array([m] * table.num_rows, pa.string()),
+            "value": table[m].cast(pa.float64()),
+        }
+        if f"{m}__error" in table.column_names:
+            part["error"] = table[f"{m}__error"]
+        parts.append(pa.table(part))
+    return pa.concat_tables(parts)
+
+
+def plot_multi(df, chart_type: str, title: str = "Chart") -> go.Figure:
+    """Panel per dimension; metrics grouped (bar), as separate lines (line) or as panel rows (pie)."""
+    columns = _columns(df)
+    metrics = [c for c in columns if c not in ("dimension", "dim") and not c.endswith(("__share", "__error"))]
+    long = _long(df, metrics)
+    error_y = "error" if "error" in long.column_names else None
+    facets = long["dimension"].unique().to_pylist()
+    facet = {"facet_col": "dimension"} if len(facets) > 1 else {}
+    if chart_type == "pie":
+        if len(metrics) > 1:
+            facet["facet_row"] = "metric"
+        fig = px.pie(long, names="dim", values="value", title=title, **facet)
+    else:
+        if facet and len(facets) > FACET_WRAP:
+            facet["facet_col_wrap"] = FACET_WRAP
+        if chart_type == "line":
+            fig = px.line(long, x="dim", y="value", color="metric", error_y=error_y, title=title, markers=True,
+                          **facet)
+        else:
+            fig = px.bar(long, x="dim", y="value", color="metric", error_y=error_y, barmode="group", title=title,
+                         **facet)
+        # Each panel has its own groups and scale
+        fig.update_xaxes(matches=None, showticklabels=True, title_text=None, tickangle=-45)
+        fig.update_yaxes(matches=None, showticklabels=True)
+    fig.for_each_annotation(lambda a: a.update(text=a.text.split("=", 1)[-1]))
+    return fig
+
+
 def get_chart(df: pd.DataFrame, chart_type: str, title: str) -> go.Figure:
+    if "dimension" in _columns(df):
+        return plot_multi(df, chart_type, title=title)
     if chart_type == "bar":
         return plot_bar(df, title=title)
     if chart_type == "line":
@@ -0,0 +1,123 @@
+"""
+Per-table metadata catalog written by the ETL after each load, so the dashboard and planner never query
+DuckDB for it: a JSON file next to the DuckDB file, {db dir}/{db file stem}.{table}.catalog.json, holding
+    row_count, columns [(name, type)], date_min / date_max of date_column,
+    per non-date dimension the distinct count and the TOP_VALUES most frequent values with their row counts,
+    the first PREVIEW_ROWS rows, loaded_at and version (the load counter from the ETL state table).
+Readers (load) stat the file on each call and parse it only when it changed.
+"""
+import json
+import os
+import threading
+
+TOP_VALUES = 20
+PREVIEW_ROWS = 200
+
+# path -> ((mtime_ns, size), catalog dict)
+_loaded = {}
+_lock = threading.Lock()
+
+
+def catalog_path(db_path: str, table: str) -> str:
+    """Catalog file of table in db_path; named after both, as DuckDB files in one directory may share table names."""
+    db_path = os.path.abspath(db_path)
+    stem = os.path.splitext(os.path.basename(db_path))[0]
+    return os.path.join(os.path.dirname(db_path), f"{stem}.{table}.catalog.json")
+
+
+def _dimension_stats(conn, cfg: dict) -> dict:
+    """{dim: {"distinct", "top": [[value, rows], ...]}} for every non-date dimension, in one GROUPING SETS scan."""
+    dims = [d for d in cfg["dimensions"] if d != "date"]
+    if not dims:
+        return {}
+    which = " ".join(f"WHEN GROUPING({d}) = 0 THEN '{d}'" for d in dims)
+    value = " ".join(f"WHEN GROUPING({d}) = 0 THEN CAST({d} AS VARCHAR)" for d in dims)
+    sets = ", ".join(f"({d})" for d in dims)
+    rows = conn.execute(
+        f"""
+        WITH grouped AS (
+            SELECT CASE {which} END AS dim, CASE {value} END AS value, COUNT(*) AS n
+            FROM {cfg['table']} GROUP BY GROUPING SETS ({sets})
+        ), ranked AS (
+            SELECT *, row_number() OVER (PARTITION BY dim ORDER BY n DESC, value) AS rank,
+                COUNT(*) OVER (PARTITION BY dim) AS distinct_count
+            FROM grouped
+        )
+        SELECT dim, value, n, distinct_count FROM ranked WHERE rank <= {TOP_VALUES} ORDER BY dim, rank
+        """
+    ).fetchall()
+    out = {d: {"distinct": 0, "top": []} for d in dims}
+    for dim, val, n, distinct in rows:
+        out[dim]["distinct"] = distinct
+        out[dim]["top"].append([val, n])
+    return out
+
+
+def _type_label(typ: str) -> str:
+    """Column type for display: ENUMs as 'ENUM (n values)' rather than their full value list."""
+    if typ.startswith("ENUM("):
+        values = typ.count("', '") + 1
+        return f"ENUM ({values} values)"
+    return typ
+
+
+def build(conn, cfg: dict, state: dict) -> dict:
+    """Catalog dict for cfg["table"] as seen by conn; state is the ETL state row of this load."""
+    table, date_column = cfg["table"], cfg["date_column"]
+    row_count, date_min, date_max = conn.execute(
+        f"SELECT COUNT(*), MIN({date_column}), MAX({date_column}) FROM {table}"
+    ).fetchone()
+    res = conn.execute(f"SELECT * FROM {table} LIMIT {PREVIEW_ROWS}")
+    preview = {"columns": [d[0] for d in res.description], "rows": res.fetchall()}
+    return {
+        "table": table,
+        "version": state["version"],
+        "loaded_at": state["loaded_at"],
+        "row_count": row_count,
+        "columns": [[name, _type_label(typ)] for name, typ, *_ in conn.execute(f"DESCRIBE {table}").fetchall()],
+        "date_column": date_column,
+        "date_min": date_min,
+        "date_max": date_max,
+        "dimensions": _dimension_stats(conn, cfg),
+        "preview": preview,
+    }
+
+
+def write(conn, cfg: dict, state: dict) -> dict:
+    """Build the catalog and replace the file atomically; returns the catalog."""
+    catalog = build(conn, cfg, state)
+    path = catalog_path(cfg["db_path"], cfg["table"])
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(catalog, f, default=str)
+    os.replace(tmp, path)
+    return catalog
+
+
+def load(db_path: str, table: str):
+    """The table's catalog dict (dates as ISO strings), or None if the ETL has not written one."""
+    path = catalog_path(db_path, table)
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    stamp = (st.st_mtime_ns, st.st_size)
+    cached = _loaded.get(path)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    try:
+        with open(path, encoding="utf-8") as f:
+            catalog = json.load(f)
+    except (OSError, ValueError):
+        return None
+    with _lock:
+        _loaded[path] = (stamp, catalog)
+    return catalog
+
+
+def dimension_values(source_cfg: dict) -> tuple:
+    """(catalog version, {dim: [top values]}) for a resolved source config; (None, {}) without a catalog."""
+    catalog = load(source_cfg["db_path"], source_cfg["table"]) if "db_path" in source_cfg else None
+    if catalog is None:
+        return None, {}
+    return catalog["version"], {d: [v for v, _ in s["top"]] for d, s in catalog["dimensions"].items()}
@@ -0,0 +1,113 @@
+"""
+Background ETL jobs for the dashboard: submit() starts ETL.run_etl.run in a daemon thread and returns at once,
+so the Streamlit session that clicked "Run ETL" keeps serving. Threads (not processes) share the process-wide
+DuckDB connection (Ai.connection), so queries from every session keep being answered while a job loads.
+One job per source at a time: submitting a source that already has a queued or running job returns that job.
+Jobs on the same DuckDB file run one after another (DuckDB allows one writer per file); the later ones wait
+as "queued". Each job reports its stage (run_etl.STAGES) and rows loaded so far through run's progress hook.
+"""
+import itertools
+import threading
+import time
+
+from ETL.run_etl import STAGES, run
+from config.sources import resolve_source_paths
+
+# Finished jobs kept per source for status display
+KEEP_FINISHED = 5
+
+_lock = threading.Lock()
+_ids = itertools.count(1)
+_jobs = {}  # source_id -> [Job, ...], oldest first
+_file_locks = {}  # db_path -> threading.Lock
+
+
+class Job:
+    """State of one background load; fields are written by the job thread and read by the dashboard."""
+
+    def __init__(self, source_id: str, incremental: bool, streaming: bool):
+        self.id = next(_ids)
+        self.source_id = source_id
+        self.incremental = incremental
+        self.streaming = streaming
+        self.status = "queued"  # queued | running | done | failed
+        self.stage = None
+        self.rows = None
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def active(self) -> bool:
+        return self.status in ("queued", "running")
+
+    @property
+    def progress(self) -> float:
+        """Fraction of STAGES started, 1.0 when done."""
+        if self.status in ("done", "failed"):
+            return 1.0
+        if self.stage is None:
+            return 0.0
+        return STAGES.index(self.stage) / len(STAGES)
+
+    def seconds(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+    def _report(self, stage: str, rows: int = None):
+        self.stage = stage
+        if rows is not None:
+            self.rows = rows
+
+
+def _file_lock(db_path: str) -> threading.Lock:
+    with _lock:
+        return _file_locks.setdefault(db_path, threading.Lock())
+
+
+def _work(job: Job, db_path: str):
+    with _file_lock(db_path):
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            job.result = run(job.source_id, incremental=job.incremental, streaming=job.streaming,
+                             progress=job._report)
+            job.rows = job.result["rows"]
+            job.status = "done"
+        except Exception as e:
+            job.error = f"{type(e).__name__}: {e}"
+            job.status = "failed"
+        finally:
+            job.finished_at = time.time()
+
+
+def submit(source_id: str, incremental: bool = False, streaming: bool = None) -> Job:
+    """Start a background load of source_id, or return its queued / running job if there is one."""
+    db_path = resolve_source_paths(source_id)["db_path"]
+    with _lock:
+        history = _jobs.setdefault(source_id, [])
+        if history and history[-1].active:
+            return history[-1]
+        job = Job(source_id, incremental, streaming)
+        history.append(job)
+        done = [j for j in history if not j.active]
+        for old in done[:-KEEP_FINISHED]:
+            history.remove(old)
+    threading.Thread(target=_work, args=(job, db_path), name=f"etl-{source_id}-{job.id}", daemon=True).start()
+    return job
+
+
+def latest(source_id: str):
+    """Most recent job of source_id (active or finished), or None."""
+    with _lock:
+        history = _jobs.get(source_id)
+        return history[-1] if history else None
+
+
+def active() -> list:
+    """Queued and running jobs of every source."""
+    with _lock:
+        return [j for history in _jobs.values() for j in history if j.active]
@@ -0,0 +1,140 @@
+"""
+Hive-partitioned Parquet copy of a source table: {parquet_path}/year=YYYY/month=M/data_0.parquet.
+A source's "storage" setting picks where its rows live:
+    "duckdb"  (default) table in the DuckDB file only.
+    "both"    DuckDB table plus the Parquet copy, for readers that must not touch the DuckDB file.
+    "parquet" Parquet only; the DuckDB file keeps load state, rollups and a view named after the table
+              over the partitions, so Ai.query reads it like a table and date-bounded queries on year/month
+              scan only the matching files.
+Loads write into a sibling staging directory inside their DuckDB transaction and swap in whole partitions
+only after it committed: a full load replaces the directory, an incremental load only the months it touched.
+The staging directory records which load it belongs to, so partitions of a load that was rolled back are
+discarded and those of a committed load interrupted before the swap are swapped in by the next load.
+"""
+import glob
+import json
+import os
+import shutil
+
+import pandas as pd
+
+STORAGE_MODES = ("duckdb", "both", "parquet")
+# In the staging directory: the load the staged partitions belong to
+PENDING_FILE = "_pending.json"
+
+
+def storage_mode(cfg: dict) -> str:
+    mode = cfg.get("storage", "duckdb")
+    if mode not in STORAGE_MODES:
+        raise ValueError(f"Unknown storage {mode!r} for table {cfg['table']}. Use one of {STORAGE_MODES}")
+    return mode
+
+
+def partition_glob(cfg: dict) -> str:
+    return os.path.join(cfg["parquet_path"], "*", "*", "*.parquet")
+
+
+def view_sql(cfg: dict) -> str:
+    """SELECT over the partitions; year and month come from the directory names."""
+    path = partition_glob(cfg).replace("'", "''")
+    return f"SELECT * FROM read_parquet('{path}', hive_partitioning = true)"
+
+
+def create_view(conn, cfg: dict):
+    conn.execute(f"CREATE OR REPLACE VIEW {cfg['table']} AS {view_sql(cfg)}")
+
+
+def month_start(ts) -> str:
+    """SQL literal for the first day of ts's month (months >= it are rewritten by an incremental load)."""
+    return f"TIMESTAMP '{pd.Timestamp(ts):%Y-%m-01}'"
+
+
+def _staging(cfg: dict) -> str:
+    return cfg["parquet_path"] + ".staging"
+
+
+def _pending(staging: str):
+    try:
+        with open(os.path.join(staging, PENDING_FILE), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def stage_partitions(conn, cfg: dict, source_sql: str, load: dict, since=None) -> int:
+    """
+    Write the rows of source_sql (the configured columns) as year/month partitions into the staging
+    directory; publish_partitions swaps them in once the load committed.
+    since=None: source_sql holds every row and replaces the whole dataset.
+    since=<timestamp>: source_sql holds every row of the months from since's month on; only those
+    partitions are replaced.
+    load: the csv_offset and csv_fingerprint of the ETL state this load commits.
+    Returns the number of partitions staged.
+    """
+    target = cfg["parquet_path"]
+    staging = _staging(cfg)
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    date_column = cfg["date_column"]
+    path = staging.replace("'", "''")
+    conn.execute(
+        f"COPY (SELECT *, year({date_column}) AS year, month({date_column}) AS month FROM ({source_sql})) "
+        f"TO '{path}' (FORMAT PARQUET, PARTITION_BY (year, month))"
+    )
+    if not os.path.isdir(staging):  # no rows
+        os.makedirs(staging)
+    pending = {"since": None if since is None else pd.Timestamp(since).isoformat(),
+               "csv_offset": load["csv_offset"], "csv_fingerprint": load["csv_fingerprint"]}
+    with open(os.path.join(staging, PENDING_FILE), "w", encoding="utf-8") as f:
+        json.dump(pending, f)
+    return len(glob.glob(os.path.join(staging, "*", "*")))
+
+
+def staged_view_sql(cfg: dict) -> str:
+    """SELECT over the partitions as publish_partitions will leave them: the staged ones and the kept ones."""
+    target, staging = cfg["parquet_path"], _staging(cfg)
+    files = sorted(glob.glob(os.path.join(staging, "*", "*", "*.parquet")))
+    if _pending(staging)["since"] is not None:
+        replaced = {os.path.relpath(os.path.dirname(f), staging) for f in files}
+        files += [
+            f for f in sorted(glob.glob(partition_glob(cfg)))
+            if os.path.relpath(os.path.dirname(f), target) not in replaced
+        ]
+    if not files:
+        return view_sql(cfg)
+    paths = ", ".join("'" + f.replace("'", "''") + "'" for f in files)
+    return f"SELECT * FROM read_parquet([{paths}], hive_partitioning = true)"
+
+
+def publish_partitions(cfg: dict, state) -> int:
+    """
+    Swap in the staged partitions if they belong to state (the committed ETL state), else discard them.
+    Returns the number of partitions swapped in.
+    """
+    target, staging = cfg["parquet_path"], _staging(cfg)
+    pending = _pending(staging)
+    if pending is None or state is None or (
+        (pending["csv_offset"], pending["csv_fingerprint"]) != (state["csv_offset"], state["csv_fingerprint"])
+    ):
+        shutil.rmtree(staging, ignore_errors=True)
+        return 0
+    os.remove(os.path.join(staging, PENDING_FILE))
+    written = glob.glob(os.path.join(staging, "*", "*"))
+    if pending["since"] is None:
+        _swap(staging, target, target + ".old")
+        return len(written)
+    for part in written:
+        rel = os.path.relpath(part, staging)
+        os.makedirs(os.path.dirname(os.path.join(target, rel)), exist_ok=True)
+        _swap(part, os.path.join(target, rel), os.path.join(staging, "old"))
+    shutil.rmtree(staging, ignore_errors=True)
+    return len(written)
+
+
+def _swap(src: str, dst: str, old: str):
+    """Replace directory dst by src with two renames; the previous dst is moved to old (outside the glob) and removed."""
+    shutil.rmtree(old, ignore_errors=True)
+    if os.path.exists(dst):
+        os.rename(dst, old)
+    os.rename(src, dst)
+    shutil.rmtree(old, ignore_errors=True)
@@ -0,0 +1,100 @@
+"""
+Pre-aggregated rollup tables built at load time, one per dimension:
+    {table}__rollup_{dim}: day of date_column x dim, SUM and COUNT of every metric, COUNT(*) as _rows.
+Day grain covers every run_query time grain, day to quarter (SUM of SUMs is exact), while staying a few
+thousand rows for typical sources. A rollup that would not be much smaller than its base table (ROLLUP_MAX_RATIO) is not kept.
+ROLLUP_TABLE lists the rollups of each base table; Ai.query routes to them.
+"""
+from ETL.schema import sum_type
+
+ROLLUP_TABLE = "_rollups"
+ROLLUP_MAX_RATIO = 0.5
+
+
+def rollup_name(table: str, dimension: str) -> str:
+    return f"{table}__rollup_{dimension}"
+
+
+def rollup_dimensions(cfg: dict) -> list:
+    """Dimensions that get a rollup: cfg["rollup_dimensions"] or every non-date dimension."""
+    return cfg.get("rollup_dimensions", [d for d in cfg["dimensions"] if d != "date"])
+
+
+def _select(cfg: dict, dimension: str, where: str = "") -> str:
+    table, date_column = cfg["table"], cfg["date_column"]
+    # Integer metrics are summed as BIGINT (DuckDB's default HUGEINT doubles the column's size)
+    aggs = ", ".join(
+        f"CAST(SUM({m}) AS {sum_type(cfg, m)}) AS {m}, COUNT({m}) AS {m}__count" for m in cfg["metrics"]
+    )
+    return (
+        f"SELECT CAST({date_column} AS DATE) AS {date_column}, {dimension}, {aggs}, COUNT(*) AS _rows "
+        f"FROM {table} {where} GROUP BY ALL"
+    )
+
+
+def _ensure_catalog(conn):
+    conn.execute(
+        f"CREATE TABLE IF NOT EXISTS {ROLLUP_TABLE} "
+        f"(base_table VARCHAR, rollup_table VARCHAR, dimension VARCHAR, row_count BIGINT, built_at TIMESTAMP)"
+    )
+
+
+def build_rollups(conn, cfg: dict, since=None) -> list:
+    """
+    Rebuild the rollups of cfg["table"] inside the caller's transaction; returns the rollup tables kept.
+    since=None: full rebuild (drops rollups that are no longer configured or too large).
+    since=<timestamp>: only days >= since are recomputed (after an append of rows dated since or later).
+    """
+    table, date_column = cfg["table"], cfg["date_column"]
+    _ensure_catalog(conn)
+    existing = {
+        row[0]: row[1]
+        for row in conn.execute(
+            f"SELECT dimension, rollup_table FROM {ROLLUP_TABLE} WHERE base_table = ?", [table]
+        ).fetchall()
+    }
+    if since is not None and existing:
+        for dimension, name in existing.items():
+            conn.execute(f"DELETE FROM {name} WHERE {date_column} >= CAST(? AS DATE)", [since])
+            where = f"WHERE CAST({date_column} AS DATE) >= CAST(? AS DATE)"
+            conn.execute(f"INSERT INTO {name} {_select(cfg, dimension, where)}", [since])
+        _record(conn, table, existing)
+        return list(existing.values())
+
+    for name in existing.values():
+        conn.execute(f"DROP TABLE IF EXISTS {name}")
+    base_rows = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    kept = {}
+    for dimension in rollup_dimensions(cfg):
+        name = rollup_name(table, dimension)
+        conn.execute(f"CREATE OR REPLACE TABLE {name} AS {_select(cfg, dimension)} ORDER BY {date_column}")
+        rows = conn.execute(f"SELECT COUNT(*) FROM {name}").fetchone()[0]
+        if base_rows and rows > ROLLUP_MAX_RATIO * base_rows:
+            conn.execute(f"DROP TABLE {name}")
+        else:
+            kept[dimension] = name
+    _record(conn, table, kept)
+    return list(kept.values())
+
+
+def _record(conn, table: str, rollups: dict):
+    conn.execute(f"DELETE FROM {ROLLUP_TABLE} WHERE base_table = ?", [table])
+    for dimension, name in rollups.items():
+        rows = conn.execute(f"SELECT COUNT(*) FROM {name}").fetchone()[0]
+        conn.execute(f"INSERT INTO {ROLLUP_TABLE} VALUES (?, ?, ?, ?, now())", [table, name, dimension, rows])
+
+
+def rollup_tables(conn, table: str, dimension: str) -> list:
+    """Rollup tables of table that group by dimension (none if rollups were never built)."""
+    _ensure_catalog(conn)
+    return [row[0] for row in conn.execute(
+        f"SELECT rollup_table FROM {ROLLUP_TABLE} WHERE base_table = ? AND dimension = ?", [table, dimension]
+    ).fetchall()]
+
+
+def drop_rollups(conn, table: str):
+    """Remove all rollups of table (e.g. when rollups are switched off, so none can go stale)."""
+    _ensure_catalog(conn)
+    for (name,) in conn.execute(f"SELECT rollup_table FROM {ROLLUP_TABLE} WHERE base_table = ?", [table]).fetchall():
+        conn.execute(f"DROP TABLE IF EXISTS {name}")
+    conn.execute(f"DELETE FROM {ROLLUP_TABLE} WHERE base_table = ?", [table])
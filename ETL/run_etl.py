@@ -1,35 +1,85 @@
 """
 ETL: read CSV for a data source, clean, write to DuckDB.
-Run from project root: python ETL/run_etl.py [source_id]
-Default source_id is "sales". Use "events" for events.csv.
+Run from project root: python ETL/run_etl.py [source_id ...] [--all] [--workers N] [--incremental] [--streaming]
+Default source_id is "sales". Use "events" for events.csv, --all for every configured source.
+Several sources are loaded concurrently in a process pool (one worker per DuckDB file).
+
+Full mode (default) rebuilds the table from the whole CSV.
+Incremental mode appends only rows added to the CSV since the last load. Load state
+(byte offset + fingerprint of the CSV, max date_column as watermark) is kept per source
+in the STATE_TABLE of the same DuckDB file, so data and state are committed together.
+
+Streaming mode keeps peak memory bounded for multi-GB CSVs: full loads run the cleaning as SQL
+over DuckDB's native CSV reader, and appended tails are read and inserted CHUNK_ROWS at a time.
+
+Every load reads the CSV only up to the end of its last complete line when the load starts (complete_size)
+and records that offset, so rows appended while it runs are left to the next load rather than loaded twice.
+
+Columns get the compact types of ETL.schema (DATE, ENUM dimensions, per-source numeric "types").
+Tables are written ordered by date_column (then the source's optional "sort_dimension"), so DuckDB's
+per-row-group min/max statistics let date-filtered queries skip most of a long history.
+
+Full rebuilds load into a staging table that replaces the live one by rename in a single short transaction,
+so queries keep being answered from the previous data while a load runs. ETL.jobs runs loads in the background.
+
+Each run is traced (Ai.tracing) as "etl" with read / clean / load / swap / parquet / rollups / sample / state / catalog spans.
+Large tables also get a uniform sample (ETL.sample) for approximate queries, refreshed in the same transaction.
+After every load the table's metadata catalog (ETL.catalog) is rewritten for the dashboard and planner.
+
+A source's "storage" setting ("duckdb", "both", "parquet") adds or substitutes a year/month-partitioned
+Parquet copy of the table; see ETL.parquet_store.
 """
+import argparse
+import csv
+import hashlib
+import io
 import os
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 if ROOT not in sys.path:
     sys.path.insert(0, ROOT)
 
 import pandas as pd
-import duckdb
 
+try:
+    from pandas.tseries.api import guess_datetime_format
+except ImportError:  # pandas < 2.2
+    from pandas._libs.tslibs.parsing import guess_datetime_format
+
+from Ai import connection, result_cache, tracing
 from config.sources import SOURCES, resolve_source_paths
+from ETL import catalog, parquet_store, schema
+from ETL.rollups import build_rollups, drop_rollups
+from ETL.sample import build_sample
 
+STATE_TABLE = "_etl_state"
+# Bytes hashed at the start and end of the already-loaded part of the CSV
+FINGERPRINT_BYTES = 64 * 1024
+# Rows per pandas chunk when streaming an appended CSV tail
+CHUNK_ROWS = 100_000
+# A last line without a newline is taken as complete once the CSV has not changed for this long
+SETTLE_SECONDS = 2.0
+# Stages reported to run(progress=...), in order; "swap" only on full rebuilds, "parquet" with Parquet storage
+STAGES = ("read", "load", "swap", "parquet", "rollups", "sample", "state", "catalog")
+# pd.read_csv's default missing-value strings; clean_sql treats these cells as missing too
+CSV_NA_VALUES = [
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN", "<NA>", "N/A", "NA",
+    "NULL", "NaN", "None", "n/a", "nan", "null",
+]
 
-def run(source_id: str = "sales"):
-    cfg = resolve_source_paths(source_id)
-    csv_path = cfg["csv_path"]
-    db_path = cfg["db_path"]
-    table = cfg["table"]
+
+def clean_frame(df: pd.DataFrame, cfg: dict) -> pd.DataFrame:
+    """
+    Select configured columns, parse dates/metrics, drop rows with null date, trim strings (missing stay missing).
+    pd.to_datetime infers one date format from the first non-missing date and coerces rows that do not match it.
+    """
     columns = cfg["columns"]
     date_column = cfg["date_column"]
     metrics = cfg["metrics"]
 
-    os.makedirs(os.path.dirname(db_path), exist_ok=True)
-    if not os.path.exists(csv_path):
-        raise FileNotFoundError(f"Missing data: {csv_path}")
-
-    df = pd.read_csv(csv_path, encoding="utf-8")
     df.columns = [c.strip() if isinstance(c, str) else c for c in df.columns]
     for c in columns:
         if c not in df.columns:
@@ -42,19 +92,544 @@ def run(source_id: str = "sales"):
     df = df.dropna(subset=[date_column])
     for col in columns:
         if col != date_column and col not in metrics:
-            df[col] = df[col].astype(str).str.strip()
+            # Missing values stay NULL whatever astype(str) does with them in this pandas version
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str).str.strip())
+    return df
+
+
+def _csv_header(csv_path: str) -> list:
+    with open(csv_path, "r", encoding="utf-8", newline="") as f:
+        return next(csv.reader(f))
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def csv_date_format(csv_path: str, column: str):
+    """
+    strptime format pd.to_datetime would infer for column of csv_path (from its first non-missing value),
+    or None when pandas could not infer one.
+    """
+    chunks = pd.read_csv(csv_path, encoding="utf-8", usecols=lambda c: c.strip() == column, dtype=str,
+                         chunksize=CHUNK_ROWS)
+    for chunk in chunks:
+        values = chunk.iloc[:, 0].dropna()
+        if len(values):
+            return guess_datetime_format(values.iloc[0])
+    return None
+
+
+def clean_sql(csv_path: str, cfg: dict) -> str:
+    """
+    SELECT that applies clean_frame's rules inside DuckDB's CSV reader (all columns read as text, header
+    names trimmed, CSV_NA_VALUES missing): dates in the one format pandas infers (csv_date_format; exact
+    match, so padded values are dropped like in pandas), metrics via TRY_CAST to DOUBLE, strings trimmed,
+    rows with null date dropped. When pandas cannot infer a format (it then parses value by value), dates
+    fall back to DuckDB's TRY_CAST to TIMESTAMP.
+    """
+    columns = cfg["columns"]
+    date_column = cfg["date_column"]
+    metrics = cfg["metrics"]
+    names = [c.strip() for c in _csv_header(csv_path)]
+    for c in columns:
+        if c not in names:
+            raise ValueError(f"CSV missing column: {c}. Columns: {names}")
+    missing = ", ".join("'" + v.replace("'", "''") + "'" for v in CSV_NA_VALUES)
+
+    exprs = []
+    for c in columns:
+        raw = f"CASE WHEN {_quote(c)} IN ({missing}) THEN NULL ELSE {_quote(c)} END"
+        if c == date_column:
+            fmt = csv_date_format(csv_path, c)
+            if fmt is None:
+                exprs.append(f"TRY_CAST(TRIM({raw}) AS TIMESTAMP) AS {_quote(c)}")
+            else:
+                fmt = fmt.replace("'", "''")
+                exprs.append(f"CASE WHEN {raw} = TRIM({raw}) THEN try_strptime({raw}, '{fmt}') END AS {_quote(c)}")
+        elif c in metrics:
+            exprs.append(f"TRY_CAST(TRIM({raw}) AS DOUBLE) AS {_quote(c)}")
+        else:
+            exprs.append(f"TRIM({raw}) AS {_quote(c)}")
+    path = csv_path.replace("'", "''")
+    header = ", ".join("'" + n.replace("'", "''") + "'" for n in names)
+    return (
+        f"SELECT * FROM (SELECT {', '.join(exprs)} "
+        f"FROM read_csv('{path}', header=true, delim=',', quote='\"', all_varchar=true, names=[{header}])) "
+        f"WHERE {_quote(date_column)} IS NOT NULL"
+    )
+
+
+def csv_fingerprint(csv_path: str, offset: int) -> str:
+    """Hash of the first and last FINGERPRINT_BYTES of csv_path[:offset]; detects rewrites vs appends."""
+    h = hashlib.sha1(str(offset).encode())
+    with open(csv_path, "rb") as f:
+        h.update(f.read(min(offset, FINGERPRINT_BYTES)))
+        f.seek(max(0, offset - FINGERPRINT_BYTES))
+        h.update(f.read(min(offset, FINGERPRINT_BYTES)))
+    return h.hexdigest()
+
+
+def complete_size(csv_path: str) -> int:
+    """
+    Bytes of csv_path up to the end of its last complete line, the part a load reads: a line still being
+    written (no newline yet, file changed within SETTLE_SECONDS) is left for the next load.
+    """
+    st = os.stat(csv_path)
+    if time.time() - st.st_mtime >= SETTLE_SECONDS:
+        return st.st_size
+    with open(csv_path, "rb") as f:
+        end = st.st_size
+        while end > 0:
+            start = max(0, end - FINGERPRINT_BYTES)
+            f.seek(start)
+            newline = f.read(end - start).rfind(b"\n")
+            if newline >= 0:
+                return start + newline + 1
+            end = start
+    return 0
+
+
+def _header_end(csv_path: str) -> int:
+    """Offset of the first data row of csv_path."""
+    with open(csv_path, "rb") as f:
+        return len(f.readline())
+
+
+def _read_csv_tail(csv_path: str, offset: int, size: int) -> pd.DataFrame:
+    """Read rows in csv_path[offset:size], reusing the header line of the file."""
+    with open(csv_path, "rb") as f:
+        header = f.readline()
+        f.seek(offset)
+        body = f.read(size - offset)
+    return pd.read_csv(io.BytesIO(header + body), encoding="utf-8")
+
+
+class _ByteRange(io.RawIOBase):
+    """Read-only view of csv_path[start:end]; a file still being appended to must not leak past `end`."""
+
+    def __init__(self, f, start: int, end: int):
+        self._f = f
+        self._f.seek(start)
+        self._remaining = end - start
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        n = self._f.readinto(memoryview(b)[: min(len(b), self._remaining)])
+        self._remaining -= n
+        return n
+
 
-    conn = duckdb.connect(db_path)
-    conn.execute(f"DROP TABLE IF EXISTS {table}")
+def _iter_csv_tail(csv_path: str, offset: int, size: int, chunk_rows: int = CHUNK_ROWS):
+    """Yield DataFrames of at most chunk_rows rows from csv_path[offset:size] without reading it whole."""
+    names = _csv_header(csv_path)
+    with open(csv_path, "rb") as f:
+        body = io.BufferedReader(_ByteRange(f, offset, size))
+        yield from pd.read_csv(body, header=None, names=names, encoding="utf-8", chunksize=chunk_rows)
+
+
+def _stage_csv(conn, cfg: dict, csv_path: str, size: int) -> str:
+    """
+    Temp table of the cleaned rows of csv_path[:size], read once for the scans and insert of the load.
+    DuckDB's CSV reader (clean_sql) is used when the file is exactly size bytes and has not changed by the end
+    of the read; otherwise the range is read in pandas chunks (_iter_csv_tail), so rows appended meanwhile are
+    left for the next load instead of being loaded twice.
+    """
+    name = f"{cfg['table']}__csv"
+    stat = os.stat(csv_path)
+    conn.execute(f"DROP TABLE IF EXISTS {name}")
+    if stat.st_size == size:
+        conn.execute(f"CREATE TEMP TABLE {name} AS {clean_sql(csv_path, cfg)}")
+        after = os.stat(csv_path)
+        if (after.st_size, after.st_mtime_ns) == (stat.st_size, stat.st_mtime_ns):
+            return name
+        conn.execute(f"DROP TABLE {name}")
+    types = {c: "TIMESTAMP" if c == cfg["date_column"] else "DOUBLE" if c in cfg["metrics"] else "VARCHAR"
+             for c in cfg["columns"]}
+    conn.execute(f"CREATE TEMP TABLE {name} ({', '.join(f'{_quote(c)} {t}' for c, t in types.items())})")
+    for df in _iter_csv_tail(csv_path, _header_end(csv_path), size):
+        df = clean_frame(df, cfg)
+        conn.register("df", df)
+        conn.execute(f"INSERT INTO {name} SELECT {', '.join(_quote(c) for c in types)} FROM df")
+        conn.unregister("df")
+    return name
+
+
+def _table_exists(conn, table: str) -> bool:
+    row = conn.execute(
+        "SELECT COUNT(*) FROM information_schema.tables WHERE table_name = ?", [table]
+    ).fetchone()
+    return row[0] > 0
+
+
+def _table_type(conn, table: str):
+    """'BASE TABLE', 'VIEW' or None."""
+    row = conn.execute(
+        "SELECT table_type FROM information_schema.tables WHERE table_name = ? AND table_schema = 'main'", [table]
+    ).fetchone()
+    return row[0] if row else None
+
+
+def read_state(conn, source_id: str):
+    """Return last load state for source_id as dict, or None if never loaded."""
+    if not _table_exists(conn, STATE_TABLE):
+        return None
+    row = conn.execute(
+        f"SELECT csv_offset, csv_fingerprint, watermark, row_count, version, loaded_at "
+        f"FROM {STATE_TABLE} WHERE source_id = ?",
+        [source_id],
+    ).fetchone()
+    if row is None:
+        return None
+    keys = ["csv_offset", "csv_fingerprint", "watermark", "row_count", "version", "loaded_at"]
+    return dict(zip(keys, row))
+
+
+def _write_state(conn, source_id: str, table: str, date_column: str, offset: int, fingerprint: str) -> int:
+    """Record load state for source_id; returns the table's row count."""
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {STATE_TABLE} (
+            source_id VARCHAR PRIMARY KEY,
+            csv_offset BIGINT,
+            csv_fingerprint VARCHAR,
+            watermark TIMESTAMP,
+            row_count BIGINT,
+            version BIGINT,
+            loaded_at TIMESTAMP
+        )
+        """
+    )
+    prev = read_state(conn, source_id)
+    version = (prev["version"] if prev else 0) + 1
+    watermark, row_count = conn.execute(f"SELECT MAX({date_column}), COUNT(*) FROM {table}").fetchone()
+    conn.execute(f"DELETE FROM {STATE_TABLE} WHERE source_id = ?", [source_id])
+    conn.execute(
+        f"INSERT INTO {STATE_TABLE} VALUES (?, ?, ?, ?, ?, ?, now())",
+        [source_id, offset, fingerprint, watermark, row_count, version],
+    )
+    return row_count
+
+
+def sort_key(cfg: dict) -> str:
+    """ORDER BY list rows are written in: date_column, then cfg["sort_dimension"] if set."""
+    return ", ".join(_quote(c) for c in [cfg["date_column"], cfg.get("sort_dimension")] if c)
+
+
+def _insert_sql(conn, cfg: dict, table: str, source_sql: str, params: list = None, create: bool = False,
+                temp: bool = False):
+    """
+    Write the cleaned rows of source_sql into table as ETL.schema types, in sort_key order. create builds
+    the table with ENUMs of the rows' dimension values; otherwise values new to table's ENUMs are added first.
+    Raises ValueError when a declared type would change some values (schema.lossy_casts, counted in the same scan
+    as the ENUM values).
+    """
+    params = params or []
+    order = sort_key(cfg)
+    if create:
+        enums = schema.enum_values(conn, cfg, source_sql, params)
+        select = schema.select_sql(cfg, source_sql, enums)
+        conn.execute(f"CREATE {'TEMP ' if temp else ''}TABLE {table} AS {select} ORDER BY {order}", params)
+    else:
+        schema.widen_enums(conn, cfg, table, source_sql, params)
+        conn.execute(f"INSERT INTO {table} {schema.select_sql(cfg, source_sql)} ORDER BY {order}", params)
+
+
+def _insert_frame(conn, table: str, df: pd.DataFrame, cfg: dict, create: bool = False, temp: bool = False):
     conn.register("df", df)
-    conn.execute(f"CREATE TABLE {table} AS SELECT * FROM df")
-    conn.close()
-    print(f"ETL done ({source_id}): {len(df)} rows -> {db_path} [{table}]")
+    _insert_sql(conn, cfg, table, "SELECT * FROM df", create=create, temp=temp)
+    conn.unregister("df")
+
+
+def _stage_parquet(conn, cfg: dict, target: str, incremental: bool, since, load: dict):
+    """
+    Stage the Parquet partitions of this load (swapped in by _publish_parquet after COMMIT). With storage
+    "parquet", target is the staging table of new rows: they are merged with the existing rows of the months
+    they touch, the view is pointed at the staged files for the rest of the load and the staging table dropped.
+    With "both", target is the complete table.
+    """
+    table, date_column = cfg["table"], cfg["date_column"]
+    columns = ", ".join(_quote(c) for c in cfg["columns"])
+    where = f" WHERE {_quote(date_column)} >= {parquet_store.month_start(since)}" if since is not None else ""
+    if target == table:
+        sql = f"SELECT {columns} FROM {table}" + (where if incremental else "")
+    elif incremental:
+        sql = f"SELECT {columns} FROM {table}{where} UNION ALL SELECT {columns} FROM {target}"
+    else:
+        sql = f"SELECT {columns} FROM {target}"
+    parquet_store.stage_partitions(conn, cfg, sql, load, since=since if incremental else None)
+    if target != table:
+        # Rollups and sample are built from the view; it reads the partitions by glob again after the swap
+        conn.execute(f"CREATE OR REPLACE VIEW {table} AS {parquet_store.staged_view_sql(cfg)}")
+        conn.execute(f"DROP TABLE {target}")
+
+
+def _publish_parquet(conn, cfg: dict, state):
+    """Swap in the staged partitions of the committed load state (dropping those of a rolled-back one)."""
+    if parquet_store.publish_partitions(cfg, state) and parquet_store.storage_mode(cfg) == "parquet":
+        parquet_store.create_view(conn, cfg)
+
+
+def _read_clean(read, cfg: dict):
+    """read() then clean_frame, as separate etl.read / etl.clean spans; None when read() returns None."""
+    with tracing.span("etl.read") as attrs:
+        df = read()
+        attrs["rows"] = 0 if df is None else len(df)
+    if df is None:
+        return None
+    with tracing.span("etl.clean") as attrs:
+        df = clean_frame(df, cfg)
+        attrs["rows"] = len(df)
+    return df
+
+
+def _load_frame(conn, table: str, df: pd.DataFrame, cfg: dict, **kwargs):
+    with tracing.span("etl.load", rows=len(df)):
+        _insert_frame(conn, table, df, cfg, **kwargs)
+
+
+def run(source_id: str = "sales", incremental: bool = False, streaming: bool = None, rollups: bool = None,
+        progress=None):
+    """
+    Load source_id into its DuckDB table.
+    incremental=False: full rebuild. incremental=True: if the CSV only grew since the last load
+    (fingerprint of the loaded prefix unchanged), read and insert just the new bytes; if it was
+    rewritten, insert rows with date_column newer than the stored watermark.
+    Falls back to a full rebuild when there is no prior state or table.
+    streaming: bounded-memory path (see module docstring); defaults to the source's "streaming" flag.
+    Columns are stored as ETL.schema.column_types (DATE, ENUM dimensions, declared numeric types).
+    Rows of each load are inserted in sort_key order; appended rows are usually newer than the loaded ones,
+    so the table stays close to date order between full rebuilds.
+    rollups: maintain the ETL.rollups tables in the same transaction (default: the source's "rollups" flag, True).
+    With storage "parquet" rows are loaded into a temp staging table and written out as partitions
+    (incremental loads rewrite only the months they touch); table then is a view over the partitions.
+    A full rebuild is loaded into a staging table and renamed over the old one when complete.
+    progress(stage, rows=None) is called as each of STAGES starts (ETL.jobs shows it in the dashboard).
+    """
+    with tracing.trace("etl", source=source_id, incremental=incremental):
+        return _run(source_id, incremental, streaming, rollups, progress or (lambda stage, rows=None: None))
+
+
+def _run(source_id: str, incremental: bool, streaming: bool, rollups: bool, step) -> dict:
+    cfg = resolve_source_paths(source_id)
+    csv_path = cfg["csv_path"]
+    db_path = cfg["db_path"]
+    table = cfg["table"]
+    date_column = cfg["date_column"]
+    if streaming is None:
+        streaming = cfg.get("streaming", False)
+    if rollups is None:
+        rollups = cfg.get("rollups", True)
+    storage = parquet_store.storage_mode(cfg)
+    columns = ", ".join(_quote(c) for c in cfg["columns"])
+
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    if not os.path.exists(csv_path):
+        raise FileNotFoundError(f"Missing data: {csv_path}")
+
+    # Everything below reads csv_path[:size] only: rows appended during the load are the next load's
+    size = complete_size(csv_path)
+    # Cursor on the process-wide shared connection, so in-process readers (dashboard) keep serving during the load
+    conn = connection.writer(db_path)
+    try:
+        if storage != "duckdb":
+            # Finishes a load that committed but stopped before its partitions were swapped in
+            _publish_parquet(conn, cfg, read_state(conn, source_id))
+        if streaming:
+            # Row order is not part of the cleaning contract; dropping it lets DuckDB load with less memory
+            conn.execute("SET preserve_insertion_order = false")
+        # A table stored differently last time (e.g. storage switched to "parquet") is rebuilt in full
+        kind = _table_type(conn, table)
+        expected = "VIEW" if storage == "parquet" else "BASE TABLE"
+        state = read_state(conn, source_id) if incremental and kind == expected else None
+        # Rows of this load go to target: the table itself, or a staging table written out as Parquet
+        parquet_only = storage == "parquet"
+        target = f"{table}__staging" if parquet_only else table
+        # Earliest date touched by this load; rollups are recomputed from that day on (None = all)
+        since = None
+        if state is None:
+            before = 0
+            # Load next to the live table and swap it in with a rename in one short transaction below,
+            # so queries keep reading the old table for the whole load (a failed load leaves it untouched)
+            staged = target if parquet_only else f"{table}__load"
+            conn.execute(f"DROP TABLE IF EXISTS {staged}")
+            if streaming:
+                # Read and clean are one DuckDB statement here
+                step("load")
+                with tracing.span("etl.load", streaming=True):
+                    rows = _stage_csv(conn, cfg, csv_path, size)
+                    _insert_sql(conn, cfg, staged, f"SELECT * FROM {rows}", create=True, temp=parquet_only)
+                    conn.execute(f"DROP TABLE {rows}")
+            else:
+                step("read")
+                df = _read_clean(lambda: _read_csv_tail(csv_path, _header_end(csv_path), size), cfg)
+                step("load", rows=len(df))
+                _load_frame(conn, staged, df, cfg, create=True, temp=parquet_only)
+            step("swap")
+            conn.execute("BEGIN TRANSACTION")
+            with tracing.span("etl.swap"):
+                if kind is not None:
+                    conn.execute(f"DROP {'VIEW' if kind == 'VIEW' else 'TABLE'} {table}")
+                if not parquet_only:
+                    conn.execute(f"ALTER TABLE {staged} RENAME TO {table}")
+            how = "full"
+        else:
+            offset = state["csv_offset"]
+            appended = size >= offset and csv_fingerprint(csv_path, offset) == state["csv_fingerprint"]
+            if appended and size == offset:
+                if catalog.load(db_path, table) is None:
+                    catalog.write(conn, cfg, state)
+                print(f"ETL done ({source_id}): no new rows -> {db_path} [{table}]")
+                return {"source_id": source_id, "how": "incremental (no new rows)", "rows": 0, "row_count": state["row_count"]}
+            before = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            conn.execute("BEGIN TRANSACTION")
+            if parquet_only:
+                conn.execute(f"CREATE TEMP TABLE {target} AS SELECT {columns} FROM {table} LIMIT 0")
+            if appended:
+                # Lazy either way, so each chunk is read inside its etl.read span
+                chunks = (
+                    _iter_csv_tail(csv_path, offset, size) if streaming
+                    else (_read_csv_tail(csv_path, offset, size) for _ in range(1))
+                )
+                step("read")
+                loaded = 0
+                while (df := _read_clean(lambda: next(chunks, None), cfg)) is not None:
+                    loaded += len(df)
+                    step("load", rows=loaded)
+                    _load_frame(conn, target, df, cfg)
+                    if len(df):
+                        since = min(since, df[date_column].min()) if since is not None else df[date_column].min()
+                how = "incremental (append)"
+            else:
+                watermark = state["watermark"]
+                step("load")
+                if streaming:
+                    with tracing.span("etl.load", streaming=True):
+                        rows = _stage_csv(conn, cfg, csv_path, size)
+                        sql = f"SELECT * FROM {rows}"
+                        if watermark is not None:
+                            sql += f" WHERE {_quote(date_column)} > ?"
+                        _insert_sql(conn, cfg, target, sql, [watermark] if watermark is not None else [])
+                        conn.execute(f"DROP TABLE {rows}")
+                else:
+                    df = _read_clean(lambda: _read_csv_tail(csv_path, _header_end(csv_path), size), cfg)
+                    if watermark is not None:
+                        df = df[df[date_column] > pd.Timestamp(watermark)]
+                    _load_frame(conn, target, df, cfg)
+                since = watermark
+                how = "incremental (watermark)"
+        load = {"csv_offset": size, "csv_fingerprint": csv_fingerprint(csv_path, size)}
+        if storage != "duckdb":
+            step("parquet")
+            with tracing.span("etl.parquet", storage=storage):
+                _stage_parquet(conn, cfg, target, incremental=state is not None, since=since, load=load)
+        step("rollups")
+        with tracing.span("etl.rollups", enabled=rollups):
+            if rollups:
+                build_rollups(conn, cfg, since=since)
+            else:
+                drop_rollups(conn, table)
+        step("sample")
+        with tracing.span("etl.sample") as attrs:
+            # Rows appended to a table (not a Parquet view) follow its existing rows, from rowid `before` on
+            appended_from = before if state is not None and not parquet_only else None
+            attrs["table"] = build_sample(conn, cfg, sort_key(cfg), appended_from=appended_from)
+        step("state")
+        with tracing.span("etl.state"):
+            row_count = _write_state(conn, source_id, table, date_column, load["csv_offset"], load["csv_fingerprint"])
+            conn.execute("COMMIT")
+        if storage != "duckdb":
+            with tracing.span("etl.parquet", storage=storage, phase="publish"):
+                _publish_parquet(conn, cfg, read_state(conn, source_id))
+        step("catalog")
+        with tracing.span("etl.catalog"):
+            catalog.write(conn, cfg, read_state(conn, source_id))
+    finally:
+        conn.close()
+        result_cache.invalidate(db_path, table)
+    if streaming:
+        how += ", streaming"
+    if storage != "duckdb":
+        how += f", {storage}"
+    tracing.count("etl_rows", row_count - before, source=source_id)
+    print(f"ETL done ({source_id}, {how}): {row_count - before} rows -> {db_path} [{table}]")
+    return {"source_id": source_id, "how": how, "rows": row_count - before, "row_count": row_count}
+
+
+def _run_group(source_ids: list, incremental: bool, streaming: bool) -> list:
+    """Worker: load sources that share one DuckDB file one after another; never raises."""
+    results = []
+    for source_id in source_ids:
+        t0 = time.perf_counter()
+        try:
+            out = run(source_id, incremental=incremental, streaming=streaming)
+            out.update(ok=True, error=None)
+        except Exception as e:
+            out = {"source_id": source_id, "ok": False, "error": f"{type(e).__name__}: {e}", "rows": 0}
+        out["seconds"] = time.perf_counter() - t0
+        results.append(out)
+    # Close the files before the worker exits, so no WAL is left behind
+    connection.release()
+    return results
+
+
+def run_many(source_ids: list = None, workers: int = None, incremental: bool = False, streaming: bool = None) -> list:
+    """
+    Load several sources (default: all in SOURCES) concurrently in a process pool.
+    Sources writing the same DuckDB file go to the same worker, since DuckDB allows one writer per file.
+    Returns one result dict per source (source_id, ok, error, rows, seconds, ...), in source_ids order.
+    """
+    source_ids = list(source_ids or SOURCES.keys())
+    groups = {}
+    for source_id in source_ids:
+        groups.setdefault(resolve_source_paths(source_id)["db_path"], []).append(source_id)
+
+    results = {}
+    with ProcessPoolExecutor(max_workers=min(workers or os.cpu_count() or 1, len(groups))) as pool:
+        futures = {pool.submit(_run_group, ids, incremental, streaming): ids for ids in groups.values()}
+        for fut in as_completed(futures):
+            try:
+                group_results = fut.result()
+            except Exception as e:  # worker process died
+                group_results = [
+                    {"source_id": sid, "ok": False, "error": f"{type(e).__name__}: {e}", "rows": 0, "seconds": 0.0}
+                    for sid in futures[fut]
+                ]
+            for r in group_results:
+                results[r["source_id"]] = r
+    return [results[sid] for sid in source_ids]
+
+
+def _print_report(results: list, wall: float):
+    for r in results:
+        status = "ok" if r["ok"] else f"FAILED ({r['error']})"
+        print(f"  {r['source_id']:<16} {r['seconds']:8.2f}s  {r['rows']:>12,} rows  {status}")
+    failed = sum(not r["ok"] for r in results)
+    print(f"{len(results)} sources in {wall:.2f}s wall, {failed} failed")
 
 
 if __name__ == "__main__":
-    source_id = sys.argv[1] if len(sys.argv) > 1 else "sales"
-    if source_id not in SOURCES:
-        print(f"Unknown source: {source_id}. Available: {list(SOURCES.keys())}")
+    parser = argparse.ArgumentParser(description="Load data source CSVs into DuckDB.")
+    parser.add_argument("source_ids", nargs="*", metavar="source_id", help="default: sales")
+    parser.add_argument("--all", action="store_true", help="load every configured source")
+    parser.add_argument("--workers", type=int, default=None, help="max worker processes (default: CPU count)")
+    parser.add_argument("--incremental", action="store_true", help="append only new CSV rows")
+    parser.add_argument("--streaming", action="store_true", default=None, help="bounded-memory load for large CSVs")
+    args = parser.parse_args()
+    source_ids = list(SOURCES.keys()) if args.all else (args.source_ids or ["sales"])
+    unknown = [s for s in source_ids if s not in SOURCES]
+    if unknown:
+        print(f"Unknown source: {', '.join(unknown)}. Available: {list(SOURCES.keys())}")
         sys.exit(1)
-    run(source_id)
+    if len(source_ids) == 1:
+        try:
+            run(source_ids[0], incremental=args.incremental, streaming=args.streaming)
+        finally:
+            connection.release()
+    else:
+        t0 = time.perf_counter()
+        results = run_many(source_ids, workers=args.workers, incremental=args.incremental, streaming=args.streaming)
+        _print_report(results, time.perf_counter() - t0)
+        sys.exit(1 if any(not r["ok"] for r in results) else 0)
@@ -0,0 +1,75 @@
+"""
+Uniform row sample of each large table, built at load time for Ai.query's approximate mode:
+    {table}__sample: about SAMPLE_ROWS rows (a source's "sample_rows"; 0 turns it off), drawn by DuckDB
+    reservoir sampling on full loads. Appended rows are sampled at the same rate (Bernoulli), so the
+    sample stays a uniform fraction of the table between full loads.
+A table with fewer than SAMPLE_MIN_FACTOR x the sample's rows gets no sample (a full scan is already fast).
+SAMPLE_TABLE holds each sample's row count and its base table's; Ai.query scales SUMs by their ratio.
+"""
+SAMPLE_TABLE = "_samples"
+SAMPLE_ROWS = 200_000
+SAMPLE_MIN_FACTOR = 10
+# Same rows for the same data, so repeated full loads give the same estimates
+SAMPLE_SEED = 42
+
+
+def sample_name(table: str) -> str:
+    return f"{table}__sample"
+
+
+def _ensure_catalog(conn):
+    conn.execute(
+        f"CREATE TABLE IF NOT EXISTS {SAMPLE_TABLE} "
+        f"(base_table VARCHAR, sample_table VARCHAR, sample_rows BIGINT, base_rows BIGINT, built_at TIMESTAMP)"
+    )
+
+
+def build_sample(conn, cfg: dict, order: str, appended_from: int = None):
+    """
+    Rebuild or extend the sample of cfg["table"] inside the caller's transaction; returns the sample table,
+    or None when the table is too small for one. Rows are written in order (the ETL's sort_key).
+    appended_from=None: draw a new sample. appended_from=n: this load appended the table's rows from rowid n
+    on; only those are sampled, at the current sample's rate (a table without a sample gets a new one).
+    """
+    table = cfg["table"]
+    name = sample_name(table)
+    _ensure_catalog(conn)
+    target = cfg.get("sample_rows", SAMPLE_ROWS)
+    base_rows = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    if not target or base_rows < SAMPLE_MIN_FACTOR * target:
+        drop_sample(conn, table)
+        return None
+    current = conn.execute(
+        f"SELECT sample_rows, base_rows FROM {SAMPLE_TABLE} WHERE base_table = ?", [table]
+    ).fetchone()
+    if appended_from is not None and current is not None and current[1]:
+        percent = 100.0 * current[0] / current[1]
+        conn.execute(
+            f"INSERT INTO {name} SELECT * FROM (SELECT * FROM {table} WHERE rowid >= ?) "
+            f"USING SAMPLE {percent!r}% (bernoulli, {SAMPLE_SEED}) ORDER BY {order}",
+            [appended_from],
+        )
+    else:
+        conn.execute(
+            f"CREATE OR REPLACE TABLE {name} AS SELECT * FROM {table} "
+            f"USING SAMPLE reservoir({int(target)} ROWS) REPEATABLE ({SAMPLE_SEED}) ORDER BY {order}"
+        )
+    rows = conn.execute(f"SELECT COUNT(*) FROM {name}").fetchone()[0]
+    conn.execute(f"DELETE FROM {SAMPLE_TABLE} WHERE base_table = ?", [table])
+    conn.execute(f"INSERT INTO {SAMPLE_TABLE} VALUES (?, ?, ?, ?, now())", [table, name, rows, base_rows])
+    return name
+
+
+def sample_tables(conn, table: str) -> list:
+    """The sample table of table, as a list (empty if it has none)."""
+    _ensure_catalog(conn)
+    return [row[0] for row in conn.execute(
+        f"SELECT sample_table FROM {SAMPLE_TABLE} WHERE base_table = ?", [table]
+    ).fetchall()]
+
+
+def drop_sample(conn, table: str):
+    """Remove the sample of table, if any."""
+    _ensure_catalog(conn)
+    conn.execute(f"DROP TABLE IF EXISTS {sample_name(table)}")
+    conn.execute(f"DELETE FROM {SAMPLE_TABLE} WHERE base_table = ?", [table])
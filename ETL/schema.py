@@ -0,0 +1,167 @@
+"""
+Typed table schema derived from config.sources and applied by ETL.run_etl on every load:
+    date_column -> DATE, metrics -> DOUBLE, dimensions -> ENUM of their values (VARCHAR above ENUM_MAX_VALUES),
+    other columns -> VARCHAR; a source's "types" ({column: DuckDB type}) overrides any of these,
+    e.g. {"quantity": "SMALLINT"}.
+An ENUM column stores a 1-2 byte code per row instead of the string, so the GROUP BY on dimensions that
+every chart query runs compares small integers. Cleaned values are cast with TRY_CAST, which rounds a
+non-integer into an integer column (2.5 -> 2) or a DECIMAL's scale and turns an out-of-range value into NULL;
+lossy_casts counts the rows a declared type would change that way; enum_values and widen_enums count them
+in the same scan that collects the dimension values and refuse such a load (ValueError).
+Appends that bring dimension values the ENUM does not have widen it first, on the table, its rollups
+and its sample (widen_enums).
+"""
+from ETL.sample import sample_tables
+
+# Distinct values above which a dimension stays VARCHAR
+ENUM_MAX_VALUES = 4096
+INTEGER_TYPES = ("TINYINT", "SMALLINT", "INTEGER", "BIGINT", "HUGEINT", "UTINYINT", "USMALLINT", "UINTEGER", "UBIGINT")
+
+
+def column_types(cfg: dict) -> dict:
+    """{column: DuckDB type} for cfg["columns"]; dimensions are "ENUM" (values are filled in by enum_values)."""
+    types = {}
+    for c in cfg["columns"]:
+        if c == cfg["date_column"]:
+            types[c] = "DATE"
+        elif c in cfg["metrics"]:
+            types[c] = "DOUBLE"
+        elif c in cfg["dimensions"]:
+            types[c] = "ENUM"
+        else:
+            types[c] = "VARCHAR"
+    types.update({c: t.upper() for c, t in cfg.get("types", {}).items() if c in types})
+    return types
+
+
+def sum_type(cfg: dict, metric: str) -> str:
+    """Type that holds a SUM of metric without overflow: BIGINT for integer columns, else DOUBLE."""
+    return "BIGINT" if column_types(cfg)[metric] in INTEGER_TYPES else "DOUBLE"
+
+
+def _quote(value: str) -> str:
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def enum_sql(values: list) -> str:
+    return f"ENUM({', '.join(_quote(v) for v in values)})"
+
+
+def _lossy_checks(cfg: dict) -> list:
+    """[(column, COUNT of the rows whose value the column's declared numeric type would change)]."""
+    checks = []
+    for c, t in column_types(cfg).items():
+        if c not in cfg.get("types", {}) or t in ("ENUM", "VARCHAR", "DATE", "DOUBLE"):
+            continue
+        cast = f"TRY_CAST({c} AS {t})"
+        changed = f"{cast} IS NULL" + (f" OR {cast} <> {c}" if t in INTEGER_TYPES or t.startswith("DECIMAL") else "")
+        checks.append((c, f"COUNT(*) FILTER (WHERE {c} IS NOT NULL AND ({changed}))"))
+    return checks
+
+
+def _profile(conn, cfg: dict, columns: list, source_sql: str, params: list = None) -> tuple:
+    """
+    ({column: sorted distinct non-null values as text}, lossy_casts counts) of source_sql's rows, in one
+    GROUPING SETS scan: a set per column, plus the empty set for the counts.
+    """
+    checks = _lossy_checks(cfg)
+    sets = [f"({c})" for c in columns] + (["()"] if checks else [])
+    if not sets:
+        return {}, {}
+    which = " ".join(f"WHEN GROUPING({c}) = 0 THEN '{c}'" for c in columns)
+    value = " ".join(f"WHEN GROUPING({c}) = 0 THEN CAST({c} AS VARCHAR)" for c in columns)
+    counts = "".join(f", {sql}" for _, sql in checks)
+    rows = conn.execute(
+        f"SELECT {f'CASE {which} END' if columns else 'NULL'}, {f'CASE {value} END' if columns else 'NULL'}{counts} "
+        f"FROM ({source_sql}) AS s GROUP BY GROUPING SETS ({', '.join(sets)})",
+        params or [],
+    ).fetchall()
+    out, lossy = {c: [] for c in columns}, {}
+    for col, val, *n in rows:
+        if col is None:
+            lossy = {c: k for (c, _), k in zip(checks, n) if k}
+        elif val is not None:
+            out[col].append(val)
+    return {c: sorted(v) for c, v in out.items()}, lossy
+
+
+def _refuse_lossy(cfg: dict, lossy: dict):
+    if lossy:
+        types = column_types(cfg)
+        detail = ", ".join(f"{c} ({types[c]}): {n} rows" for c, n in lossy.items())
+        raise ValueError(
+            f"Declared types of {cfg['table']} would round or drop values: {detail}. "
+            "Widen them in the source's \"types\"."
+        )
+
+
+def enum_values(conn, cfg: dict, source_sql: str, params: list = None) -> dict:
+    """
+    {dimension: sorted distinct values} of source_sql's rows for each ENUM dimension; a dimension with more
+    than ENUM_MAX_VALUES values is left out (stored as VARCHAR). Raises ValueError if a declared type would
+    change some values (lossy_casts).
+    """
+    dims = [c for c, t in column_types(cfg).items() if t == "ENUM"]
+    values, lossy = _profile(conn, cfg, dims, source_sql, params)
+    _refuse_lossy(cfg, lossy)
+    return {d: v for d, v in values.items() if len(v) <= ENUM_MAX_VALUES}
+
+
+def select_sql(cfg: dict, source_sql: str, enums: dict = None) -> str:
+    """
+    SELECT of source_sql's rows cast to column_types(cfg). enums ({dimension: values}) gives the ENUM types
+    of a new table; without it dimensions stay VARCHAR here (INSERT converts them to the table's ENUM).
+    """
+    exprs = []
+    for c, t in column_types(cfg).items():
+        if t == "ENUM":
+            if enums and c in enums:
+                exprs.append(f"CAST({c} AS {enum_sql(enums[c])}) AS {c}")
+            else:
+                exprs.append(f"CAST({c} AS VARCHAR) AS {c}")
+        else:
+            exprs.append(f"TRY_CAST({c} AS {t}) AS {c}")
+    return f"SELECT {', '.join(exprs)} FROM ({source_sql}) AS s"
+
+
+def lossy_casts(conn, cfg: dict, source_sql: str, params: list = None) -> dict:
+    """
+    {column: rows} of source_sql's rows whose non-NULL value a declared numeric type (cfg["types"]) would
+    change: NULL out of range, or rounded for integer and DECIMAL types. Columns without such rows are left out.
+    """
+    return _profile(conn, cfg, [], source_sql, params)[1]
+
+
+def table_enums(conn, table: str) -> dict:
+    """{column: values} of the ENUM columns of table."""
+    rows = conn.execute(
+        "SELECT column_name, data_type FROM information_schema.columns "
+        "WHERE table_name = ? AND table_schema = 'main' AND data_type LIKE 'ENUM(%'",
+        [table],
+    ).fetchall()
+    return {name: conn.execute(f"SELECT enum_range(NULL::{typ})").fetchone()[0] for name, typ in rows}
+
+
+def widen_enums(conn, cfg: dict, table: str, source_sql: str, params: list = None) -> dict:
+    """
+    Add the dimension values of source_sql's rows that table's ENUM columns lack, on table, on the
+    rollups of that dimension and on table's sample (a column past ENUM_MAX_VALUES becomes VARCHAR).
+    Returns {column: new values}. Raises ValueError if a declared type would change some values (lossy_casts).
+    """
+    # ETL.rollups imports this module for sum_type
+    from ETL.rollups import rollup_tables
+
+    current = table_enums(conn, table)
+    incoming, lossy = _profile(conn, cfg, list(current), source_sql, params)
+    _refuse_lossy(cfg, lossy)
+    added = {}
+    for col, values in current.items():
+        new = sorted(set(incoming.get(col, [])) - set(values))
+        if not new:
+            continue
+        added[col] = new
+        merged = list(values) + new
+        typ = enum_sql(merged) if len(merged) <= ENUM_MAX_VALUES else "VARCHAR"
+        for name in [table] + rollup_tables(conn, table, col) + sample_tables(conn, table):
+            conn.execute(f"ALTER TABLE {name} ALTER {col} TYPE {typ}")
+    return added
@@ -1,6 +1,11 @@
 """
 Multi-data-source config. Each source: CSV path, DB path, table, columns, dimensions, metrics.
 Paths are relative to project root; call resolve_source_paths() to get absolute paths.
+Optional per source: "storage" ("duckdb" default, "both", "parquet"; see ETL.parquet_store),
+"parquet_rel" (partition directory, default data/parquet/<source_id>), "top_n" (chart type -> N, see DEFAULT_TOP_N)
+"sort_dimension" (column the ETL sorts rows by after date_column, e.g. the most filtered dimension) and
+"types" ({column: DuckDB type} overriding the ETL.schema defaults: DATE date_column, ENUM dimensions, DOUBLE metrics),
+"sample_rows" (size of the ETL.sample table behind approximate queries; 0 turns it off).
 """
 import os
 
@@ -9,6 +14,8 @@ ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 # Chart types are shared across sources
 CHART_TYPES = ["bar", "line", "pie"]
 CHART_LABELS = {"bar": "Bar chart", "line": "Line chart", "pie": "Pie chart"}
+# Groups shown per chart type before the rest is folded into "Other" (override per source with "top_n")
+DEFAULT_TOP_N = {"bar": 20, "pie": 8}
 
 SOURCES = {
     "sales": {
@@ -23,6 +30,11 @@ SOURCES = {
         "metrics": ["sales", "quantity", "profit"],
         "dimension_labels": {"category": "Category", "region": "Region", "sub_category": "Sub-category", "date": "Date"},
         "metric_labels": {"sales": "Sales", "quantity": "Quantity", "profit": "Profit"},
+        "types": {"quantity": "SMALLINT", "discount": "DECIMAL(4,2)"},
+        # Other words users say for a dimension/metric (used to normalize requests)
+        "synonyms": {"revenue": "sales", "turnover": "sales", "units": "quantity", "volume": "quantity",
+                     "margin": "profit", "earnings": "profit", "area": "region", "segment": "category",
+                     "month": "date", "monthly": "date"},
     },
     "events": {
         "name": "Events (Web)",
@@ -36,17 +48,22 @@ SOURCES = {
         "metrics": ["sessions", "conversions", "revenue"],
         "dimension_labels": {"country": "Country", "device_type": "Device", "channel": "Channel", "event_name": "Event", "date": "Date"},
         "metric_labels": {"sessions": "Sessions", "conversions": "Conversions", "revenue": "Revenue"},
+        "types": {"sessions": "INTEGER", "conversions": "INTEGER"},
+        "synonyms": {"visits": "sessions", "traffic": "sessions", "sales": "revenue", "income": "revenue",
+                     "orders": "conversions", "platform": "device_type", "source": "channel",
+                     "nation": "country", "month": "date", "monthly": "date"},
     },
 }
 
 
 def resolve_source_paths(source_id: str) -> dict:
-    """Return a copy of the source config with csv_path and db_path as absolute paths."""
+    """Return a copy of the source config with csv_path, db_path and parquet_path as absolute paths."""
     if source_id not in SOURCES:
         raise KeyError(f"Unknown source: {source_id}")
     cfg = dict(SOURCES[source_id])
     cfg["csv_path"] = os.path.join(ROOT, cfg["csv_rel"])
     cfg["db_path"] = os.path.join(ROOT, cfg["db_rel"])
+    cfg["parquet_path"] = os.path.join(ROOT, cfg.get("parquet_rel", f"data/parquet/{source_id}"))
     return cfg
 
 
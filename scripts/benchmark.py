@@ -0,0 +1,243 @@
+"""
+Benchmark the pipeline per dataset size: ETL load, each run_query shape, get_chart, summarize, and the
+end-to-end request with the LLM step stubbed by the keyword planner (runs offline).
+Data for each source in config.sources is generated under data/bench/ by scripts/generate_data.py (fixed seed,
+reused across runs).
+Writes machine-readable JSON (throughput, latency percentiles, peak RSS) that --compare diffs between commits.
+Run from project root:
+    python scripts/benchmark.py [--sizes 10k,1m,10m,100m] [--sources sales,events] [--repeat 20] [--out bench.json]
+    python scripts/benchmark.py --compare old.json new.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import queue as queue_module
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import duckdb
+
+from config.sources import SOURCES
+from scripts.generate_data import generate
+
+SIZES = {"10k": 10_000, "1m": 1_000_000, "10m": 10_000_000, "100m": 100_000_000}
+BENCH_DIR = os.path.join(ROOT, "data", "bench")
+# Slower ratio at which percentiles are flagged by --compare
+REGRESSION_RATIO = 1.10
+# How often the parent checks that the ETL child is still alive while waiting for its result
+ETL_POLL_SECONDS = 1.0
+
+
+def bench_config(source_id: str, size: str) -> dict:
+    """Source entry for the benchmark copy of source_id at size (own CSV and DuckDB file)."""
+    base = os.path.join(BENCH_DIR, f"{source_id}_{size}")
+    return dict(SOURCES[source_id], csv_rel=base + ".csv", db_rel=base + ".duckdb")
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _etl_child(bench_id: str, cfg: dict, streaming: bool, queue):
+    """Run one full load in a fresh process, so its peak RSS is the ETL's alone."""
+    SOURCES[bench_id] = cfg
+    from ETL.run_etl import run
+
+    t0 = time.perf_counter()
+    out = run(bench_id, streaming=streaming)
+    queue.put({"seconds": time.perf_counter() - t0, "row_count": out["row_count"], "peak_rss_mb": _peak_rss_mb()})
+
+
+def run_etl(bench_id: str, cfg: dict, streaming: bool) -> dict:
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_etl_child, args=(bench_id, cfg, streaming, queue))
+    proc.start()
+    # A child that dies before reporting (exception, OOM kill) must fail the run, not hang it
+    while True:
+        try:
+            result = queue.get(timeout=ETL_POLL_SECONDS)
+            break
+        except queue_module.Empty:
+            if not proc.is_alive():
+                proc.join()
+                raise RuntimeError(f"ETL of {bench_id} exited with code {proc.exitcode} without a result")
+    proc.join()
+    if proc.exitcode:
+        raise RuntimeError(f"ETL of {bench_id} exited with code {proc.exitcode}")
+    return result
+
+
+def latency(fn, repeat: int) -> tuple:
+    """Call fn repeat times; return (percentiles in ms, last return value)."""
+    times, out = [], None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        times.append((time.perf_counter() - t0) * 1000)
+    times.sort()
+
+    def pct(p):
+        return times[min(len(times) - 1, int(round(p / 100 * (len(times) - 1))))]
+
+    stats = {"p50": pct(50), "p90": pct(90), "p99": pct(99), "mean": statistics.fmean(times),
+             "min": times[0], "max": times[-1], "n": len(times)}
+    return stats, out
+
+
+def query_shapes(cfg: dict) -> dict:
+    """Name -> run_query kwargs for the by-dimension, by-month and month x breakdown shapes."""
+    metric = cfg["metrics"][0]
+    dimension = next(d for d in cfg["dimensions"] if d != "date")
+    return {
+        "by_dimension": {"dimension": dimension, "metric": metric, "chart_type": "bar"},
+        "by_month": {"dimension": "date", "metric": metric, "chart_type": "line", "grain": "month"},
+        "by_month_breakdown": {"dimension": "date", "metric": metric, "chart_type": "line", "grain": "month",
+                               "breakdown_by_category": True},
+    }
+
+
+def bench_source(source_id: str, size: str, repeat: int, streaming: bool, use_rollups: bool) -> list:
+    from Ai import connection
+    from Ai.planner import fallback_plan
+    from Ai.query import run_query
+    from Ai.report import summarize
+    from Dashboard.charts import get_chart
+
+    rows = SIZES[size]
+    bench_id = f"bench_{source_id}_{size}"
+    cfg = bench_config(source_id, size)
+    SOURCES[bench_id] = cfg
+    os.makedirs(BENCH_DIR, exist_ok=True)
+    if not os.path.exists(cfg["csv_rel"]):
+        t0 = time.perf_counter()
+        generate(source_id, rows, cfg["csv_rel"])
+        print(f"  generated {rows:,} {source_id} rows in {time.perf_counter() - t0:.1f}s")
+
+    base = {"source": source_id, "size": size, "rows": rows}
+    etl = run_etl(bench_id, cfg, streaming)
+    records = [dict(base, stage="etl", seconds=etl["seconds"], rows_per_s=rows / etl["seconds"],
+                    peak_rss_mb=etl["peak_rss_mb"], csv_mb=os.path.getsize(cfg["csv_rel"]) / 2**20)]
+
+    db_path = cfg["db_rel"]
+    common = {"db_path": db_path, "table": cfg["table"], "dimensions_list": cfg["dimensions"],
+              "metrics_list": cfg["metrics"], "date_column": cfg["date_column"],
+              "breakdown_dimension": cfg.get("breakdown_dimension"), "use_cache": False,
+              "use_rollups": use_rollups, "result": "arrow"}
+    for name, kwargs in query_shapes(cfg).items():
+        stats, (df, _) = latency(lambda: run_query(**common, **kwargs), repeat)
+        records.append(dict(base, stage=f"query:{name}", latency_ms=stats, rows_per_s=rows / (stats["p50"] / 1000),
+                            result_rows=len(df)))
+        stats, _ = latency(lambda: get_chart(df, kwargs["chart_type"], name), repeat)
+        records.append(dict(base, stage=f"get_chart:{name}", latency_ms=stats))
+        stats, _ = latency(lambda: summarize(df), repeat)
+        records.append(dict(base, stage=f"summarize:{name}", latency_ms=stats))
+
+    def request():
+        # LLM stubbed: the keyword planner stands in for plan_request
+        plan = fallback_plan(f"{cfg['metrics'][0]} by {query_shapes(cfg)['by_dimension']['dimension']}", cfg)
+        df, _ = run_query(plan["dimension"], plan["metric"], plan["chart_type"], **common)
+        get_chart(df, plan["chart_type"], "e2e")
+        return summarize(df)
+
+    stats, _ = latency(request, repeat)
+    records.append(dict(base, stage="end_to_end", latency_ms=stats, peak_rss_mb=_peak_rss_mb()))
+    connection.release(db_path)
+    return records
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _print_records(records: list):
+    for r in records:
+        if "latency_ms" in r:
+            lat = r["latency_ms"]
+            detail = f"p50 {lat['p50']:9.2f} ms  p90 {lat['p90']:9.2f} ms  p99 {lat['p99']:9.2f} ms"
+        else:
+            detail = f"{r['seconds']:9.2f} s  {r['rows_per_s']:,.0f} rows/s  peak RSS {r['peak_rss_mb']:.0f} MB"
+        print(f"  {r['source']:<8} {r['size']:<5} {r['stage']:<32} {detail}")
+
+
+def compare(old_path: str, new_path: str) -> int:
+    """Print p50 (or ETL seconds) per stage of two reports; returns the number of regressions."""
+    with open(old_path) as f:
+        old = {(r["source"], r["size"], r["stage"]): r for r in json.load(f)["results"]}
+    with open(new_path) as f:
+        new = json.load(f)["results"]
+    regressions = 0
+    for r in new:
+        prev = old.get((r["source"], r["size"], r["stage"]))
+        if prev is None:
+            continue
+        a, b = (prev["latency_ms"]["p50"], r["latency_ms"]["p50"]) if "latency_ms" in r else (prev["seconds"], r["seconds"])
+        ratio = b / a if a else float("inf")
+        flag = "  SLOWER" if ratio > REGRESSION_RATIO else ""
+        regressions += bool(flag)
+        print(f"  {r['source']:<8} {r['size']:<5} {r['stage']:<32} {a:10.2f} -> {b:10.2f}  x{ratio:5.2f}{flag}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark ETL, queries, charts and summaries per dataset size.")
+    parser.add_argument("--sizes", default="10k,1m", help=f"comma-separated, from {list(SIZES)}")
+    parser.add_argument("--sources", default=",".join(SOURCES), help="comma-separated source ids")
+    parser.add_argument("--repeat", type=int, default=20, help="calls per timed stage")
+    parser.add_argument("--streaming", action="store_true", help="use the streaming ETL path")
+    parser.add_argument("--no-rollups", action="store_true", help="query the base tables only")
+    parser.add_argument("--out", default=None, help="JSON report path (default: print only)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="diff two reports and exit")
+    args = parser.parse_args()
+    if args.compare:
+        sys.exit(1 if compare(*args.compare) else 0)
+
+    sizes = args.sizes.split(",")
+    sources = args.sources.split(",")
+    unknown = [s for s in sizes if s not in SIZES] + [s for s in sources if s not in SOURCES]
+    if unknown:
+        print(f"Unknown size or source: {', '.join(unknown)}")
+        sys.exit(1)
+    results, failures = [], []
+    for size in sizes:
+        for source_id in sources:
+            print(f"{source_id} @ {size}")
+            try:
+                records = bench_source(source_id, size, args.repeat, args.streaming, not args.no_rollups)
+            except RuntimeError as e:
+                print(f"  FAILED: {e}")
+                failures.append({"source": source_id, "size": size, "error": str(e)})
+                continue
+            _print_records(records)
+            results.extend(records)
+    report = {
+        "meta": {
+            "commit": _git_commit(), "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(), "duckdb": duckdb.__version__, "platform": platform.platform(),
+            "cpus": os.cpu_count(), "repeat": args.repeat, "streaming": args.streaming,
+            "rollups": not args.no_rollups,
+        },
+        "results": results,
+        "failures": failures,
+    }
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report -> {args.out}")
+    if failures:
+        sys.exit(1)
@@ -0,0 +1,93 @@
+"""
+Compare the pandas and Arrow result paths end to end for one source: DuckDB fetch, get_chart, summarize.
+Reports the median time of each step and the result's memory (DataFrame deep memory vs Arrow buffers)
+for every query shape, plus the table preview as the wide case.
+Run from project root after ETL: python scripts/compare_result_formats.py [source_id] [--repeat N]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from config.sources import SOURCES, resolve_source_paths
+from Ai import connection
+from Ai.query import fetch, run_query
+from Ai.report import summarize
+from Ai.result_cache import nbytes
+from Dashboard.charts import get_chart
+
+
+def _median_ms(fn, repeat: int):
+    times, out = [], None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        times.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(times), out
+
+
+def shapes(cfg: dict) -> list:
+    """(label, run_query kwargs, chart_type) for every query shape of the source."""
+    metric = cfg["metrics"][0]
+    out = [(f"{d} bar", {"dimension": d, "metric": metric}, "bar") for d in cfg["dimensions"] if d != "date"]
+    out.append(("date line", {"dimension": "date", "metric": metric}, "line"))
+    out.append(("date by breakdown", {"dimension": "date", "metric": metric, "breakdown_by_category": True}, "line"))
+    return out
+
+
+def compare(source_id: str, repeat: int = 5, preview_rows: int = 100_000) -> list:
+    cfg = resolve_source_paths(source_id)
+    rows = []
+    for label, kwargs, chart_type in shapes(cfg):
+        entry = {"shape": label}
+        for result in ("pandas", "arrow"):
+            fetch_ms, df = _median_ms(
+                lambda: run_query(
+                    chart_type=chart_type, db_path=cfg["db_path"], table=cfg["table"],
+                    dimensions_list=cfg["dimensions"], metrics_list=cfg["metrics"], date_column=cfg["date_column"],
+                    breakdown_dimension=cfg.get("breakdown_dimension"), use_cache=False, result=result, **kwargs,
+                )[0],
+                repeat,
+            )
+            chart_ms, _ = _median_ms(lambda: get_chart(df, chart_type, label), repeat)
+            summary_ms, _ = _median_ms(lambda: summarize(df), repeat)
+            entry[result] = {"rows": len(df), "fetch_ms": fetch_ms, "chart_ms": chart_ms,
+                             "summarize_ms": summary_ms, "bytes": nbytes(df)}
+        rows.append(entry)
+
+    entry = {"shape": f"preview ({preview_rows:,} rows, all columns)"}
+    for result in ("pandas", "arrow"):
+        with connection.cursor(cfg["db_path"]) as cur:
+            fetch_ms, df = _median_ms(
+                lambda: fetch(cur, f"SELECT * FROM {cfg['table']} LIMIT {preview_rows}", result=result), repeat
+            )
+        entry[result] = {"rows": len(df), "fetch_ms": fetch_ms, "chart_ms": 0.0, "summarize_ms": 0.0,
+                         "bytes": nbytes(df)}
+    rows.append(entry)
+    return rows
+
+
+def _print(rows: list):
+    print(f"{'shape':<40} {'rows':>9} {'pandas ms':>10} {'arrow ms':>9} {'pandas KB':>10} {'arrow KB':>9} {'saved':>6}")
+    for r in rows:
+        p, a = r["pandas"], r["arrow"]
+        p_ms = p["fetch_ms"] + p["chart_ms"] + p["summarize_ms"]
+        a_ms = a["fetch_ms"] + a["chart_ms"] + a["summarize_ms"]
+        saved = 1 - a["bytes"] / p["bytes"] if p["bytes"] else 0.0
+        print(
+            f"{r['shape']:<40} {p['rows']:>9,} {p_ms:>10.2f} {a_ms:>9.2f} "
+            f"{p['bytes'] / 1024:>10.1f} {a['bytes'] / 1024:>9.1f} {saved:>6.0%}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare pandas and Arrow result paths.")
+    parser.add_argument("source_id", nargs="?", default="sales", choices=list(SOURCES.keys()))
+    parser.add_argument("--repeat", type=int, default=5, help="runs per step; the median is reported")
+    args = parser.parse_args()
+    _print(compare(args.source_id, repeat=args.repeat))
@@ -1,14 +1,19 @@
 """
-Fetch or generate sample data into data/raw/sales.csv.
+Fetch or generate sample data into data/raw/sales.csv, and generate data/raw/events.csv if it is missing.
 Schema: date, category, region, sub_category, product, sales, quantity, profit, discount.
 Run from project root: python scripts/download_data.py
 """
 import os
-import random
+import sys
 import csv
-from datetime import datetime, timedelta
 
 ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from config.sources import resolve_source_paths
+from scripts.generate_data import generate
+
 OUT_PATH = os.path.join(ROOT, "data", "raw", "sales.csv")
 OUT_DIR = os.path.dirname(OUT_PATH)
 
@@ -62,49 +67,15 @@ def download_csv():
         return False
 
 
-def generate_sample():
-    os.makedirs(OUT_DIR, exist_ok=True)
-    categories = ["Furniture", "Office Supplies", "Technology"]
-    sub_categories = {
-        "Furniture": ["Chairs", "Tables", "Bookcases", "Furnishings"],
-        "Office Supplies": ["Paper", "Binders", "Storage", "Appliances", "Art", "Envelopes"],
-        "Technology": ["Phones", "Machines", "Accessories", "Copiers"],
-    }
-    regions = ["East", "West", "South", "Central"]
-    products = [f"Product_{i}" for i in range(1, 41)]
-    start = datetime(2021, 1, 1)
-    rows = []
-    n = 8000
-    for _ in range(n):
-        d = start + timedelta(days=random.randint(0, 1000))
-        cat = random.choice(categories)
-        sub = random.choice(sub_categories[cat])
-        reg = random.choice(regions)
-        prod = random.choice(products)
-        qty = random.randint(1, 20)
-        unit_price = round(random.uniform(15, 500), 2)
-        sales = round(qty * unit_price, 2)
-        discount = round(random.uniform(0, 0.25), 2)
-        profit = round(sales * (1 - discount) * random.uniform(0.05, 0.35), 2)
-        rows.append({
-            "date": d.strftime("%Y-%m-%d"),
-            "category": cat,
-            "region": reg,
-            "sub_category": sub,
-            "product": prod,
-            "sales": sales,
-            "quantity": qty,
-            "profit": profit,
-            "discount": discount,
-        })
-    fieldnames = ["date", "category", "region", "sub_category", "product", "sales", "quantity", "profit", "discount"]
-    with open(OUT_PATH, "w", newline="", encoding="utf-8") as f:
-        w = csv.DictWriter(f, fieldnames=fieldnames)
-        w.writeheader()
-        w.writerows(rows)
-    print(f"Generated {len(rows)} rows -> {OUT_PATH}")
+def generate_sample(source_id: str = "sales", rows: int = 8000):
+    """Synthetic rows for source_id at its configured CSV path (see scripts/generate_data.py)."""
+    path = resolve_source_paths(source_id)["csv_path"]
+    generate(source_id, rows, path, workers=1)
+    print(f"Generated {rows} rows -> {path}")
 
 
 if __name__ == "__main__":
     if not download_csv():
         generate_sample()
+    if not os.path.exists(resolve_source_paths("events")["csv_path"]):
+        generate_sample("events", 6000)
@@ -0,0 +1,93 @@
+"""
+Measure planner accuracy on the labelled corpus (scripts/planner_corpus.json).
+Reports, for the keyword planner: accuracy overall, coverage and accuracy above CONFIDENCE_THRESHOLD, latency.
+With --llm, the same for the LLM path (needs Ollama running), so the two tiers can be compared.
+Run from project root: python scripts/eval_planner.py [--llm] [--verbose]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from config.sources import SOURCES
+from Ai.planner import CONFIDENCE_THRESHOLD, plan_with_confidence
+
+CORPUS_PATH = os.path.join(ROOT, "scripts", "planner_corpus.json")
+FIELDS = ("dimension", "metric", "chart_type")
+
+
+def is_correct(plan: dict, expected: dict) -> bool:
+    return all(plan.get(k) == expected[k] for k in FIELDS)
+
+
+def evaluate_keyword(corpus: list, verbose: bool = False) -> dict:
+    correct = confident = confident_correct = 0
+    t0 = time.perf_counter()
+    results = [plan_with_confidence(case["text"], SOURCES[case["source"]]) for case in corpus]
+    elapsed = time.perf_counter() - t0
+    for case, (plan, confidence) in zip(corpus, results):
+        ok = is_correct(plan, case["expected"])
+        correct += ok
+        if confidence >= CONFIDENCE_THRESHOLD:
+            confident += 1
+            confident_correct += ok
+        if verbose and not ok:
+            print(f"  keyword miss: {case['text']!r} -> {plan} (confidence {confidence})")
+    n = len(corpus)
+    return {
+        "cases": n,
+        "accuracy": correct / n,
+        "coverage": confident / n,
+        "accuracy_when_confident": confident_correct / confident if confident else None,
+        "mean_latency_us": elapsed / n * 1e6,
+    }
+
+
+def evaluate_llm(corpus: list, verbose: bool = False) -> dict:
+    from Ai.llm import analysis_plan_with_stats
+
+    correct = errors = 0
+    latencies = []
+    for case in corpus:
+        t0 = time.perf_counter()
+        try:
+            plan, _ = analysis_plan_with_stats(case["text"], SOURCES[case["source"]])
+        except Exception as e:
+            errors += 1
+            plan = {}
+            if verbose:
+                print(f"  llm error: {case['text']!r}: {e}")
+        latencies.append(time.perf_counter() - t0)
+        ok = is_correct(plan, case["expected"])
+        correct += ok
+        if verbose and plan and not ok:
+            print(f"  llm miss: {case['text']!r} -> {plan}")
+    n = len(corpus)
+    return {
+        "cases": n,
+        "accuracy": correct / n,
+        "errors": errors,
+        "mean_latency_us": sum(latencies) / n * 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--llm", action="store_true", help="also evaluate the LLM path (needs Ollama)")
+    parser.add_argument("--verbose", action="store_true", help="print misclassified requests")
+    args = parser.parse_args()
+    with open(CORPUS_PATH, encoding="utf-8") as f:
+        corpus = json.load(f)
+    report = {"threshold": CONFIDENCE_THRESHOLD, "keyword": evaluate_keyword(corpus, args.verbose)}
+    if args.llm:
+        report["llm"] = evaluate_llm(corpus, args.verbose)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+"""
+Vectorized synthetic data for any configured source, sized for capacity testing (100M+ rows).
+Rows are built a chunk at a time with NumPy in worker processes and written straight to disk as CSV
+(the ETL's input format) or Parquet; memory stays at about one chunk per worker.
+- seed: every chunk gets its own child of one SeedSequence, so output does not depend on --workers.
+- skew: categories, countries, products etc. follow a Zipf law (weight 1/rank^zipf, first value most common).
+- seasonality: day weights combine a yearly cycle, a weekly cycle (events) and a linear growth trend.
+sales and events have realistic generators; other sources get generic values for their configured columns.
+Run from project root:
+    python scripts/generate_data.py sales --rows 100000000 [--format csv|parquet] [--out PATH] [--seed 42]
+"""
+import argparse
+import math
+import os
+import shutil
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+from config.sources import SOURCES, resolve_source_paths
+
+CHUNK_ROWS = 1_000_000
+ZIPF = 1.1
+
+SALES_SUB_CATEGORIES = {
+    "Technology": ["Phones", "Machines", "Accessories", "Copiers"],
+    "Office Supplies": ["Binders", "Paper", "Storage", "Art", "Appliances", "Envelopes"],
+    "Furniture": ["Chairs", "Tables", "Furnishings", "Bookcases"],
+}
+SALES_REGIONS = ["West", "East", "Central", "South"]
+EVENT_COUNTRIES = ["US", "IN", "GB", "DE", "BR", "FR", "CA", "JP", "AU", "CN", "ES", "IT", "MX", "NL", "SE"]
+EVENT_DEVICES = ["mobile", "desktop", "tablet"]
+EVENT_CHANNELS = ["organic", "paid", "social", "email", "referral"]
+# Funnel order: every later step is rarer
+EVENT_NAMES = ["page_view", "add_to_cart", "signup", "purchase"]
+
+
+def zipf_index(rng: np.random.Generator, k: int, n: int, s: float = ZIPF) -> np.ndarray:
+    """n draws from range(k) with P(rank i + 1) proportional to 1 / (i + 1)^s."""
+    weights = 1.0 / np.arange(1, k + 1) ** s
+    return rng.choice(k, size=n, p=weights / weights.sum())
+
+
+def labels(values: list, idx: np.ndarray) -> pa.Array:
+    """values[idx] as an Arrow string array (gathered in C++, no Python objects per row)."""
+    return pa.array(values, pa.string()).take(pa.array(idx))
+
+
+def zipf_choice(rng: np.random.Generator, values: list, n: int, s: float = ZIPF) -> pa.Array:
+    """n Zipf-distributed draws from values (first value most common)."""
+    return labels(values, zipf_index(rng, len(values), n, s))
+
+
+def seasonal_dates(rng, n: int, start: str, days: int, yearly: float = 0.3, weekly: float = 0.0,
+                   growth: float = 0.2, peak_day: int = 330) -> np.ndarray:
+    """
+    n dates in [start, start + days) as datetime64[D]. Day weight: (1 + growth per year) x a yearly cosine
+    peaking on day-of-year peak_day (amplitude yearly) x a weekday/weekend factor (amplitude weekly).
+    """
+    day = np.arange(days)
+    dates = np.datetime64(start, "D") + day
+    doy = (dates - dates.astype("datetime64[Y]")).astype(np.int64)
+    weekend = ((dates.astype(np.int64) + 3) % 7) >= 5  # 1970-01-01 was a Thursday
+    w = (1 + growth * day / 365.25) * (1 + yearly * np.cos(2 * np.pi * (doy - peak_day) / 365.25))
+    w *= np.where(weekend, 1 - weekly, 1 + weekly)
+    return dates[rng.choice(days, size=n, p=w / w.sum())]
+
+
+def _sales_chunk(rng, n: int, cfg: dict) -> dict:
+    pairs = [(c, s) for c, subs in SALES_SUB_CATEGORIES.items() for s in subs]
+    pair = zipf_index(rng, len(pairs), n, s=0.6)
+    product = zipf_index(rng, 40, n, s=0.8) + 1
+    # Each product has a list price; orders scatter +-10% around it
+    price = (15 + (product * 37) % 485) * rng.uniform(0.9, 1.1, n)
+    quantity = np.minimum(1 + rng.poisson(3, n), 20)
+    sales = np.round(quantity * price, 2)
+    discount = np.round(rng.uniform(0, 0.25, n), 2)
+    return {
+        "date": seasonal_dates(rng, n, "2021-01-01", 1000),
+        "category": labels([c for c, _ in pairs], pair),
+        "region": zipf_choice(rng, SALES_REGIONS, n, s=0.5),
+        "sub_category": labels([s for _, s in pairs], pair),
+        "product": labels([f"Product_{i}" for i in range(41)], product),
+        "sales": sales,
+        "quantity": quantity,
+        "profit": np.round(sales * (1 - discount) * rng.uniform(0.05, 0.35, n), 2),
+        "discount": discount,
+    }
+
+
+def _events_chunk(rng, n: int, cfg: dict) -> dict:
+    event = zipf_index(rng, len(EVENT_NAMES), n, s=1.5)
+    sessions = np.minimum(1 + rng.lognormal(3, 1, n).astype(np.int64), 5000)
+    # Conversion rate per event: deeper funnel steps convert better
+    rate = np.array([0.01, 0.04, 0.01, 0.08])[event]
+    conversions = rng.binomial(sessions, rate)
+    return {
+        "event_date": seasonal_dates(rng, n, "2022-01-01", 700, yearly=0.15, weekly=0.2, growth=0.4),
+        "country": zipf_choice(rng, EVENT_COUNTRIES, n),
+        "device_type": zipf_choice(rng, EVENT_DEVICES, n, s=1.3),
+        "channel": zipf_choice(rng, EVENT_CHANNELS, n),
+        "event_name": labels(EVENT_NAMES, event),
+        "sessions": sessions,
+        "conversions": conversions,
+        "revenue": np.round(conversions * rng.gamma(2, 30, n), 2),
+    }
+
+
+def _generic_chunk(rng, n: int, cfg: dict) -> dict:
+    """Any source: date_column seasonal, metrics lognormal, other columns Zipf over 20 labels."""
+    out = {}
+    for col in cfg["columns"]:
+        if col == cfg["date_column"]:
+            out[col] = seasonal_dates(rng, n, "2022-01-01", 730)
+        elif col in cfg["metrics"]:
+            out[col] = np.round(rng.lognormal(3, 1, n), 2)
+        else:
+            out[col] = zipf_choice(rng, [f"{col}_{i}" for i in range(1, 21)], n)
+    return out
+
+
+GENERATORS = {"sales": _sales_chunk, "events": _events_chunk}
+
+
+def generate_chunk(source_id: str, n: int, seed_seq: np.random.SeedSequence) -> pa.Table:
+    """One chunk of n rows as a pyarrow.Table with the source's columns in order."""
+    cfg = resolve_source_paths(source_id)
+    rng = np.random.default_rng(seed_seq)
+    data = GENERATORS.get(source_id, _generic_chunk)(rng, n, cfg)
+    return pa.table({c: data[c] for c in cfg["columns"]})
+
+
+def _write_part(source_id: str, n: int, seed_seq, path: str, fmt: str) -> str:
+    table = generate_chunk(source_id, n, seed_seq)
+    if fmt == "csv":
+        pa_csv.write_csv(table, path, pa_csv.WriteOptions(include_header=False, quoting_style="none"))
+    else:
+        pq.write_table(table, path)
+    return path
+
+
+def generate(source_id: str, rows: int, path: str, fmt: str = "csv", seed: int = 42,
+             chunk_rows: int = CHUNK_ROWS, workers: int = None) -> str:
+    """
+    Write rows rows for source_id to path (one CSV with header, or one Parquet file with a row group per
+    chunk). Chunks are generated in parallel into part files next to path, then appended in order.
+    """
+    if fmt not in ("csv", "parquet"):
+        raise ValueError(f"Unknown format {fmt!r}. Use csv or parquet")
+    columns = resolve_source_paths(source_id)["columns"]
+    n_chunks = max(1, math.ceil(rows / chunk_rows))
+    sizes = [min(chunk_rows, rows - i * chunk_rows) for i in range(n_chunks)]
+    seeds = np.random.SeedSequence(seed).spawn(n_chunks)
+    parts_dir = path + ".parts"
+    shutil.rmtree(parts_dir, ignore_errors=True)
+    os.makedirs(parts_dir)
+    jobs = [(n, s, os.path.join(parts_dir, f"part-{i:05d}.{fmt}")) for i, (n, s) in enumerate(zip(sizes, seeds))]
+    workers = min(workers or os.cpu_count() or 1, n_chunks)
+    tmp = path + ".tmp"
+    writer = None
+
+    def append(part: str):
+        nonlocal writer
+        if fmt == "csv":
+            with open(part, "rb") as f:
+                shutil.copyfileobj(f, out, 16 * 2**20)
+        else:
+            table = pq.read_table(part)
+            if writer is None:
+                writer = pq.ParquetWriter(out, table.schema)
+            writer.write_table(table)
+        os.remove(part)
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool, open(tmp, "wb") as out:
+            if fmt == "csv":
+                out.write((",".join(columns) + "\n").encode())
+            # At most 2 chunks per worker ahead of the writer, so part files never add up to the dataset
+            pending = deque()
+            for job in jobs:
+                pending.append(pool.submit(_write_part, source_id, *job, fmt))
+                if len(pending) >= 2 * workers:
+                    append(pending.popleft().result())
+            while pending:
+                append(pending.popleft().result())
+            if writer is not None:
+                writer.close()
+                writer = None
+        os.replace(tmp, path)
+    finally:
+        if writer is not None:
+            writer.close()
+        shutil.rmtree(parts_dir, ignore_errors=True)
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return path
+
+
+def _parse_rows(text: str) -> int:
+    """'100m' -> 100_000_000, '10k' -> 10_000, '1500' -> 1500."""
+    text = text.lower().replace("_", "")
+    scale = {"k": 10**3, "m": 10**6, "b": 10**9}.get(text[-1:], 1)
+    return int(float(text[:-1] if scale > 1 else text) * scale)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic data for a configured source.")
+    parser.add_argument("source_id", choices=list(SOURCES.keys()))
+    parser.add_argument("--rows", default="1m", help="row count, e.g. 8000, 10k, 100m")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv")
+    parser.add_argument("--out", default=None, help="default: the source's CSV path (csv) or data/raw/<source>.parquet")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    args = parser.parse_args()
+    rows = _parse_rows(args.rows)
+    out = args.out or (
+        resolve_source_paths(args.source_id)["csv_path"] if args.format == "csv"
+        else os.path.join(ROOT, "data", "raw", f"{args.source_id}.parquet")
+    )
+    t0 = time.perf_counter()
+    generate(args.source_id, rows, out, fmt=args.format, seed=args.seed, chunk_rows=args.chunk_rows,
+             workers=args.workers)
+    elapsed = time.perf_counter() - t0
+    print(f"Generated {rows:,} rows -> {out} ({os.path.getsize(out) / 2**20:,.1f} MB, {elapsed:.1f}s, "
+          f"{rows / elapsed:,.0f} rows/s)")
@@ -0,0 +1,7 @@
+from ETL.catalog import catalog_path
+
+
+def test_tables_of_different_databases_in_one_directory_get_their_own_catalog(tmp_path):
+    small, large = str(tmp_path / "sales_10k.duckdb"), str(tmp_path / "sales_1m.duckdb")
+    assert catalog_path(small, "sales") != catalog_path(large, "sales")
+    assert catalog_path(small, "sales") == str(tmp_path / "sales_10k.sales.catalog.json")
@@ -0,0 +1,38 @@
+import duckdb
+import pandas as pd
+import pandas.testing as pdt
+
+from config.sources import SOURCES
+from ETL.run_etl import clean_frame, clean_sql
+
+# Padded header names and cells, a second date format, padded dates, missing markers, junk numbers
+DIRTY_CSV = (
+    " date , category ,region,sub_category,product,sales,quantity,profit,discount\n"
+    "01/05/2023, Furniture ,West,Chairs,A,10.5,2,1.5,0.1\n"
+    "13/05/2023,Technology,East,Phones,B,abc,3,2,0\n"
+    "2023-01-07,Technology,East,Phones,B,5,3,2,0\n"
+    " 01/06/2023,Technology,East,Phones,B,5,3,2,0\n"
+    ",Technology,East,Phones,B,5,3,2,0\n"
+    "NA,Technology,East,Phones,B,5,3,2,0\n"
+    "1/8/2023,NA,,Phones, C ,  7 ,x,,n/a\n"
+    "01/09/2023 ,Office,South,Paper,D,1e3,1,-1,0.2\n"
+    "01/10/2023,Office,South,Paper,D,1,1,-1,0.2\n"
+)
+
+
+def test_streaming_cleaning_matches_pandas(tmp_path):
+    csv_path = str(tmp_path / "dirty.csv")
+    with open(csv_path, "w", encoding="utf-8") as f:
+        f.write(DIRTY_CSV)
+    cfg = SOURCES["sales"]
+
+    expected = clean_frame(pd.read_csv(csv_path, encoding="utf-8"), cfg).reset_index(drop=True)
+    actual = duckdb.connect().execute(clean_sql(csv_path, cfg)).fetchdf()
+
+    assert len(expected) == 3
+    for df in (expected, actual):
+        df["date"] = df["date"].astype("datetime64[us]")
+        for c in cfg["columns"]:
+            if c != "date" and c not in cfg["metrics"]:
+                df[c] = df[c].astype(object).where(df[c].notna(), None)
+    pdt.assert_frame_equal(actual, expected, check_dtype=False)
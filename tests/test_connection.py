@@ -0,0 +1,86 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import duckdb
+
+from Ai import connection
+
+WRITE_SCRIPT = """
+import sys
+import threading
+sys.path.insert(0, {root!r})
+from Ai import connection
+with connection.writer({path!r}) as cur:
+    cur.execute("INSERT INTO t VALUES (2)")
+connection.release()
+"""
+
+
+def _make_db(tmp_path) -> str:
+    path = str(tmp_path / "t.duckdb")
+    conn = duckdb.connect(path)
+    conn.execute("CREATE TABLE t (i INTEGER)")
+    conn.execute("INSERT INTO t VALUES (1)")
+    conn.close()
+    return path
+
+
+def test_idle_reader_lets_another_process_write(tmp_path, monkeypatch):
+    monkeypatch.setattr(connection, "IDLE_SECONDS", 0.5)
+    path = _make_db(tmp_path)
+    with connection.cursor(path) as cur:
+        assert cur.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 1
+    # The reader's connection is closed once idle; the other process waits for the lock meanwhile
+    root = os.path.dirname(os.path.dirname(os.path.abspath(connection.__file__)))
+    subprocess.run([sys.executable, "-c", WRITE_SCRIPT.format(root=root, path=path)], check=True, timeout=60)
+    with connection.cursor(path) as cur:
+        assert cur.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 2
+    connection.release()
+    assert not (tmp_path / "t.duckdb.wal").exists()
+
+
+def test_idle_reader_stays_open_until_another_process_waits(tmp_path, monkeypatch):
+    monkeypatch.setattr(connection, "IDLE_SECONDS", 3600)
+    path = _make_db(tmp_path)
+    with connection.cursor(path) as cur:
+        assert cur.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 1
+    time.sleep(1)
+    assert os.path.abspath(path) in connection._shared
+    # The other process's wait file gets the idle connection closed long before IDLE_SECONDS
+    root = os.path.dirname(os.path.dirname(os.path.abspath(connection.__file__)))
+    started = time.monotonic()
+    subprocess.run([sys.executable, "-c", WRITE_SCRIPT.format(root=root, path=path)], check=True, timeout=60)
+    assert time.monotonic() - started < 30
+    assert not list(tmp_path.glob("t.duckdb.lockwait.*"))
+    with connection.cursor(path) as cur:
+        assert cur.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 2
+    connection.release()
+
+
+def test_upgrade_to_writer_waits_for_open_reader_cursors(tmp_path):
+    path = _make_db(tmp_path)
+    reader = connection.cursor(path)
+    reader.execute("SELECT i FROM range(100000) r(i)")
+    first = reader.fetchmany(10)
+    upgraded = threading.Event()
+
+    def write():
+        with connection.writer(path) as cur:
+            upgraded.set()
+            cur.execute("INSERT INTO t VALUES (2)")
+
+    thread = threading.Thread(target=write)
+    thread.start()
+    assert not upgraded.wait(0.5)
+    # The read-only connection is still open under the reader's pending result
+    rest = reader.fetchall()
+    reader.close()
+    assert len(first) + len(rest) == 100000
+    thread.join(10)
+    assert upgraded.is_set()
+    with connection.cursor(path) as cur:
+        assert cur.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 2
+    connection.release()
@@ -0,0 +1,46 @@
+import pytest
+
+from Ai import connection
+from config.sources import resolve_source_paths
+from ETL import run_etl
+
+
+@pytest.fixture
+def source(tmp_path, monkeypatch):
+    """The sales source with its CSV (all but the last 100 rows) and DuckDB file under tmp_path."""
+    cfg = resolve_source_paths("sales")
+    with open(cfg["csv_path"], encoding="utf-8") as f:
+        lines = f.readlines()
+    cfg.update(csv_path=str(tmp_path / "sales.csv"), db_path=str(tmp_path / "sales.duckdb"), sample_rows=0)
+    with open(cfg["csv_path"], "w", encoding="utf-8") as f:
+        f.writelines(lines[:-100])
+    monkeypatch.setattr(run_etl, "resolve_source_paths", lambda source_id: dict(cfg))
+    yield cfg, lines[-100:]
+    connection.release()
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_rows_appended_during_a_load_are_loaded_once(source, monkeypatch, streaming):
+    cfg, tail = source
+    complete_size = run_etl.complete_size
+
+    def append_after_size_check(csv_path):
+        size = complete_size(csv_path)
+        # A writer appends 50 rows and part of the next one while the load runs
+        with open(csv_path, "a", encoding="utf-8") as f:
+            f.writelines(tail[:50])
+            f.write(tail[50][:10])
+        return size
+
+    monkeypatch.setattr(run_etl, "complete_size", append_after_size_check)
+    first = run_etl.run("sales", streaming=streaming)["row_count"]
+    monkeypatch.setattr(run_etl, "complete_size", complete_size)
+
+    # The partial line is not loaded while it is still being written
+    second = run_etl.run("sales", incremental=True, streaming=streaming)
+    assert second["row_count"] == first + 50
+    with open(cfg["csv_path"], "a", encoding="utf-8") as f:
+        f.write(tail[50][10:])
+        f.writelines(tail[51:])
+    third = run_etl.run("sales", incremental=True, streaming=streaming)
+    assert third["row_count"] == first + 100
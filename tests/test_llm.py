@@ -0,0 +1,110 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from Ai import llm
+from Ai.prompt import plan_schema
+from config.sources import resolve_source_paths
+
+PLAN = {"dimension": "region", "metric": "sales", "chart_type": "bar", "by_time_breakdown": False}
+# Every optional key filled in
+FULL_PLAN = dict(
+    PLAN, top_n=10, metrics=["sales", "profit"], dimensions=["region", "category"],
+    filters={"region": ["West", "East"], "category": ["Technology"]}, date_from="2023-01-01", date_to="2023-03-31",
+)
+# Seconds the stub goes on generating after the plan by default, past llm.DRAIN_SECONDS
+TAIL_SECONDS = 3.0
+# Token counts the stub reports in its final chunk
+PROMPT_TOKENS, COMPLETION_TOKENS = 120, 31
+
+
+class _StubOllama(BaseHTTPRequestHandler):
+    """/api/generate streaming PLAN a few characters per NDJSON line, then whitespace for tail seconds before "done"."""
+
+    # Chunked transfer encoding, as Ollama sends it; urllib3 hands each HTTP chunk over as it arrives
+    protocol_version = "HTTP/1.1"
+    requests = []
+    # Seconds before the first chunk, as a model still evaluating a long prompt
+    delay = 0.0
+    tail = TAIL_SECONDS
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        type(self).requests.append(body)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        text = json.dumps(PLAN)
+        try:
+            time.sleep(type(self).delay)
+            for i in range(0, len(text), 7):
+                self._chunk({"response": text[i:i + 7], "done": False})
+            end = time.monotonic() + type(self).tail
+            while time.monotonic() < end:
+                self._chunk({"response": " ", "done": False})
+                time.sleep(0.05)
+            self._chunk({"response": "", "done": True, "prompt_eval_count": PROMPT_TOKENS,
+                         "eval_count": COMPLETION_TOKENS})
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def _chunk(self, obj):
+        line = json.dumps(obj).encode() + b"\n"
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+        self.wfile.flush()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_ollama(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubOllama)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    _StubOllama.requests = []
+    _StubOllama.delay = 0.0
+    _StubOllama.tail = TAIL_SECONDS
+    monkeypatch.setattr(llm, "OLLAMA_URL", f"http://127.0.0.1:{server.server_port}/api/generate")
+    yield _StubOllama
+    server.shutdown()
+
+
+def test_structured_plan_is_streamed_and_stops_at_the_closing_brace(stub_ollama):
+    t0 = time.monotonic()
+    plan, stats = llm.analysis_plan_with_stats("sales by region", resolve_source_paths("sales"))
+    assert plan == PLAN
+    assert stats["mode"] == "structured" and stats["early_stop"]
+    assert time.monotonic() - t0 < TAIL_SECONDS
+    sent = stub_ollama.requests[0]
+    assert sent["stream"] is True and sent["format"]["type"] == "object"
+
+
+@pytest.mark.parametrize("structured", [True, False])
+def test_token_counts_come_from_the_final_chunk(stub_ollama, structured):
+    # A short tail, as after a schema-constrained reply or a free-text one that ends soon after the plan
+    stub_ollama.tail = 0.2
+    plan, stats = llm.analysis_plan_with_stats("sales by region", resolve_source_paths("sales"), structured=structured)
+    assert plan == PLAN and stats["early_stop"]
+    assert (stats["prompt_tokens"], stats["completion_tokens"]) == (PROMPT_TOKENS, COMPLETION_TOKENS)
+
+
+def test_token_cap_fits_a_plan_with_every_optional_key():
+    cfg = resolve_source_paths("sales")
+    llm.validate_plan(FULL_PLAN, cfg)
+    # JSON runs at about 4 characters per token
+    assert llm.num_predict(plan_schema(cfg)) >= len(json.dumps(FULL_PLAN)) / 4 * 1.5
+
+
+def test_broker_call_stays_within_the_callers_deadline(stub_ollama):
+    stub_ollama.delay = 5.0
+    t0 = time.monotonic()
+    plan, info = llm.PlanBroker().plan(
+        "sales by region", resolve_source_paths("sales"), lambda message, cfg: {"fallback": True}, deadline=3.0
+    )
+    assert plan == {"fallback": True} and info["origin"] == "fallback"
+    assert time.monotonic() - t0 < 3.5
@@ -0,0 +1,98 @@
+import glob
+import os
+
+import duckdb
+import pytest
+
+from Ai import connection, query
+from config.sources import resolve_source_paths
+from ETL import parquet_store, run_etl
+
+
+@pytest.fixture
+def source(tmp_path, monkeypatch):
+    """The sales source with storage "parquet", its CSV (first half of the rows) and files under tmp_path."""
+    cfg = resolve_source_paths("sales")
+    with open(cfg["csv_path"], encoding="utf-8") as f:
+        lines = f.readlines()
+    half = len(lines) // 2
+    cfg.update(
+        csv_path=str(tmp_path / "sales.csv"), db_path=str(tmp_path / "sales.duckdb"),
+        parquet_path=str(tmp_path / "parquet"), storage="parquet", sample_rows=0,
+    )
+    with open(cfg["csv_path"], "w", encoding="utf-8") as f:
+        f.writelines(lines[:half])
+    monkeypatch.setattr(run_etl, "resolve_source_paths", lambda source_id: dict(cfg))
+    yield cfg, lines[half:]
+    connection.release()
+
+
+def _parquet_rows(cfg) -> int:
+    files = glob.glob(parquet_store.partition_glob(cfg))
+    return duckdb.sql(f"SELECT COUNT(*) FROM read_parquet({files!r})").fetchone()[0] if files else 0
+
+
+def _fail(*args, **kwargs):
+    raise RuntimeError("load interrupted")
+
+
+def test_rolled_back_load_leaves_partitions_untouched(source, monkeypatch):
+    cfg, tail = source
+    loaded = run_etl.run("sales")["row_count"]
+    with open(cfg["csv_path"], "a", encoding="utf-8") as f:
+        f.writelines(tail)
+
+    with monkeypatch.context() as m:
+        m.setattr(run_etl, "build_sample", _fail)
+        with pytest.raises(RuntimeError):
+            run_etl.run("sales", incremental=True)
+    assert _parquet_rows(cfg) == loaded
+
+    total = run_etl.run("sales", incremental=True)["row_count"]
+    assert total > loaded
+    assert _parquet_rows(cfg) == total
+    assert not os.path.exists(cfg["parquet_path"] + ".staging")
+
+
+def test_committed_load_is_published_by_the_next_run(source, monkeypatch):
+    cfg, tail = source
+    run_etl.run("sales")
+    with open(cfg["csv_path"], "a", encoding="utf-8") as f:
+        f.writelines(tail)
+
+    publish = run_etl._publish_parquet
+    calls = []
+
+    def publish_before_commit_only(*args):
+        # A run's first publish finishes earlier loads; the second one, after COMMIT, is interrupted
+        calls.append(args)
+        if len(calls) > 1:
+            _fail()
+        publish(*args)
+
+    monkeypatch.setattr(run_etl, "_publish_parquet", publish_before_commit_only)
+    with pytest.raises(RuntimeError):
+        run_etl.run("sales", incremental=True)
+    monkeypatch.setattr(run_etl, "_publish_parquet", publish)
+
+    result = run_etl.run("sales", incremental=True)
+    assert result["rows"] == 0
+    assert _parquet_rows(cfg) == result["row_count"]
+
+
+def test_date_range_reads_only_the_matching_partitions(source):
+    cfg, _ = source
+    run_etl.run("sales")
+    args = ("category", "sales", "bar", cfg["db_path"], cfg["table"], cfg["dimensions"], cfg["metrics"], "date")
+    df, sql = query.run_query(*args, use_rollups=False, use_cache=False, date_from="2021-03-10", date_to="2021-04-20")
+
+    _, params = query.filter_sql(None, "2021-03-10", "2021-04-20", cfg["dimensions"], "date", partitioned=True)
+    with connection.cursor(cfg["db_path"]) as cur:
+        plan = cur.execute(f"EXPLAIN ANALYZE {sql}", params).fetchall()[0][1]
+        expected = cur.execute(
+            f"SELECT SUM(sales) FROM read_parquet('{parquet_store.partition_glob(cfg)}') "
+            "WHERE date >= DATE '2021-03-10' AND date < DATE '2021-04-21'"
+        ).fetchone()[0]
+    assert "Total Files Read: 2" in plan
+    assert len(glob.glob(parquet_store.partition_glob(cfg))) > 2
+    assert df["value"].sum() == pytest.approx(expected)
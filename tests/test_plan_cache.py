@@ -0,0 +1,21 @@
+import datetime
+
+from Ai import plan_cache
+from config.sources import resolve_source_paths
+
+PLAN = {"dimension": "region", "metric": "sales", "chart_type": "bar", "by_time_breakdown": False}
+
+
+def test_dated_plans_expire_when_the_data_moves_on(tmp_path, monkeypatch):
+    path = str(tmp_path / "plans.sqlite")
+    cfg = resolve_source_paths("sales")
+    end = datetime.date(2023, 12, 30)
+    monkeypatch.setattr(plan_cache, "data_end", lambda source_cfg: end)
+    dated = dict(PLAN, date_from="2023-10-01", date_to="2023-12-30")
+    plan_cache.put("sales", cfg, "sales by region last quarter", dated, path=path)
+    plan_cache.put("sales", cfg, "sales by region", PLAN, path=path)
+    assert plan_cache.get("sales", cfg, "sales by region last quarter", path=path) == dated
+
+    end = datetime.date(2024, 3, 31)
+    assert plan_cache.get("sales", cfg, "sales by region last quarter", path=path) is None
+    assert plan_cache.get("sales", cfg, "sales by region", path=path) == PLAN
@@ -0,0 +1,32 @@
+import duckdb
+import pytest
+
+from Ai import connection
+from Ai.query import run_query
+from Ai.report import insights
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "sales.duckdb")
+    conn = duckdb.connect(path)
+    # quantity is an integer column, as ETL.schema types it; its SUM is a HUGEINT
+    conn.execute("CREATE TABLE sales (date DATE, region VARCHAR, category VARCHAR, sales DOUBLE, quantity INTEGER)")
+    conn.execute(
+        "INSERT INTO sales VALUES ('2023-01-05', 'West', 'Chairs', 10.5, 2), ('2023-01-06', 'East', 'Phones', 20, 3), "
+        "('2023-02-01', 'East', 'Chairs', 5, 1)"
+    )
+    conn.close()
+    yield path
+    connection.release(path)
+
+
+def test_multi_metric_arrow_result_with_an_integer_metric(db_path):
+    table, _ = run_query(
+        ["region", "category"], ["quantity", "sales"], "bar", db_path, "sales",
+        ["date", "region", "category"], ["sales", "quantity"], "date", use_cache=False, result="arrow",
+    )
+    out = insights(table)
+    assert out["kind"] == "multi"
+    assert out["totals"] == {"quantity": 6, "sales": 35.5}
+    assert out["facets"][0]["top"]["quantity"]["label"] == "East"
@@ -0,0 +1,26 @@
+import duckdb
+import pytest
+
+from config.sources import SOURCES
+from ETL.schema import enum_values, lossy_casts
+
+ROWS = (
+    "SELECT * FROM (VALUES (2.0, 0.1), (2.5, 0.25), (70000.0, 0.125), (NULL, NULL), (3.0, 1.5)) "
+    "AS v(quantity, discount)"
+)
+
+
+def test_lossy_casts_counts_rounded_and_out_of_range_values():
+    # sales declares quantity SMALLINT and discount DECIMAL(4,2)
+    cfg = dict(SOURCES["sales"], columns=["quantity", "discount"])
+    assert lossy_casts(duckdb.connect(), cfg, ROWS) == {"quantity": 2, "discount": 1}
+    assert lossy_casts(duckdb.connect(), cfg, ROWS + " WHERE quantity <> 2.5 AND quantity < 100") == {}
+
+
+def test_enum_values_refuses_lossy_rows_in_the_same_scan():
+    cfg = dict(SOURCES["sales"], columns=["region", "quantity", "discount"])
+    rows = "SELECT * FROM (VALUES ('east', 2.0, 0.1), ('west', 3.0, 0.25)) AS v(region, quantity, discount)"
+    conn = duckdb.connect()
+    assert enum_values(conn, cfg, rows) == {"region": ["east", "west"]}
+    with pytest.raises(ValueError, match=r"quantity \(SMALLINT\): 1 rows"):
+        enum_values(conn, cfg, rows.replace("3.0", "3.5"))